@@ -0,0 +1,781 @@
+"""
+| Benchmarks of the bot's hot paths, run manually: ``python bench_scripts.py <benchmark> [args]``.
+| Benchmarks using the database read the config file, but only write to a separate ``<cluster>_bench`` database,
+  dropped at the end.
+"""
+
+import os
+import sys
+import time
+import subprocess
+import statistics
+from logging import getLogger, WARNING
+
+import modules.config as cfg
+
+if os.path.isfile("test"):
+    LAUNCHSTR = "_test"
+else:
+    LAUNCHSTR = ""
+
+
+def _init_bench_db():
+    # Same database server as the bot, in a scratch database
+    import modules.database as db
+    cfg.get_config(LAUNCHSTR)
+    config = dict(cfg.database, cluster=f'{cfg.database["cluster"]}_bench')
+    db.init(config)
+    return db, config
+
+
+def _drop_bench_db(db, config):
+    db._client.drop_database(config["cluster"])
+
+
+def _timed(func, *args, repeat=1):
+    # Returns the result of the last call and the mean duration of a call, in milliseconds
+    durations = list()
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, statistics.mean(durations)
+
+
+def db_round_trips(repeat="20"):
+    """
+    Count the database round trips (commands sent to the server) of each database accessor.
+    Every accessor should need a single round trip, including when the element is missing.
+    """
+    from pymongo import monitoring
+
+    class CommandCounter(monitoring.CommandListener):
+        count = 0
+
+        def started(self, event):
+            CommandCounter.count += 1
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    # Must be registered before the client is created
+    monitoring.register(CommandCounter())
+    db, config = _init_bench_db()
+    repeat = int(repeat)
+    collection = "users"
+    missing_id = -1
+
+    def measure(name, call):
+        def counted():
+            before = CommandCounter.count
+            try:
+                call()
+            except db.DatabaseError:
+                pass
+            return CommandCounter.count - before
+        trips, duration = _timed(counted, repeat=repeat)
+        print(f"{name:<30} {trips:>3} round trip(s) {duration:>8.2f} ms")
+
+    try:
+        print(f"{'Operation':<30} (mean of {repeat} calls)")
+        measure("set_element", lambda: db.set_element(collection, 1, {"_id": 1, "name": "bench", "usages": []}))
+        measure("get_element", lambda: db.get_element(collection, 1))
+        measure("get_element (missing)", lambda: db.get_element(collection, missing_id))
+        measure("get_field", lambda: db.get_field(collection, 1, "name"))
+        measure("get_field (missing)", lambda: db.get_field(collection, missing_id, "name"))
+        measure("set_field", lambda: db.set_field(collection, 1, {"name": "bench_2"}))
+        measure("set_field (missing)", lambda: db.set_field(collection, missing_id, {"name": "bench_2"}))
+        measure("unset_field", lambda: db.unset_field(collection, 1, {"name": ""}))
+        measure("push_element", lambda: db.push_element(collection, 1, {"usages": 0}))
+        measure("remove_element", lambda: (db.set_element(collection, 2, {"_id": 2}),
+                                           db.remove_element(collection, 2)))
+        measure("remove_element (missing)", lambda: db.remove_element(collection, missing_id))
+        print("remove_element includes the set_element call creating the element")
+    finally:
+        _drop_bench_db(db, config)
+
+
+def match_index(nb_players="50", nb_matches="5000", repeat="20"):
+    """
+    Compare the player match counting of :mod:`modules.stat_processor` (binary searches on the sorted match index)
+    with the previous backwards scans of the player match lists, on synthetic players with thousands of matches
+    spread over the last two years.
+    Both must give the same 9-week PSB usage and recent matches.
+    """
+    import random
+    from types import SimpleNamespace
+    from datetime import datetime as dt, timezone as tz, timedelta as dt_delta
+    from array import array
+    import modules.stat_processor as stat_processor
+    import modules.tools as tools
+
+    nb_players = int(nb_players)
+    nb_matches = int(nb_matches)
+    repeat = int(repeat)
+    random.seed(0)
+    now = tools.timestamp_now()
+    period = 2 * 365 * 86400
+
+    # Matches ids are increasing with time, a few ids are missing from the timestamps (deleted matches)
+    match_ids = list(range(1, nb_matches * 4 + 1))
+    match_stamps = sorted(random.randrange(now - period, now) for _ in match_ids)
+    stamps_dict = {m_id: stamp for m_id, stamp in zip(match_ids, match_stamps) if m_id % 97 != 0}
+    players = [SimpleNamespace(id=p_id, matches=sorted(random.sample(match_ids, nb_matches)))
+               for p_id in range(nb_players)]
+
+    stat_processor._match_ids[:] = array('q', (m_id for m_id in match_ids if m_id in stamps_dict))
+    stat_processor._match_stamps[:] = array('q', (stamps_dict[m_id] for m_id in stat_processor._match_ids))
+    stat_processor._player_index.clear()
+
+    def psb_weeks(date):
+        # Same weeks as format_for_psb
+        weeks = list()
+        start, end = stat_processor.get_week(date, True)
+        weeks.append((start.timestamp(), end.timestamp()))
+        for _ in range(8):
+            start, end = stat_processor.get_week(start)
+            weeks.append((start.timestamp(), end.timestamp()))
+        return weeks
+
+    def scan_count(player, start, end):
+        # Previous PsbWeekUsage.get_num_matches
+        num = 0
+        for m_id in player.matches[::-1]:
+            try:
+                if stamps_dict[m_id] > end:
+                    pass
+                elif start <= stamps_dict[m_id] <= end:
+                    num += 1
+                else:
+                    break
+            except KeyError:
+                pass
+        return num
+
+    def scan_recent(player, time):
+        # Previous get_matches_in_time
+        matches = list()
+        for m_id in player.matches[::-1]:
+            try:
+                if stamps_dict[m_id] >= time:
+                    matches.append(m_id)
+                else:
+                    break
+            except KeyError:
+                pass
+        return matches
+
+    def psb_report(count, weeks):
+        return [[count(player, start, end) for start, end in weeks] for player in players]
+
+    def recent(get_matches):
+        return [get_matches(player, now - stat_processor.RECENT_DURATION) for player in players]
+
+    _, build_duration = _timed(lambda: [stat_processor._get_index(player) for player in players])
+    print(f"{nb_players} players with {nb_matches} matches, mean of {repeat} runs, identical results")
+    print(f"{'Index build (once)':<30} {build_duration:>10.2f} ms")
+    print(f"{'Query':<30} {'Scan':>10} {'Index':>10} {'Speedup':>10}")
+
+    def compare(name, reference_func, func):
+        reference, ref_duration = _timed(reference_func, repeat=repeat)
+        result, duration = _timed(func, repeat=repeat)
+        assert result == reference, f"{name}: indexed result differs from the scan"
+        print(f"{name:<30} {ref_duration:>7.2f} ms {duration:>7.2f} ms {ref_duration / duration:>9.1f}x")
+
+    for name, date in (("PSB report, this week", dt.now(tz.utc)),
+                       ("PSB report, 1 year ago", dt.now(tz.utc) - dt_delta(days=365))):
+        weeks = psb_weeks(date)
+        compare(name, lambda: psb_report(scan_count, weeks),
+                lambda: psb_report(stat_processor.count_matches_between, weeks))
+    compare("Recent matches", lambda: recent(scan_recent), lambda: recent(stat_processor.get_matches_in_time))
+
+
+def _get_render_data(match_id, nb_players=6):
+    # Synthetic render data of a half-match, see image_maker.get_render_data
+    import random
+    from modules.image_renderer import LOADOUTS
+    teams = list()
+    for t_id in range(2):
+        players = [{"name": f"Player_{t_id}_{i}" + "W" * random.randint(0, 20),
+                    "ig_name": f"IgName{t_id}{i}" + "x" * random.randint(0, 20),
+                    "score": random.randint(-20, 300),
+                    "net": random.randint(-50, 300),
+                    "kills": random.randint(0, 60),
+                    "deaths": random.randint(0, 60),
+                    "hsr": random.random(),
+                    "loadouts": random.sample(LOADOUTS, random.randint(1, 2))} for i in range(nb_players)]
+        teams.append({"name": f"Team {t_id}",
+                      "faction": ("VS", "NC")[t_id],
+                      "cap": 0,
+                      "score": sum(p["score"] for p in players),
+                      "net": sum(p["net"] for p in players),
+                      "kills": sum(p["kills"] for p in players),
+                      "deaths": sum(p["deaths"] for p in players),
+                      "hsr": 0.25,
+                      "players": players})
+    return {"id": match_id,
+            "base": "Acan Southern Labs",
+            "round_stamps": [1700000000],
+            "round_length": 10,
+            "teams": teams}
+
+
+def image_rendering(repeat="5"):
+    """
+    Measure the score image creation (:func:`modules.image_renderer.make_image`): without any cached element (first
+    image), with the cached layers, and in the worker process used by :mod:`modules.image_maker`.
+    Also measure the longest event loop freeze while an image is created in the bot process or in the worker process.
+    Run it from the bot directory (fonts and images are loaded with relative paths).
+    """
+    import asyncio
+    import random
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    import modules.image_renderer as renderer
+
+    repeat = int(repeat)
+    random.seed(0)
+    image_format, compression, scale = cfg.images["format"], cfg.images["compression"], cfg.images["scale"]
+    data = _get_render_data(1)
+    caches = (renderer._get_font, renderer._get_logo, renderer._get_loadout_icon, renderer._get_background,
+              renderer._cut_off_string)
+
+    def cold():
+        for cache in caches:
+            cache.cache_clear()
+        renderer._canvases.clear()
+        return renderer.make_image(data, image_format, compression, scale)
+
+    def warm():
+        # New match: cached layers, but no previous image to reuse
+        renderer._canvases.clear()
+        return renderer.make_image(data, image_format, compression, scale)
+
+    async def freeze_during(make):
+        # Longest delay of a 1 ms periodic task while the image is created
+        loop = asyncio.get_running_loop()
+        freeze = 0
+        done = False
+
+        async def ticker():
+            nonlocal freeze
+            while not done:
+                start = loop.time()
+                await asyncio.sleep(0.001)
+                freeze = max(freeze, loop.time() - start - 0.001)
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0.01)
+        await make()
+        done = True
+        await task
+        return freeze * 1000
+
+    async def in_process():
+        warm()
+
+    async def in_worker():
+        await asyncio.get_running_loop().run_in_executor(executor, renderer.make_image, data, image_format,
+                                                         compression, scale)
+
+    print(f"{image_format} image at scale {scale}, mean of {repeat} runs")
+    (encoded, _), duration = _timed(cold, repeat=repeat)
+    print(f"{'No cached element':<30} {duration:>10.2f} ms ({len(encoded) // 1024} kB)")
+    _, duration = _timed(warm, repeat=repeat)
+    print(f"{'Cached layers':<30} {duration:>10.2f} ms")
+    img = renderer.render(data, scale)
+    _, duration = _timed(renderer.encode, img, image_format, compression, repeat=repeat)
+    print(f"{'  of which encoding':<30} {duration:>10.2f} ms")
+
+    # Same worker process as image_maker.init
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        _, duration = _timed(lambda: executor.submit(renderer.warm_up, scale).result())
+        print(f"{'Worker start and warm up':<30} {duration:>10.2f} ms")
+        _, duration = _timed(lambda: executor.submit(renderer.make_image, data, image_format, compression,
+                                                     scale).result(), repeat=repeat)
+        print(f"{'Worker process (round trip)':<30} {duration:>10.2f} ms")
+        freezes = [asyncio.run(freeze_during(in_process)) for _ in range(repeat)]
+        print(f"{'Event loop freeze, in process':<30} {max(freezes):>10.2f} ms")
+        freezes = [asyncio.run(freeze_during(in_worker)) for _ in range(repeat)]
+        print(f"{'Event loop freeze, in worker':<30} {max(freezes):>10.2f} ms")
+    finally:
+        executor.shutdown()
+
+
+def image_scales(repeat="5"):
+    """
+    Measure the score image creation at each resolution scale, and the partial redraws of a match image: the end of
+    match image drawn over the half-match one, compared with a full redraw.
+    Partial redraws must give the same image as full redraws.
+    Run it from the bot directory (fonts and images are loaded with relative paths).
+    """
+    import random
+    import copy
+    from PIL import ImageChops
+    import modules.image_renderer as renderer
+
+    repeat = int(repeat)
+    random.seed(0)
+    image_format, compression = cfg.images["format"], cfg.images["compression"]
+    half = _get_render_data(1)
+
+    # End of match: new round, different scores for all players
+    end = copy.deepcopy(half)
+    end["round_stamps"].append(half["round_stamps"][0] + 1000)
+    for tm, new_tm in zip(end["teams"], _get_render_data(1)["teams"]):
+        tm.update({key: new_tm[key] for key in ("score", "net", "kills", "deaths")}, cap=100)
+        for player, new_player in zip(tm["players"], new_tm["players"]):
+            player.update({key: new_player[key] for key in ("score", "net", "kills", "deaths", "hsr")})
+
+    # Correction of a published image: 2 players changed
+    corrected = copy.deepcopy(end)
+    for tm in corrected["teams"]:
+        tm["players"][0]["kills"] += 1
+
+    def full(data, scale):
+        renderer._canvases.clear()
+        return renderer.render(data, scale)
+
+    def partial(previous, data, scale):
+        # Excluding the drawing of the previous image
+        renderer._canvases.clear()
+        renderer.render(previous, scale)
+        start = time.perf_counter()
+        img = renderer.render(data, scale)
+        return img, (time.perf_counter() - start) * 1000
+
+    print(f"{image_format} images, mean of {repeat} runs. End: end of match image over the half-match one, "
+          f"Fix: 2 players changed")
+    print(f"{'Scale':<8} {'Size':>11} {'Encode':>10} {'File':>8} {'End (full)':>12} {'End (part)':>12} "
+          f"{'Fix (part)':>12}")
+    for scale in (1.0, 0.5, 0.25):
+        renderer.warm_up(scale)
+        img, render_duration = _timed(full, end, scale, repeat=repeat)
+        encoded, encode_duration = _timed(renderer.encode, img, image_format, compression, repeat=repeat)
+        partial_durations = list()
+        for previous, data in ((half, end), (end, corrected)):
+            reference = full(data, scale)
+            results = [partial(previous, data, scale) for _ in range(repeat)]
+            assert ImageChops.difference(results[-1][0], reference).getbbox() is None, \
+                f"Partial redraw differs from full redraw at scale {scale}"
+            partial_durations.append(statistics.mean(duration for _, duration in results))
+        print(f"{scale:<8} {f'{img.width}x{img.height}':>11} {encode_duration:>7.2f} ms {len(encoded) // 1024:>5} kB "
+              f"{render_duration:>9.2f} ms {partial_durations[0]:>9.2f} ms "
+              f"{partial_durations[1]:>9.2f} ms")
+
+
+def account_allocation(nb_accounts="300", nb_matches="200", parallel_matches="4"):
+    """
+    Compare the match account allocation of :func:`modules.accounts_handler.give_accounts` (one usage query per match,
+    heap of the available accounts) with the previous allocation (one usage query and one scan of the accounts
+    per player), on back-to-back matches of 12 players, several matches being played at the same time.
+    Usages are written to the ``<cluster>_bench`` database.
+    """
+    import asyncio
+    import random
+    from types import SimpleNamespace
+    import classes
+    import modules.accounts_handler as accounts_handler
+
+    db, config = _init_bench_db()
+    nb_accounts = int(nb_accounts)
+    nb_matches = int(nb_matches)
+    parallel_matches = int(parallel_matches)
+    random.seed(0)
+
+    # Player ids are discord ids, they don't collide with the account ids
+    player_ids = [100000000000000000 + i for i in range(nb_accounts * 3)]
+    usages = {a_id: random.sample(player_ids, random.randint(0, 30)) for a_id in range(1, nb_accounts + 1)}
+    player_usages = dict()
+    for a_id, p_ids in usages.items():
+        for p_id in p_ids:
+            player_usages.setdefault(p_id, list()).append(a_id)
+    matches = [random.sample(player_ids, 12) for _ in range(nb_matches)]
+
+    # Number of database queries, whatever the database accessor used
+    queries = 0
+
+    def counted(func):
+        def call(*args):
+            nonlocal queries
+            queries += 1
+            return func(*args)
+        return call
+
+    async def give_one_by_one(a_players):
+        # Previous give_account, called for each player
+        for a_player in a_players:
+            unique_usages = await db.async_db_call(counted(db.get_field), "accounts_usage", a_player.id,
+                                                   "unique_usages") or list()
+            a_player.unique_usages = unique_usages
+            potential = [accounts_handler._available_accounts[a_id] for a_id in unique_usages
+                         if a_id in accounts_handler._available_accounts]
+            if potential:
+                accounts_handler._set_account(max(potential, key=lambda acc: acc.nb_unique_usages), a_player)
+            else:
+                accounts_handler._set_account(min(accounts_handler._available_accounts.values(),
+                                                  key=lambda acc: acc.nb_unique_usages), a_player)
+
+    async def give_all(a_players):
+        get_elements = db.get_elements
+        db.get_elements = counted(get_elements)
+        try:
+            await accounts_handler.give_accounts(a_players)
+        finally:
+            db.get_elements = get_elements
+
+    def end_match(a_players):
+        # Bookkeeping of Account.validate and terminate_accounts, without the discord messages
+        updates = dict()
+        for a_player in a_players:
+            acc = a_player.account
+            if a_player.id not in acc.unique_usages:
+                acc.unique_usages.append(a_player.id)
+            updates[acc.id] = {"$addToSet": {"unique_usages": a_player.id}}
+            updates[a_player.id] = {"$addToSet": {"unique_usages": acc.id}}
+            accounts_handler._player_accounts.setdefault(a_player.id, set()).add(acc.id)
+            acc.clean()
+            del accounts_handler._busy_accounts[acc.id]
+            accounts_handler._make_available(acc)
+        db.set_elements(dict(), {"accounts_usage": updates})
+
+    async def run(give):
+        nonlocal queries
+        # Same initial usages for both allocations
+        db._collections["accounts_usage"].delete_many({})
+        db.set_elements({"accounts_usage": [{"_id": e_id, "unique_usages": ids}
+                                            for e_id, ids in (usages | player_usages).items()]})
+        accounts_handler._available_accounts.clear()
+        accounts_handler._busy_accounts.clear()
+        accounts_handler._accounts_heap.clear()
+        accounts_handler._player_accounts.clear()
+        accounts_handler._removed_accounts.clear()
+        accounts_handler.apply_sheet(({str(a_id): (str(a_id), f"user_{a_id}", "password") for a_id in usages},
+                                      list(),
+                                      {a_id: {"unique_usages": list(p_ids)} for a_id, p_ids in usages.items()}))
+        queries = 0
+        durations = list()
+        reused = 0
+        playing = list()
+        for m_id, p_ids in enumerate(matches):
+            if len(playing) == parallel_matches:
+                end_match(playing.pop(0))
+            match = SimpleNamespace(id=m_id)
+            a_players = [SimpleNamespace(id=p_id, name=str(p_id), match=match) for p_id in p_ids]
+            previous = {p_id: set(accounts_handler._player_accounts.get(p_id, ())) for p_id in p_ids}
+            start = time.perf_counter()
+            await give(a_players)
+            durations.append((time.perf_counter() - start) * 1000)
+            reused += sum(a_player.account.id in previous[a_player.id] for a_player in a_players)
+            assert len({a_player.account.id for a_player in a_players}) == len(a_players), "Account given twice"
+            playing.append(a_players)
+        nb_usages = [acc.nb_unique_usages for acc in accounts_handler._available_accounts.values()] + \
+                    [acc.nb_unique_usages for acc in accounts_handler._busy_accounts.values()]
+        return statistics.mean(durations), queries / len(matches), reused / (len(matches) * 12), max(nb_usages)
+
+    # Allocation logs are not relevant here
+    getLogger("pog_bot").setLevel(WARNING)
+    try:
+        print(f"{nb_accounts} accounts, {nb_matches} matches of 12 players, {parallel_matches} matches at once")
+        print(f"{'Allocation':<15} {'Per match':>10} {'Queries':>8} {'Reused':>8} {'Max usages':>11}")
+        for name, give in (("Player by player", give_one_by_one), ("Whole match", give_all)):
+            duration, nb_queries, reused, max_usages = asyncio.run(run(give))
+            print(f"{name:<15} {duration:>7.2f} ms {nb_queries:>8.1f} {reused:>7.0%} {max_usages:>11}")
+        print("Reused: accounts given to players who already used them (in this benchmark), Max usages: most unique "
+              "users of an account")
+    finally:
+        _drop_bench_db(db, config)
+
+
+def player_startup(nb_users="100000", hot_ratio="0.1", nb_fetches="100"):
+    """
+    Measure the loading of the players at startup (:meth:`classes.Player.load_all`), loading all the users or only
+    the registered ones who are not away, and the loading of a player left in database on its first access.
+    Users are written to the ``<cluster>_bench`` database.
+    """
+    import asyncio
+    import random
+    import tracemalloc
+    from classes import Player
+
+    db, config = _init_bench_db()
+    nb_users = int(nb_users)
+    hot_ratio = float(hot_ratio)
+    nb_fetches = int(nb_fetches)
+    random.seed(0)
+
+    users = list()
+    for i in range(nb_users):
+        p_id = 100000000000000000 + i
+        user = {"_id": p_id, "name": f"user{i}", "notify": random.random() < 0.5,
+                "is_registered": random.random() < hot_ratio or random.random() < 0.5}
+        if user["is_registered"]:
+            user.update(ig_names=[f"char{i}VS", f"char{i}NC", f"char{i}TR"],
+                        ig_ids=[3 * i + 1, 3 * i + 2, 3 * i + 3])
+            if random.random() > hot_ratio / (hot_ratio + (1 - hot_ratio) * 0.5):
+                user["away"] = True
+        users.append(user)
+    db.force_update("users", users)
+
+    def reset():
+        Player._all_players.clear()
+        Player._cold_players.clear()
+        for names in Player._names_checking:
+            names.clear()
+
+    def load(lazy):
+        reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+        Player.load_all(lazy=lazy)
+        duration = (time.perf_counter() - start) * 1000
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return duration, memory
+
+    try:
+        print(f"{nb_users} users")
+        print(f"{'Startup':<20} {'Duration':>11} {'Memory':>9} {'Loaded':>8} {'In database':>12}")
+        for name, lazy in (("All users", False), ("Lazy", True)):
+            duration, memory = load(lazy)
+            print(f"{name:<20} {duration:>8.0f} ms {memory / 2 ** 20:>6.1f} MB {len(Player._all_players):>8} "
+                  f"{len(Player._cold_players):>12}")
+
+        async def fetch_cold():
+            durations = list()
+            for p_id in random.sample(sorted(Player._cold_players), min(nb_fetches, len(Player._cold_players))):
+                start = time.perf_counter()
+                player = await Player.fetch(p_id)
+                durations.append((time.perf_counter() - start) * 1000)
+                assert player is not None and player.id == p_id, f"Player {p_id} not loaded"
+            return durations
+
+        durations = asyncio.run(fetch_cold())
+        print(f"{'First access (fetch)':<20} {statistics.mean(durations):>8.2f} ms, mean of {len(durations)} players")
+    finally:
+        reset()
+        _drop_bench_db(db, config)
+
+
+def sheet_sync(nb_rows="1000"):
+    """
+    Run a synchronization scenario of :class:`modules.sheets.SheetSync` on a local csv sheet (same layout as the
+    accounts sheet), checking the rows reported as changed or removed and the downloads avoided.
+    Snapshots are written to a temporary directory.
+    """
+    import csv
+    import tempfile
+    import modules.sheets as sheets
+
+    nb_rows = int(nb_rows)
+
+    class CountingBackend(sheets.LocalBackend):
+        nb_downloads = 0
+
+        def get_values(self, key, worksheet, cells):
+            CountingBackend.nb_downloads += 1
+            return super().get_values(key, worksheet, cells)
+
+    with tempfile.TemporaryDirectory() as directory:
+        sheets.SNAPSHOT_PATH = f"{directory}/snapshots"
+        os.makedirs(f"{directory}/sheet")
+        backend = CountingBackend(directory)
+        rows = {str(a_id): [str(a_id), f"user_{a_id}", f"password_{a_id}"] for a_id in range(1, nb_rows + 1)}
+        modified = time.time()
+
+        def write_sheet():
+            nonlocal modified
+            with open(f"{directory}/sheet/1.csv", "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                # Header rows, then an unused first column as in the accounts sheet
+                writer.writerows([["Accounts"], ["", "Id", "Username", "Password"]])
+                writer.writerows([""] + row for row in rows.values())
+            # Make sure the modification time changes
+            modified += 1
+            os.utime(f"{directory}/sheet/1.csv", (modified, modified))
+
+        def new_sync(persistent=True):
+            return sheets.SheetSync("bench", backend, "sheet", "1", "B3:D", key_column=0, persistent=persistent)
+
+        def step(name, sync, expected_changed, expected_removed, expected_downloads):
+            before = CountingBackend.nb_downloads
+            (changed, removed), duration = _timed(sync.sync)
+            downloads = CountingBackend.nb_downloads - before
+            assert changed == expected_changed, f"{name}: unexpected changed rows"
+            assert removed == expected_removed, f"{name}: unexpected removed rows"
+            assert downloads == expected_downloads, f"{name}: {downloads} download(s)"
+            print(f"{name:<30} {len(changed):>8} {len(removed):>8} {downloads:>10} {duration:>8.2f} ms")
+
+        print(f"{nb_rows} rows")
+        print(f"{'Step':<30} {'Changed':>8} {'Removed':>8} {'Downloads':>10} {'Duration':>11}")
+        write_sheet()
+        sync = new_sync()
+        step("First sync", sync, rows, list(), 1)
+        step("Sheet not modified", sync, dict(), list(), 0)
+        rows["10"] = ["10", "user_10", "new_password"]
+        write_sheet()
+        step("One password changed", sync, {"10": rows["10"]}, list(), 1)
+        del rows["20"]
+        write_sheet()
+        step("One row removed", sync, dict(), ["20"], 1)
+        write_sheet()
+        step("Modified, same content", sync, dict(), list(), 1)
+        sync.invalidate()
+        step("Invalidated", sync, rows, list(), 0)
+        step("Restart", new_sync(), rows, list(), 0)
+        step("Restart, not persistent", new_sync(persistent=False), rows, list(), 1)
+        assert not os.path.exists(f"{sheets.SNAPSHOT_PATH}/bench.json"), "Snapshot saved while not persistent"
+        print("Not persistent: snapshot deleted, never saved")
+
+
+def _get_rss():
+    # Current resident set size of the process, in bytes (Linux)
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def stat_startup(nb_matches="20000", variant=""):
+    """
+    Measure the startup RSS of :func:`modules.stat_processor.init` ("columns": projected batched cursor into array
+    columns), compared with the previous loading of the full match documents into a dictionary ("dict").
+    Each variant runs in its own process, synthetic matches are written to the ``<cluster>_bench`` database.
+    """
+    if not variant:
+        # Each variant in a new process, so that its memory is measured alone
+        for variant in ("dict", "columns"):
+            subprocess.run([sys.executable, sys.argv[0], "stat_startup", nb_matches, variant], check=True)
+        return
+
+    import gc
+    import random
+    import resource
+    import modules.stat_processor as stat_processor
+
+    db, config = _init_bench_db()
+    nb_matches = int(nb_matches)
+    random.seed(0)
+    loadout = {"loadout_id": 1, "score": 10, "net": 5, "deaths": 3, "kills": 4, "weight": 20, "headshots": 1,
+               "ill_weapons": list()}
+    try:
+        # Full size match documents, written by batches
+        db._collections["matches"].delete_many(dict())
+        stamp = 1600000000
+        for start in range(1, nb_matches + 1, 1000):
+            batch = list()
+            for m_id in range(start, min(start + 1000, nb_matches + 1)):
+                stamp += random.randint(600, 7200)
+                teams = [{"name": f"Team {t_id}", "faction_id": t_id + 1, "score": 100, "net": 50, "deaths": 30,
+                          "kills": 40, "cap_points": 0,
+                          "players": [{"discord_id": 100000000000000000 + random.randrange(3000),
+                                       "ig_id": 5428010618020694593 + i, "ig_name": f"Character{i}",
+                                       "rounds": [True, True], "loadouts": [dict(loadout, loadout_id=l_id)
+                                                                            for l_id in (1, 3, 4)]}
+                                      for i in range(6)]} for t_id in range(2)]
+                batch.append({"_id": m_id, "round_stamps": [stamp, stamp + 1200], "round_length": 10,
+                              "base_id": 302030, "teams": teams})
+            db._collections["matches"].insert_many(batch)
+        del batch, teams
+
+        gc.collect()
+        rss_before = _get_rss()
+        peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        if variant == "dict":
+            # Previous stat_processor.init
+            match_stamps = dict()
+
+            def db_match(match):
+                match_stamps[match["_id"]] = match["round_stamps"][0]
+            db.get_all_elements(db_match, "matches")
+        else:
+            stat_processor.init(None)
+        duration = (time.perf_counter() - start) * 1000
+        gc.collect()
+        rss = _get_rss() - rss_before
+        # ru_maxrss is in kB on Linux
+        peak = max(0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_before) * 1024
+        print(f"{nb_matches} matches, {variant:<8} {duration:>8.0f} ms, RSS +{rss / 2 ** 20:.1f} MB, "
+              f"peak RSS +{peak / 2 ** 20:.1f} MB")
+    finally:
+        _drop_bench_db(db, config)
+
+
+def db_executor_latency(nb_calls="200", nb_blocking="64", blocking_ms="50"):
+    """
+    Compare the latency of a database call run in the loop's default executor (previous async_db_call) and in the
+    dedicated database executor (:func:`modules.database.async_db_call`), while the default executor is loaded by
+    other blocking calls (image rendering, gspread calls...).
+    """
+    import asyncio
+
+    db, config = _init_bench_db()
+    nb_calls = int(nb_calls)
+    nb_blocking = int(nb_blocking)
+    blocking_ms = int(blocking_ms)
+
+    async def run(name, call, load):
+        loop = asyncio.get_running_loop()
+        running = True
+
+        def blocking_call():
+            # Stands for another blocking call sent to the default executor
+            time.sleep(blocking_ms / 1000)
+
+        async def keep_loaded():
+            while running:
+                await loop.run_in_executor(None, blocking_call)
+
+        loaders = [asyncio.ensure_future(keep_loaded()) for _ in range(nb_blocking if load else 0)]
+        await asyncio.sleep(blocking_ms / 1000)
+        durations = list()
+        for _ in range(nb_calls):
+            start = time.perf_counter()
+            await call()
+            durations.append((time.perf_counter() - start) * 1000)
+        running = False
+        await asyncio.gather(*loaders)
+        durations.sort()
+        print(f"{name:<35} {statistics.mean(durations):>8.2f} ms {durations[len(durations) * 95 // 100]:>8.2f} ms "
+              f"{durations[-1]:>8.2f} ms")
+
+    async def default_executor():
+        await asyncio.get_running_loop().run_in_executor(None, db.get_element, "users", 1)
+
+    async def dedicated_executor():
+        await db.async_db_call(db.get_element, "users", 1)
+
+    try:
+        db.set_element("users", 1, {"_id": 1, "name": "bench"})
+        print(f"get_element latency, {nb_calls} calls, load: {nb_blocking} concurrent {blocking_ms} ms blocking calls")
+        print(f"{'Executor':<35} {'Mean':>11} {'95%':>11} {'Max':>11}")
+        for name, call, load in (("Default, idle", default_executor, False),
+                                 ("Dedicated, idle", dedicated_executor, False),
+                                 ("Default, loaded", default_executor, True),
+                                 ("Dedicated, loaded", dedicated_executor, True)):
+            asyncio.run(run(name, call, load))
+    finally:
+        _drop_bench_db(db, config)
+
+
+BENCHMARKS = {
+    "db_round_trips": db_round_trips,
+    "db_executor_latency": db_executor_latency,
+    "match_index": match_index,
+    "image_rendering": image_rendering,
+    "image_scales": image_scales,
+    "account_allocation": account_allocation,
+    "player_startup": player_startup,
+    "sheet_sync": sheet_sync,
+    "stat_startup": stat_startup,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python bench_scripts.py <benchmark> [args], benchmarks: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
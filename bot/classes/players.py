@@ -11,6 +11,7 @@ from modules.tools import UnexpectedError
 from lib.tasks import loop
 from modules.roles import role_update
 import modules.database as db
+import modules.write_buffer as write_buffer
 import modules.tools as tools
 import re
 
@@ -58,12 +59,75 @@ class Player:
 
     _all_players = dict()
     # to store VS, NC and TR names to check for duplicates
+    # (values are player ids instead of objects for players not loaded yet)
     _names_checking = [dict(), dict(), dict()]
+    # ids of the players left in database until needed (away or not registered)
+    _cold_players = set()
+
+    # Fields needed to build a player object
+    _db_projection = {"name": 1, "notify": 1, "is_registered": 1, "ig_names": 1, "ig_ids": 1,
+                      "timeout": 1, "away": 1, "dm": 1}
+    # Players loaded at startup
+    _db_hot_query = {"is_registered": True, "away": {"$ne": True}}
+    # Number of users fetched per database batch at startup
+    _db_batch_size = 1000
 
     @classmethod
     def get(cls, p_id):
+        """
+        Get a loaded player, without any database access.
+        Players left in database by a lazy :meth:`load_all` are not returned until loaded by :meth:`fetch`.
+
+        :param p_id: Player id.
+        :return: Player found, None if not loaded.
+        """
         return cls._all_players.get(p_id)
 
+    @classmethod
+    async def fetch(cls, p_id):
+        """
+        Get a player, loading it from the database (without blocking the event loop) if it was left there by a lazy
+        :meth:`load_all`.
+
+        :param p_id: Player id.
+        :return: Player found, None if not registered in the database.
+        """
+        player = cls._all_players.get(p_id)
+        if player is None and p_id in cls._cold_players:
+            elements = await db.async_db_call(db.get_elements, "users", [p_id], cls._db_projection)
+            # Could have been loaded by a concurrent call meanwhile
+            player = cls._all_players.get(p_id)
+            if player is None and p_id in cls._cold_players:
+                cls._cold_players.discard(p_id)
+                if p_id in elements:
+                    player = cls.new_from_data(elements[p_id])
+        return player
+
+    @classmethod
+    def load_all(cls, lazy=True):
+        """
+        Load the players from the database.
+
+        :param lazy: If True, players who are away or not registered are left in database, to be loaded on their
+                     first access by :meth:`fetch`.
+        """
+        if not lazy:
+            db.get_all_elements(cls.new_from_data, "users", projection=cls._db_projection,
+                                batch_size=cls._db_batch_size)
+            return
+        db.get_all_elements(cls.new_from_data, "users", query=cls._db_hot_query, projection=cls._db_projection,
+                            batch_size=cls._db_batch_size)
+        db.get_all_elements(cls._add_cold, "users", query={"$nor": [cls._db_hot_query]},
+                            projection={"ig_ids": 1}, batch_size=cls._db_batch_size)
+
+    @classmethod
+    def _add_cold(cls, data):
+        cls._cold_players.add(data["_id"])
+        # Characters must still be known to check for duplicates
+        if "ig_ids" in data:
+            for i in range(3):
+                cls._names_checking[i][data["ig_ids"][i]] = data["_id"]
+
     def remove(self):
         if self.__has_own_account:
             Player.name_check_remove(self)
@@ -144,25 +208,26 @@ class Player:
         return data
 
     async def db_update(self, arg):
+        # Profile updates are buffered and written to the database in batches
         if arg == "notify":
-            await db.async_db_call(db.set_field, "users", self.id, {"notify": self.__notify})
+            write_buffer.set_fields("users", self.id, {"notify": self.__notify})
         elif arg == "away":
-            await db.async_db_call(db.set_field, "users", self.id, {"away": self.__away})
+            write_buffer.set_fields("users", self.id, {"away": self.__away})
         elif arg == "dm":
-            await db.async_db_call(db.set_field, "users", self.id, {"dm": self.__dm})
+            write_buffer.set_fields("users", self.id, {"dm": self.__dm})
         elif arg == "register":
             doc = {"is_registered": self.__is_registered}
-            await db.async_db_call(db.set_field, "users", self.id, doc)
+            write_buffer.set_fields("users", self.id, doc)
         elif arg == "account":
             doc = {"ig_names": self.__ig_names, "ig_ids": self.__ig_ids}
             if self.__has_own_account:
-                await db.async_db_call(db.set_field, "users", self.id, doc)
+                write_buffer.set_fields("users", self.id, doc)
             else:
-                await db.async_db_call(db.unset_field, "users", self.id, doc)
+                write_buffer.unset_fields("users", self.id, doc)
         elif arg == "timeout":
-            await db.async_db_call(db.set_field, "users", self.id, {"timeout": self.__timeout})
+            write_buffer.set_fields("users", self.id, {"timeout": self.__timeout})
         elif arg == "name":
-            await db.async_db_call(db.set_field, "users", self.id, {"name": self.__name})
+            write_buffer.set_fields("users", self.id, {"name": self.__name})
         else:
             raise UnexpectedError("db_update: Unknown field!")
 
@@ -240,16 +305,12 @@ class Player:
         self.__last_lobby_timeout = value
 
     @property
-    def should_be_warned(self):
+    def lobby_warning_stamp(self):
         # If last timeout set is more than 45min (2700)
         if self.__last_lobby_timeout >= 2700:
-            # And expiration is less than 5 minutes away (300)
-            return tools.timestamp_now() + 300 >= self.__lobby_expiration
-        return False
-
-    @property
-    def is_lobby_expired(self):
-        return tools.timestamp_now() >= self.__lobby_expiration
+            # Warn when expiration is less than 5 minutes away (300)
+            return self.__lobby_expiration - 300
+        return 0
 
     @property
     def lobby_remaining(self):
@@ -350,12 +411,14 @@ class Player:
     def on_picked(self, active):
         self.__active = active
 
-    async def on_match_selected(self, m):
+    async def on_match_selected(self, m, stats=None):
         self.__match = m
         self.__lobby_stamp = 0
         self.__lobby_expiration = 0
         self.__last_lobby_timeout = 0
-        self.__stats = await PlayerStat.get_from_database(self.__id, self.__name)
+        if stats is None:
+            stats = (await PlayerStat.get_many_from_database({self.__id: self.__name}))[self.__id]
+        self.__stats = stats
 
     def copy_ig_info(self, player):
         self.__ig_names = player.ig_names.copy()
@@ -495,7 +558,10 @@ class Player:
                 # Check if the char is already registered:
                 if curr_id in Player._names_checking[faction - 1]:
                     p = Player._names_checking[faction - 1][curr_id]
-                    if p != self:
+                    if not isinstance(p, Player):
+                        # Owner not loaded yet
+                        p = await Player.fetch(p)
+                    if p is not None and p != self:
                         raise CharAlreadyExists(curr_name, p)
 
                 # Add current id to new ids list
@@ -1,5 +1,4 @@
 import modules.config as cfg
-import modules.database as db
 from modules.tools import AutoDict
 
 import operator
@@ -248,11 +247,7 @@ class PlayerScore:
 
     def update_stats(self):
         nb_rounds_played = self.__rounds.count(True)
-        self.stats.add_data(self.team.match.id, self.team.match.round_length * nb_rounds_played, self)
-
-    async def db_update_stats(self):
-        self.update_stats()
-        await db.async_db_call(db.set_element, "player_stats", self.__id, self.stats.get_data())
+        return self.stats.add_data(self.team.match.id, self.team.match.round_length * nb_rounds_played, self)
 
     @property
     def match(self):
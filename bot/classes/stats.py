@@ -2,9 +2,17 @@ import modules.database as db
 import modules.config as cfg
 import modules.tools as tools
 import operator
+from collections import OrderedDict
 
 
 class PlayerStat:
+    __slots__ = ("id", "name", "matches", "matches_won", "matches_lost", "time_played", "times_captain",
+                 "pick_order", "loadouts", "score", "kills", "deaths", "net", "_most_played")
+
+    # Rolling cache of the stats of players who recently played: player id -> PlayerStat
+    _cache = OrderedDict()
+    _cache_size = 500
+
     def __init__(self, p_id, name, data=None):
         self.id = p_id
         self.name = name
@@ -19,6 +27,15 @@ class PlayerStat:
             for l_data in data["loadouts"]:
                 l_id = l_data["id"]
                 self.loadouts[l_id] = LoadoutStats(l_id, l_data)
+            if "totals" in data:
+                self.score = data["totals"]["score"]
+                self.kills = data["totals"]["kills"]
+                self.deaths = data["totals"]["deaths"]
+                self.net = data["totals"]["net"]
+                self._most_played = data["totals"]["most_played_loadout"]
+            else:
+                # Document not migrated yet
+                self.update_totals()
         else:
             self.matches = list()
             self.matches_won = 0
@@ -27,6 +44,11 @@ class PlayerStat:
             self.times_captain = 0
             self.pick_order = tools.AutoDict()
             self.loadouts = dict()
+            self.score = 0
+            self.kills = 0
+            self.deaths = 0
+            self.net = 0
+            self._most_played = None
 
     @property
     def nb_matches_played(self):
@@ -48,50 +70,11 @@ class PlayerStat:
             return 0
         return self.times_captain / self.nb_matches_played
 
-    @property
-    def score(self):
-        score = 0
-        for loadout in self.loadouts.values():
-            score += loadout.score
-        return score
-
-    @property
-    def kills(self):
-        kills = 0
-        for loadout in self.loadouts.values():
-            kills += loadout.kills
-        return kills
-
-    @property
-    def deaths(self):
-        deaths = 0
-        for loadout in self.loadouts.values():
-            deaths += loadout.deaths
-        return deaths
-
-    @property
-    def net(self):
-        net = 0
-        for loadout in self.loadouts.values():
-            net += loadout.score
-        return net
-
     @property
     def most_played_loadout(self):
-        l_dict = tools.AutoDict()
-        for loadout in self.loadouts.values():
-            l_name = cfg.loadout_id[loadout.id]
-            l_dict.auto_add(l_name, loadout.weight)
-        try:
-            name = sorted(l_dict.items(), key=operator.itemgetter(1), reverse=True)[0][0]
-            n_l = name.split('_')
-            for i in range(len(n_l)):
-                n_l[i] = n_l[i][0].upper() + n_l[i][1:]
-            name = " ".join(n_l)
-        except IndexError:
-            name = "None"
-
-        return name
+        if not self._most_played:
+            return "None"
+        return " ".join(word[0].upper() + word[1:] for word in self._most_played.split('_'))
 
     @property
     def mention(self):
@@ -99,24 +82,92 @@ class PlayerStat:
 
     @classmethod
     async def get_from_database(cls, p_id, name):
+        if p_id in cls._cache:
+            cls._cache.move_to_end(p_id)
+            return cls._cache[p_id]
         dta = await db.async_db_call(db.get_element, "player_stats", p_id)
         return cls(p_id, name=name, data=dta)
 
+    @classmethod
+    async def get_many_from_database(cls, players):
+        # players: player id -> name
+        # Stats are taken out of the cache as they will be modified by the match,
+        # they are put back with cache() once the match is saved
+        stats = dict()
+        missing = list()
+        for p_id, name in players.items():
+            cached = cls._cache.pop(p_id, None)
+            if cached:
+                cached.name = name
+                stats[p_id] = cached
+            else:
+                missing.append(p_id)
+        if missing:
+            # Single query for all the missing players
+            data = await db.async_db_call(db.get_elements, "player_stats", missing)
+            for p_id in missing:
+                stats[p_id] = cls(p_id, name=players[p_id], data=data.get(p_id))
+        return stats
+
+    @classmethod
+    def cache(cls, stats_list):
+        for stats in stats_list:
+            cls._cache[stats.id] = stats
+            cls._cache.move_to_end(stats.id)
+        while len(cls._cache) > cls._cache_size:
+            cls._cache.popitem(last=False)
+
     def add_data(self, match_id: int, time_played, player_score):
-        self.matches.append(match_id)
-        if player_score.team.won_match:
+        entry = {"match_id": match_id,
+                 "stamp": player_score.match.round_stamps[0],
+                 "time_played": time_played,
+                 "won": player_score.team.won_match,
+                 "captain": player_score.is_captain,
+                 "pick_index": player_score.pick_index,
+                 "loadouts": [LoadoutStats(l_id, loadout.get_data()).get_data()
+                              for l_id, loadout in player_score.loadouts.items()]
+                 }
+        self.add_entry(entry)
+        # Returned for the recent stats
+        return entry
+
+    def add_entry(self, entry):
+        self.matches.append(entry["match_id"])
+        if entry["won"]:
             self.matches_won += 1
         else:
             self.matches_lost += 1
-        self.time_played += time_played
-        self.times_captain += int(player_score.is_captain)
-        self.pick_order.auto_add(str(player_score.pick_index), 1)
-        for l_id in player_score.loadouts.keys():
-            loadout = player_score.loadouts[l_id]
+        self.time_played += entry["time_played"]
+        self.times_captain += int(entry["captain"])
+        self.pick_order.auto_add(str(entry["pick_index"]), 1)
+        for l_data in entry["loadouts"]:
+            l_id = l_data["id"]
             if l_id in self.loadouts:
-                self.loadouts[l_id].add_data(loadout)
+                self.loadouts[l_id].add_data(l_data)
             else:
-                self.loadouts[l_id] = LoadoutStats(l_id, loadout.get_data())
+                self.loadouts[l_id] = LoadoutStats(l_id, l_data)
+            self.score += l_data["score"]
+            self.kills += l_data["kills"]
+            self.deaths += l_data["deaths"]
+            # Displayed "net" of a player has always been the sum of its loadout scores
+            self.net += l_data["score"]
+        self._most_played = self.__get_most_played()
+
+    def update_totals(self):
+        # Totals are materialized: only computed from the loadouts for documents older than the totals field
+        self.score = sum(loadout.score for loadout in self.loadouts.values())
+        self.kills = sum(loadout.kills for loadout in self.loadouts.values())
+        self.deaths = sum(loadout.deaths for loadout in self.loadouts.values())
+        self.net = sum(loadout.score for loadout in self.loadouts.values())
+        self._most_played = self.__get_most_played()
+
+    def __get_most_played(self):
+        l_dict = tools.AutoDict()
+        for loadout in self.loadouts.values():
+            l_dict.auto_add(cfg.loadout_id[loadout.id], loadout.weight)
+        if not l_dict:
+            return None
+        return sorted(l_dict.items(), key=operator.itemgetter(1), reverse=True)[0][0]
 
     def get_data(self):
         dta = dict()
@@ -130,10 +181,19 @@ class PlayerStat:
         dta["times_captain"] = self.times_captain
         dta["pick_order"] = self.pick_order
         dta["loadouts"] = [loadout.get_data() for loadout in self.loadouts.values()]
+        dta["totals"] = {
+            "score": self.score,
+            "kills": self.kills,
+            "deaths": self.deaths,
+            "net": self.net,
+            "most_played_loadout": self._most_played,
+        }
         return dta
 
 
 class LoadoutStats:
+    __slots__ = ("id", "weight", "kills", "deaths", "net", "score")
+
     def __init__(self, l_id, data=None):
         self.id = l_id
         if data:
@@ -149,12 +209,12 @@ class LoadoutStats:
             self.net = 0
             self.score = 0
 
-    def add_data(self, loadout):
-        self.weight += loadout.weight
-        self.kills += loadout.kills
-        self.deaths += loadout.deaths
-        self.net += loadout.net
-        self.score += loadout.score
+    def add_data(self, data):
+        self.weight += data["weight"]
+        self.kills += data["kills"]
+        self.deaths += data["deaths"]
+        self.net += data["net"]
+        self.score += data["score"]
 
     def get_data(self):
         data = {"id": self.id,
@@ -17,6 +17,8 @@ import modules.lobby as lobby
 import modules.tools as tools
 import modules.accounts_handler as accounts_sheet
 import modules.spam_checker as spam_checker
+import modules.asynchttp as http
+import modules.stat_processor as stat_processor
 import asyncio
 from lib.tasks import loop, Loop
 
@@ -53,9 +55,10 @@ class AdminCog(commands.Cog, name='admin'):
     @commands.guild_only()
     @commands.max_concurrency(number=1, wait=True)
     async def clear(self, ctx):
-        if ctx.channel.id == cfg.channels["lobby"]:  # clear lobby
-            if lobby.clear_lobby():
-                await disp.LB_CLEARED.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+        lb = lobby.get_lobby(ctx.channel.id)
+        if lb:  # clear lobby
+            if lb.clear():
+                await disp.LB_CLEARED.send(ctx, names_in_lobby=lb.get_all_names())
                 return
             await disp.LB_EMPTY.send(ctx)
             return
@@ -75,9 +78,8 @@ class AdminCog(commands.Cog, name='admin'):
         if not player:
             return
         if player.is_lobbied:
-            lobby.remove_from_lobby(player)
-            await disp.RM_LOBBY.send(ContextWrapper.channel(cfg.channels["lobby"]), player.mention,
-                                     names_in_lobby=lobby.get_all_names_in_lobby())
+            lb = lobby.remove_from_lobby(player)
+            await disp.RM_LOBBY.send(lb.channel, player.mention, names_in_lobby=lb.get_all_names())
         if not player.match:
             try:
                 await db.async_db_call(db.remove_element, "users", player.id)
@@ -139,7 +141,7 @@ class AdminCog(commands.Cog, name='admin'):
             all_spammers = spam_checker.debug()
             giga_string = ""
             for k in all_spammers.keys():
-                p = Player.get(k)
+                p = await Player.fetch(k)
                 if p:
                     giga_string += f"\nSpammer: {p.mention}, id[{p.id}], name: [{p.name}], " \
                                    f"spam value: [{all_spammers[k]}]"
@@ -152,28 +154,30 @@ class AdminCog(commands.Cog, name='admin'):
     @commands.command()
     @commands.guild_only()
     async def lobby(self, ctx, *args):
-        if ctx.channel.id != cfg.channels["lobby"]:
-            await disp.WRONG_CHANNEL.send(ctx, ctx.command.name, f'<#{cfg.channels["lobby"]}>')
+        lb = lobby.get_lobby(ctx.channel.id)
+        if not lb:
+            await disp.WRONG_CHANNEL.send(ctx, ctx.command.name,
+                                          ", ".join(f"<#{ch_id}>" for ch_id in lobby.get_lobby_channels()))
             return
         if len(args) > 0 and args[0] == "restore":
             for mention in ctx.message.mentions:
                 try:
                     p_id = mention.id
-                    player = Player.get(int(p_id))
-                    if player and not lobby.is_lobby_stuck() and player.is_registered and not player.is_lobbied:
-                        lobby.add_to_lobby(player)
+                    player = await Player.fetch(int(p_id))
+                    if player and not lb.is_stuck and player.is_registered and not player.is_lobbied:
+                        lb.add(player)
                 except ValueError:
                     pass
-            await disp.LB_QUEUE.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+            await disp.LB_QUEUE.send(ctx, names_in_lobby=lb.get_all_names())
             return
         if len(args) > 0 and args[0] == "save":
-            lb = lobby.get_all_ids_in_lobby()
-            await db.async_db_call(db.set_field, "restart_data", 0, {"last_lobby": lb})
+            # All the queues are saved, as they are all restored on restart
+            await db.async_db_call(db.set_field, "restart_data", 0, {"last_lobby": lobby.get_all_ids_by_lobby()})
             await disp.LB_SAVE.send(ctx)
             return
         if len(args) > 0 and args[0] == "get":
-            lb = lobby.get_all_ids_in_lobby()
-            await disp.LB_GET.send(ctx, " ".join([str(p_id) for p_id in lb]))
+            ids = lb.get_all_ids()
+            await disp.LB_GET.send(ctx, " ".join([str(p_id) for p_id in ids]))
             return
         await disp.WRONG_USAGE.send(ctx, ctx.command.name)
 
@@ -186,15 +190,14 @@ class AdminCog(commands.Cog, name='admin'):
         if len(ctx.message.mentions) != 1:
             await disp.RM_MENTION_ONE.send(ctx)
             return
-        player = Player.get(ctx.message.mentions[0].id)
+        player = await Player.fetch(ctx.message.mentions[0].id)
         if not player:
             # player isn't even registered in the system...
             player = Player(ctx.message.mentions[0].id, ctx.message.mentions[0].name)
             await db.async_db_call(db.set_element, "users", player.id, player.get_data())
         if player.is_lobbied:
-            lobby.remove_from_lobby(player)
-            await disp.RM_LOBBY.send(ContextWrapper.channel(cfg.channels["lobby"]), player.mention,
-                                     names_in_lobby=lobby.get_all_names_in_lobby())
+            lb = lobby.remove_from_lobby(player)
+            await disp.RM_LOBBY.send(lb.channel, player.mention, names_in_lobby=lb.get_all_names())
         if player.match:
             await disp.RM_IN_MATCH.send(ctx)
             return
@@ -255,6 +258,23 @@ class AdminCog(commands.Cog, name='admin'):
             loader.unlock_all(self.client)
             await disp.BOT_UNLOCKED.send(ctx)
             return
+        if arg == "cache":
+            if len(args) == 2 and args[1] == "clear":
+                await http.clear_cache()
+                await disp.BOT_API_CACHE_CLEARED.send(ctx)
+                return
+            stats = http.get_cache_stats()
+            await disp.BOT_API_CACHE.send(ctx, stats["hits"], stats["misses"], stats["coalesced"], stats["size"])
+            return
+        if arg == "recent":
+            if len(ctx.message.mentions) != 1:
+                await disp.RM_MENTION_ONE.send(ctx)
+                return
+            p_id = ctx.message.mentions[0].id
+            stat_player = await classes.PlayerStat.get_from_database(p_id, "N/A")
+            recent_stats = await stat_processor.rebuild_recent_stats(Match, stat_player)
+            await disp.BOT_RECENT_STATS.send(ctx, p_id, recent_stats.nb_matches_played)
+            return
         await disp.WRONG_USAGE.send(ctx, ctx.command.name)
 
     @commands.command()
@@ -276,14 +296,14 @@ class AdminCog(commands.Cog, name='admin'):
                 await disp.ACC_ALL_HANDOUT.send(ctx, "already disabled")
                 return
             lobby.set_lobby_accounts_enabled(False)
-            removed = []
-            for p in lobby.get_all_in_lobby():
-                if not p.has_own_account():
-                    lobby.remove_from_lobby(p)
-                    removed.append(p.mention)
-            await disp.RM_LOBBY_ACC.send(ContextWrapper.channel(cfg.channels["lobby"]),
-                                         ' '.join(removed),
-                                         names_in_lobby=lobby.get_all_names_in_lobby())
+            for lb in lobby.get_all_lobbies():
+                removed = []
+                for p in lb.get_all():
+                    if not p.has_own_account():
+                        lb.remove(p)
+                        removed.append(p.mention)
+                if removed:
+                    await disp.RM_LOBBY_ACC.send(lb.channel, ' '.join(removed), names_in_lobby=lb.get_all_names())
             await disp.ACC_ALL_HANDOUT.send(ctx, "disabled")
             return
         await disp.WRONG_USAGE.send(ctx, ctx.command.name)
@@ -291,7 +311,7 @@ class AdminCog(commands.Cog, name='admin'):
     @commands.command()
     @commands.guild_only()
     async def channel(self, ctx, *args):
-        if ctx.channel.id not in [cfg.channels["register"], cfg.channels["lobby"], *cfg.channels["matches"]]:
+        if ctx.channel.id not in [cfg.channels["register"], *lobby.get_lobby_channels(), *cfg.channels["matches"]]:
             await disp.WRONG_CHANNEL_2.send(ctx, ctx.command.name, f"<#{ctx.channel.id}>")
             return
         if len(args) == 1:
@@ -313,17 +333,19 @@ class AdminCog(commands.Cog, name='admin'):
             arg = args[0]
             loop = asyncio.get_event_loop()
             if arg == "accounts":
-                await loop.run_in_executor(None, accounts_sheet.init, cfg.GAPI_JSON)
+                # Sheet is read in the executor, accounts are modified on the event loop
+                changes = await loop.run_in_executor(None, accounts_sheet.load_sheet, cfg.GAPI_JSON)
+                accounts_sheet.apply_sheet(changes)
                 await disp.BOT_RELOAD.send(ctx, "Accounts")
                 return
             if arg == "weapons":
                 classes.Weapon.clear_all()
-                await loop.run_in_executor(None, db.get_all_elements, classes.Weapon, "static_weapons")
+                await db.async_db_call(db.get_all_elements, classes.Weapon, "static_weapons")
                 await disp.BOT_RELOAD.send(ctx, "Weapons")
                 return
             if arg == "bases":
                 classes.Base.clear_all()
-                await loop.run_in_executor(None, db.get_all_elements, classes.Base, "static_bases")
+                await db.async_db_call(db.get_all_elements, classes.Base, "static_bases")
                 await disp.BOT_RELOAD.send(ctx, "Bases")
                 return
             if arg == "config":
@@ -337,14 +359,13 @@ class AdminCog(commands.Cog, name='admin'):
     @commands.command(aliases=['rm'])
     @commands.guild_only()
     async def remove(self, ctx):
-        if ctx.channel.id == cfg.channels["lobby"]:
+        if lobby.get_lobby(ctx.channel.id):
             player = await get_check_player(ctx)
             if not player:
                 return
             if player.is_lobbied:
-                lobby.remove_from_lobby(player)
-                await disp.RM_LOBBY.send(ContextWrapper.channel(cfg.channels["lobby"]), player.mention,
-                                         names_in_lobby=lobby.get_all_names_in_lobby())
+                lb = lobby.remove_from_lobby(player)
+                await disp.RM_LOBBY.send(lb.channel, player.mention, names_in_lobby=lb.get_all_names())
                 return
             await disp.RM_NOT_LOBBIED.send(ctx)
             return
@@ -395,7 +416,7 @@ async def get_check_player(ctx):
     if len(ctx.message.mentions) != 1:
         await disp.RM_MENTION_ONE.send(ctx)
         return
-    player = Player.get(ctx.message.mentions[0].id)
+    player = await Player.fetch(ctx.message.mentions[0].id)
     if not player:
         # player isn't even registered in the system...
         await disp.RM_NOT_IN_DB.send(ctx)
@@ -22,11 +22,12 @@ class MatchesCog(commands.Cog, name='common'):
     @commands.command(aliases=['i'])
     @commands.guild_only()
     async def info(self, ctx):
-        if ctx.channel.id == cfg.channels["lobby"]:
+        lb = lobby.get_lobby(ctx.channel.id)
+        if lb:
             match_list = list()
-            for ch in cfg.channels["matches"]:
+            for ch in lb.matches:
                 match_list.append(Match.get(ch))
-            await disp.GLOBAL_INFO.send(ctx, lobby=lobby.get_all_names_in_lobby(), match_list=match_list)
+            await disp.GLOBAL_INFO.send(ctx, lobby=lb.get_all_names(), match_list=match_list)
             return
 
         if ctx.channel.id in cfg.channels["matches"]:
@@ -25,7 +25,7 @@ class LobbyCog(commands.Cog, name='lobby'):
         self.client = client
 
     async def cog_check(self, ctx):
-        return ctx.channel.id == cfg.channels['lobby']
+        return lobby.get_lobby(ctx.channel.id) is not None
 
     """
     commands:
@@ -40,10 +40,11 @@ class LobbyCog(commands.Cog, name='lobby'):
     async def join(self, ctx, *args):
         """ Join queue
         """
-        if lobby.get_lobby_len() > cfg.general["lobby_size"]:  # This should not happen EVER
+        lb = lobby.get_lobby(ctx.channel.id)
+        if lb.get_len() > lb.size:  # This should not happen EVER
             await disp.UNKNOWN_ERROR.send(ctx, "Lobby Overflow")
             return
-        player = Player.get(ctx.message.author.id)
+        player = await Player.fetch(ctx.message.author.id)
         if not player:
             await disp.EXT_NOT_REGISTERED.send(ctx,  cfg.channels["register"])
             return
@@ -66,18 +67,20 @@ class LobbyCog(commands.Cog, name='lobby'):
             return
 
         if player.is_lobbied:
-            if time == 0:
+            if player not in lb:
+                await disp.LB_OTHER_QUEUE.send(ctx, lobby.get_player_lobby(player).channel_id)
+            elif time == 0:
                 await disp.LB_ALREADY_IN.send(ctx)
             else:
-                player.lobby_expiration = time
-                await disp.LB_TIMEOUT_OK.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+                lb.set_timeout(player, time)
+                await disp.LB_TIMEOUT_OK.send(ctx, names_in_lobby=lb.get_all_names())
             return
 
-        if lobby.is_lobby_stuck():
+        if lb.is_stuck:
             await disp.LB_STUCK_JOIN.send(ctx)
             return
 
-        names = lobby.add_to_lobby(player, expiration=time)
+        names = lb.add(player, expiration=time)
         await disp.LB_ADDED.send(ctx, names_in_lobby=names)
 
     @commands.command(aliases=['rst'])
@@ -85,33 +88,35 @@ class LobbyCog(commands.Cog, name='lobby'):
     async def reset(self, ctx):
         """ Join queue
         """
-        player = Player.get(ctx.message.author.id)
-        if not player or (player and not player.is_lobbied):
+        lb = lobby.get_lobby(ctx.channel.id)
+        player = await Player.fetch(ctx.message.author.id)
+        if not player or (player and player not in lb):
             await disp.LB_NOT_IN.send(ctx)
             return
-        lobby.reset_timeout(player)
-        await disp.LB_REFRESHED.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+        lb.reset_timeout(player)
+        await disp.LB_REFRESHED.send(ctx, names_in_lobby=lb.get_all_names())
 
     @commands.command(aliases=['l'])
     @commands.guild_only()
     async def leave(self, ctx, *args):
         """ Leave queue
         """
-        player = Player.get(ctx.message.author.id)
+        lb = lobby.get_lobby(ctx.channel.id)
+        player = await Player.fetch(ctx.message.author.id)
         if not player:
             await disp.LB_NOT_IN.send(ctx)
             return
-        if player.is_lobbied:
+        if player in lb:
             time = await check_time(ctx, args)
             if time < 0:
                 return
             elif time == 0:
-                lobby.remove_from_lobby(player)
-                await disp.LB_REMOVED.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+                lb.remove(player)
+                await disp.LB_REMOVED.send(ctx, names_in_lobby=lb.get_all_names())
                 return
             else:
-                player.lobby_expiration = time
-                await disp.LB_TIMEOUT_OK.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+                lb.set_timeout(player, time)
+                await disp.LB_TIMEOUT_OK.send(ctx, names_in_lobby=lb.get_all_names())
                 return
         await disp.LB_NOT_IN.send(ctx)
 
@@ -120,14 +125,15 @@ class LobbyCog(commands.Cog, name='lobby'):
     async def queue(self, ctx):
         """ disp queue
         """
-        if lobby.get_lobby_len() > cfg.general["lobby_size"]:
+        lb = lobby.get_lobby(ctx.channel.id)
+        if lb.get_len() > lb.size:
             await disp.UNKNOWN_ERROR.send(ctx, "Lobby Overflow")
             return
-        if lobby.is_lobby_stuck():
-            await disp.LB_QUEUE.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+        if lb.is_stuck:
+            await disp.LB_QUEUE.send(ctx, names_in_lobby=lb.get_all_names())
             await disp.LB_STUCK.send(ctx)
             return
-        await disp.LB_QUEUE.send(ctx, names_in_lobby=lobby.get_all_names_in_lobby())
+        await disp.LB_QUEUE.send(ctx, names_in_lobby=lb.get_all_names())
 
 
 def setup(client):
@@ -30,7 +30,7 @@ class MutedCog(commands.Cog, name='muted'):
     @commands.command()
     @commands.guild_only()
     async def escape(self, ctx):
-        player = Player.get(ctx.author.id)
+        player = await Player.fetch(ctx.author.id)
         if not player:
             await perms_muted(False, ctx.author.id)
             await remove_roles(ctx.author.id)
@@ -42,7 +42,7 @@ class RegisterCog(commands.Cog, name='register'):
         if len(ctx.message.mentions) != 0:  # Don't want a mention here
             await display.REG_INVALID.send(ctx)
             return
-        player = classes.Player.get(ctx.author.id)
+        player = await classes.Player.fetch(ctx.author.id)
         if not player:
             await display.NO_RULE.send(ctx, f"={ctx.command.name}", cfg.channels["rules"])
             return
@@ -52,7 +52,7 @@ class RegisterCog(commands.Cog, name='register'):
     @commands.command()
     @commands.guild_only()
     async def notify(self, ctx):
-        player = classes.Player.get(ctx.author.id)
+        player = await classes.Player.fetch(ctx.author.id)
         if not player:
             await display.NO_RULE.send(ctx, f"={ctx.command.name}", cfg.channels["rules"])
             return
@@ -68,7 +68,7 @@ class RegisterCog(commands.Cog, name='register'):
     @commands.command()
     @commands.guild_only()
     async def dm(self, ctx):
-        player = classes.Player.get(ctx.author.id)
+        player = await classes.Player.fetch(ctx.author.id)
         if not player:
             await display.NO_RULE.send(ctx, f"={ctx.command.name}", cfg.channels["rules"])
             return
@@ -83,7 +83,7 @@ class RegisterCog(commands.Cog, name='register'):
     @commands.command()
     @commands.guild_only()
     async def quit(self, ctx):
-        player = classes.Player.get(ctx.author.id)
+        player = await classes.Player.fetch(ctx.author.id)
         if not player:
             await display.NO_RULE.send(ctx, f"={ctx.command.name}", cfg.channels["rules"])
             return
@@ -91,10 +91,8 @@ class RegisterCog(commands.Cog, name='register'):
             await display.AWAY_BLOCKED.send(ctx)
             return
         if player.is_lobbied:
-            lobby.remove_from_lobby(player)
-            await display.RM_QUIT.send(ContextWrapper.channel(cfg.channels["lobby"]),
-                                       player.mention,
-                                       names_in_lobby=lobby.get_all_names_in_lobby())
+            lb = lobby.remove_from_lobby(player)
+            await display.RM_QUIT.send(lb.channel, player.mention, names_in_lobby=lb.get_all_names())
         player.is_away = True
         await display.AWAY_GONE.send(ctx, player.mention)
         await role_update(player)
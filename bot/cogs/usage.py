@@ -10,6 +10,7 @@ import modules.config as cfg
 import modules.database as db
 import modules.tools as tools
 import modules.stat_processor as stat_processor
+import modules.leaderboard as leaderboard
 
 from classes import PlayerStat, Player
 
@@ -92,7 +93,7 @@ class RegisterCog(commands.Cog, name='usage'):
             await disp.RM_MENTION_ONE.send(ctx)
             return
 
-        player = Player.get(p_id)
+        player = await Player.fetch(p_id)
         if player:
             name = player.name
         else:
@@ -106,6 +107,19 @@ class RegisterCog(commands.Cog, name='usage'):
 
         await disp.PSB_USAGE.send(ctx, stat_player.mention, req_date, player=stat_player, usages=usages)
 
+    @commands.command(aliases=['lb'])
+    @commands.guild_only()
+    async def leaderboard(self, ctx, *args):
+        metrics = ", ".join(f"`{metric}`" for metric in leaderboard.METRICS.keys())
+        if len(args) != 1 or args[0].lower() not in leaderboard.METRICS:
+            await disp.LEADERBOARD_LIST.send(ctx, metrics)
+            return
+        metric = args[0].lower()
+        title, _, _, fmt = leaderboard.METRICS[metric]
+        lines = [f"`#{i + 1}` <@{p_id}>: {fmt.format(value)}"
+                 for i, (p_id, value) in enumerate(leaderboard.get_top(metric))]
+        await disp.LEADERBOARD.send(ctx, title=title, lines=lines)
+
 
 def setup(client):
     client.add_cog(RegisterCog(client))
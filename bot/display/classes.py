@@ -47,16 +47,16 @@ class Message:
 
             elements['content'] = string
 
-    def get_image(self, ctx, elements, image_path):
-        if image_path:
-            elements['file'] = File(image_path)
+    def get_image(self, ctx, elements, image, filename):
+        if image:
+            elements['file'] = File(image, filename=filename)
 
     def get_elements(self, ctx, **kwargs):
 
         elements = dict()
         self.get_string(ctx, elements, kwargs.get('string_args'))
         self.get_ui(ctx, elements, kwargs.get('ui_kwargs'))
-        self.get_image(ctx, elements, kwargs.get('image_path'))
+        self.get_image(ctx, elements, kwargs.get('image'), kwargs.get('filename'))
 
         return elements
 
@@ -80,6 +80,8 @@ def admin_help(ctx):
                     value='`=channel (un)freeze` - Prevent users from typing in a channel\n'
                           '`=pog version` - Display current version and lock status\n'
                           '`=pog (un)lock` - Prevent users from interacting with the bot (but admins still can)\n'
+                          '`=pog cache`/`cache clear` - Display or clear the Planetside API cache statistics\n'
+                          '`=pog recent @user` - Rebuild the recent stats of a player from the match history\n'
                           '`=accounts (un)lock` - Prevent the usage of POG Account block\n'
                           '`=reload accounts`/`bases`/`weapons`/`config` - Reload specified element from the database\n'
                           '`=spam clear` - Clear the spam filter\n',
@@ -150,7 +152,8 @@ def usage_help(ctx):
                     value=f'`=usage x` - Get last usages of POG account x\n'
                           f'`=usage @user` - Get last usages of the mentioned user\n'
                           f'`=psb @user (date)` - Get user activity formatted for PSB purposes\n'
-                          f'`=stats @user (duration)` - Get player stats for the duration provided',
+                          f'`=stats @user (duration)` - Get player stats for the duration provided\n'
+                          f'`=leaderboard (ranking)` (`=lb`) - Display the top players of a ranking',
                     inline=False)
     return embed
 
@@ -274,7 +277,7 @@ def auto_help(ctx, is_dm=False):
         return dm_help(ctx)
     if ctx.channel_id == cfg.channels['register']:
         return register_help(ctx)
-    if ctx.channel_id == cfg.channels['lobby']:
+    if any(ctx.channel_id == lb["channel"] for lb in cfg.lobbies.values()):
         return lobby_help(ctx)
     if ctx.channel_id in cfg.channels['matches']:
         return match_help(ctx)
@@ -296,7 +299,12 @@ def lobby_list(ctx, names_in_lobby):
     list_of_names = "\n".join(names_in_lobby)
     if list_of_names == "":
         list_of_names = "Queue is empty"
-    embed.add_field(name=f'Lobby: {len(names_in_lobby)} / {cfg.general["lobby_size"]}', value=list_of_names,
+    # Size of the queue of the channel, default queue if not sent in a lobby channel
+    lobby_size = cfg.general["lobby_size"]
+    for lb in cfg.lobbies.values():
+        if lb["channel"] == ctx.channel_id:
+            lobby_size = lb["size"]
+    embed.add_field(name=f'Lobby: {len(names_in_lobby)} / {lobby_size}', value=list_of_names,
                     inline=False)
     return embed
 
@@ -409,7 +417,7 @@ def team_update(ctx, match):
     return embed
 
 
-def jaeger_calendar(arg):
+def jaeger_calendar(arg, stale_since=None):
     """ Returns an embedded link to the formatted Jaeger Calendar
     """
     embed = Embed(colour=Color.blue(), title="Jaeger Calendar",
@@ -419,6 +427,15 @@ def jaeger_calendar(arg):
     embed.add_field(name="Current UTC time",
                     value=date.strftime("%Y-%m-%d %H:%M UTC"),
                     inline=False)
+    if stale_since is not None:
+        if stale_since:
+            last_update = dt.fromtimestamp(stale_since, tz.utc).strftime("%Y-%m-%d %H:%M UTC")
+        else:
+            last_update = "never"
+        embed.add_field(name="Calendar outdated",
+                        value=f"Couldn't refresh the calendar, booked bases may be inaccurate "
+                              f"(last update: {last_update})",
+                        inline=False)
     return embed
 
 
@@ -515,6 +532,16 @@ def psb_usage(ctx, player, usages):
 
     return embed
 
+
+def leaderboard(ctx, title, lines):
+    embed = Embed(title=f"Leaderboard: {title}", colour=Color.blue())
+    if lines:
+        embed.description = "\n".join(lines)
+    else:
+        embed.description = "No player ranked yet!"
+    return embed
+
+
 def player_stats(ctx, stats, recent_stats):
     embed = Embed(title=f"{stats.name}'s Stats:", colour=Color.blue())
     embed.add_field(name="Recent (last 2 weeks)",
@@ -32,6 +32,7 @@ class AllStrings(Enum):
     AWAY_BLOCKED = Message("You can't quit while you're playing a match!")
 
     LB_ALREADY_IN = Message("You are already in queue!")
+    LB_OTHER_QUEUE = Message("You are already in the queue of <#{}>!")
     LB_IN_MATCH = Message("You are already in a match!")
     LB_ADDED = Message("You've been added to the queue!", embed=embeds.lobby_list)
     LB_REMOVED = Message("You've been removed from the queue!", embed=embeds.lobby_list)
@@ -137,6 +138,9 @@ class AllStrings(Enum):
     BOT_DM = Message(None, embed=embeds.direct_message)
     BOT_DM_RECEIVED = Message("Thanks for your message, it was forwarded to POG staff!", ping=False)
     BOT_RELOAD = Message("{} reloaded!")
+    BOT_API_CACHE = Message("API cache: `{}` hits, `{}` misses, `{}` coalesced requests, `{}` cached answers")
+    BOT_API_CACHE_CLEARED = Message("API cache cleared!")
+    BOT_RECENT_STATS = Message("Recent stats of <@{}> rebuilt from `{}` matches!", ping=False)
     BOT_U_DUMB = Message("That's not really nice, I'm doing my best to bring 24/7 Jaeger matches in a friendly "
                          "environment and all the rewards that I get are insults and wickedness :(")
 
@@ -220,6 +224,8 @@ class AllStrings(Enum):
     NO_DATA = Message("No data for this id!")
     ACCOUNT_USAGE = Message("Here is the POG account usage for this user:", embed=embeds.usage)
     DISPLAY_USAGE = Message("<@{}> played {} POG match{} in the last {}. \n(since {})", ping=False)
+    LEADERBOARD = Message(None, embed=embeds.leaderboard)
+    LEADERBOARD_LIST = Message("Available rankings: {}")
     PSB_USAGE = Message("Here is the participation for {}, for 8 weeks leading up to {}:", ping=False, embed=embeds.psb_usage)
 
     NOTIFY_REMOVED = Message("You left Notify!")
@@ -316,10 +322,11 @@ class AllStrings(Enum):
         kwargs = self.value.get_elements(msg, string_args=args, ui_kwargs=kwargs)
         return await msg.edit(**kwargs)
 
-    async def image_send(self, ctx, image_path, *args):
+    async def image_send(self, ctx, image, *args, filename=None):
+        # image can be a file path or a file-like object (filename is then required)
         if not isinstance(ctx, ContextWrapper):
             ctx = ContextWrapper.wrap(ctx)
-        kwargs = self.value.get_elements(ctx, string_args=args, image_path=image_path)
+        kwargs = self.value.get_elements(ctx, string_args=args, image=image, filename=filename)
         return await ctx.send(**kwargs)
 
 
@@ -31,12 +31,15 @@ import modules.jaeger_calendar
 import modules.loader
 import modules.lobby
 import modules.database
+import modules.write_buffer
 import modules.message_filter
 import modules.accounts_handler
 import modules.signal
 import modules.stat_processor
+import modules.leaderboard
 import modules.interactions
 import modules.asynchttp
+import modules.image_maker
 
 # Classes
 from match.classes.match import Match
@@ -122,7 +125,7 @@ def _add_main_handlers(client):
 
     @client.event
     async def on_member_join(member):
-        player = Player.get(member.id)
+        player = await Player.fetch(member.id)
         if not player:
             return
         await modules.roles.role_update(player)
@@ -134,6 +137,7 @@ def _add_main_handlers(client):
 
     # Status update handler (for inactivity)
     async def on_status_update(user):
+        # Only loaded players: the roles of players left in database (away or not registered) don't depend on status
         player = Player.get(user.id)
         if not player:
             return
@@ -161,7 +165,7 @@ def _add_init_handlers(client):
         if modules.loader.is_all_locked():
             raise modules.interactions.InteractionNotAllowed
         # reaction to the rule message?
-        p = Player.get(user.id)
+        p = await Player.fetch(user.id)
         if not p:  # if new player
             # create a new profile
             p = Player(user.id, user.name)
@@ -193,31 +197,39 @@ def _add_init_handlers(client):
 
         _update_rules_message.start(client)
 
-        # Update all players roles
+        # Update the roles of the players loaded at startup, the others are loaded when needed
         for p in Player.get_all_players_list():
             await modules.roles.role_update(p)
         _add_main_handlers(client)
 
-        if not modules.lobby.get_all_names_in_lobby():
+        if not any(lb.get_len() for lb in modules.lobby.get_all_lobbies()):
             try:
                 last_lobby = modules.database.get_field("restart_data", 0, "last_lobby")
             except KeyError:
                 pass
             else:
                 if last_lobby:
-                    for p_id in last_lobby:
-                        try:
-                            player = Player.get(int(p_id))
-                            if player and not modules.lobby.is_lobby_stuck() and player.is_registered:
-                                modules.lobby.add_to_lobby(player)
-                        except ValueError:
-                            pass
-                    modules.database.set_field("restart_data", 0, {"last_lobby": list()})
-
-            names = modules.lobby.get_all_names_in_lobby()
-            if names:
-                await disp.LB_QUEUE.send(ContextWrapper.channel(cfg.channels["lobby"]),
-                                         names_in_lobby=modules.lobby.get_all_names_in_lobby())
+                    # Saved as lobby channel id -> player ids, or as a list of ids for the default queue
+                    if isinstance(last_lobby, list):
+                        last_lobby = {str(cfg.channels["lobby"]): last_lobby}
+                    for ch_id, p_ids in last_lobby.items():
+                        lb = modules.lobby.get_lobby(int(ch_id))
+                        if lb is None:
+                            # Queue removed from the config
+                            continue
+                        for p_id in p_ids:
+                            try:
+                                player = await Player.fetch(int(p_id))
+                                if player and not lb.is_stuck and player.is_registered and not player.is_lobbied:
+                                    lb.add(player)
+                            except ValueError:
+                                pass
+                    modules.database.set_field("restart_data", 0, {"last_lobby": dict()})
+
+            for lb in modules.lobby.get_all_lobbies():
+                names = lb.get_all_names()
+                if names:
+                    await disp.LB_QUEUE.send(lb.channel, names_in_lobby=names)
         modules.loader.unlock_all(client)
         log.info('Client is ready!')
         await disp.RDY.send(ContextWrapper.channel(cfg.channels["spam"]), cfg.VERSION)
@@ -291,6 +303,7 @@ class PogClient(commands.Bot):
         super().__init__(command_prefix=cfg.general["command_prefix"], intents=intents)
 
     async def close(self) -> None:
+        await modules.write_buffer.flush()
         await modules.asynchttp.close_http()
         await super().close()
 
@@ -337,7 +350,7 @@ def main(launch_str=""):
 
     # Initialise db and get all the registered users and all bases from it
     modules.database.init(cfg.database)
-    modules.database.get_all_elements(Player.new_from_data, "users")
+    Player.load_all(lazy=True)
     modules.database.get_all_elements(Base, "static_bases")
     modules.database.get_all_elements(Weapon, "static_weapons")
 
@@ -354,7 +367,13 @@ def main(launch_str=""):
     modules.lobby.init(Match, client)
 
     # Init stat processor
-    modules.stat_processor.init()
+    modules.stat_processor.init(Match)
+
+    # Build leaderboard rankings
+    modules.leaderboard.init()
+
+    # Start image rendering process
+    modules.image_maker.init()
 
     # Add init handlers
     _add_init_handlers(client)
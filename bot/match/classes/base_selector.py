@@ -1,5 +1,3 @@
-from lib.tasks import loop
-from asyncio import get_event_loop
 from logging import getLogger
 from .interactions import CaptainInteractionHandler, InteractionNotAllowed, InteractionInvalid
 
@@ -10,7 +8,7 @@ from .captain_validator import CaptainValidator
 
 from display import AllStrings as disp, ContextWrapper, InteractionContext, views
 
-from modules.jaeger_calendar import get_booked_bases
+import modules.jaeger_calendar as jaeger_calendar
 from modules.roles import is_admin
 import modules.tools as tools
 
@@ -52,7 +50,6 @@ class BaseSelector:
         self.__selection = list()
         self.__match = match
         self.__selected = None
-        self.__booked = list()
         self.__reset_selection()
         self.__validator = CaptainValidator(self.__match)
         self.__base_interaction = CaptainInteractionHandler(self.__match, views.bases_selection,
@@ -60,12 +57,6 @@ class BaseSelector:
                                                             disable_after_use=False,
                                                             is_admin_allowed=True)
         self.__add_callbacks(self.__validator, self.__base_interaction)
-        self._get_booked_from_calendar.start()
-
-    @loop(count=1)
-    async def _get_booked_from_calendar(self):
-        lp = get_event_loop()
-        await lp.run_in_executor(None, get_booked_bases, Base, self.__booked)
 
     def clean(self):
         self.__validator.clean()
@@ -80,10 +71,10 @@ class BaseSelector:
 
     @property
     def is_booked(self):
-        return self.__selected in self.__booked or self.__is_used(self.__selected)
+        return self.is_base_booked(self.__selected)
 
     def is_base_booked(self, base):
-        return base in self.__booked or self.__is_used(base)
+        return base.id in jaeger_calendar.get_booked_bases() or self.__is_used(base)
 
     @property
     def bases_list(self):
@@ -152,7 +143,7 @@ class BaseSelector:
         self.__reset_selection()
         if not mentions:
             mentions = ctx.author.mention
-        await disp.BASE_CALENDAR.send(ctx, mentions)
+        await disp.BASE_CALENDAR.send(ctx, mentions, stale_since=jaeger_calendar.get_stale_since())
         if self.__selection:
             ctx = self.__base_interaction.get_new_context(ctx)
             await disp.BASE_SHOW_LIST.send(ctx)
@@ -186,7 +177,8 @@ class BaseSelector:
         ctx = self.__validator.arm(ctx, picker, base=base)
         await disp.BASE_OK_CONFIRM.send(ctx, base.name, other_captain.mention)
         if self.is_base_booked(base):
-            await disp.BASE_BOOKED.send(ctx, other_captain.mention, base.name)
+            await disp.BASE_BOOKED.send(ctx, other_captain.mention, base.name,
+                                        stale_since=jaeger_calendar.get_stale_since())
 
     def __reset_selection(self):
         if self.__was_selection_modified:
@@ -3,7 +3,7 @@ from logging import getLogger
 from lib.tasks import loop
 from display.strings import AllStrings as disp
 
-from classes import Base, Team, TeamScore
+from classes import Base, Team, TeamScore, PlayerStat
 import modules.database as db
 import modules.roles as roles
 import modules.config as cfg
@@ -11,6 +11,7 @@ import modules.accounts_handler as accounts
 from modules.tools import UnexpectedError
 import modules.lobby as lobby
 import modules.stat_processor as stat_processor
+import modules.leaderboard as leaderboard
 
 from match.processes import CaptainSelection, PlayerPicking, FactionPicking, BasePicking, GettingReady, MatchPlaying
 from match.commands import CommandFactory
@@ -41,8 +42,17 @@ class Match:
         cls._last_match_id = db.get_field("restart_data", 0, "last_match_id")
 
     @classmethod
-    def find_empty(cls):
-        for match in cls.__bound_matches.values():
+    def find_empty(cls, ch_list=None):
+        """
+        Find a free match.
+
+        :param ch_list: Match channels to look into, all match channels if None.
+        :return: The first free match, None if all matches are busy.
+        """
+        if ch_list is None:
+            ch_list = cls.__bound_matches.keys()
+        for ch_id in ch_list:
+            match = cls.__bound_matches[ch_id]
             if match.status is MatchStatus.IS_FREE:
                 return match
         return None
@@ -198,8 +208,7 @@ class MatchData:
         self.round_length = 0
 
     async def push_db(self):
-        await db.async_db_call(db.set_element, "matches", self.id, self.get_data())
-        stat_processor.add_match(self)
+        match_data = self.get_data()
         if self.teams[0].score == self.teams[1].score:
             self.teams[0].set_winner()
             self.teams[1].set_winner()
@@ -207,9 +216,22 @@ class MatchData:
             self.teams[0].set_winner()
         else:
             self.teams[1].set_winner()
+        stats_data = list()
+        recent_updates = dict()
+        for tm in self.teams:
+            for p in tm.players:
+                entry = p.update_stats()
+                stats_data.append(p.stats.get_data())
+                recent_updates[p.id] = stat_processor.get_recent_update(entry)
+        # Match document and all player stats are written at once
+        await db.async_db_call(db.set_elements, {"matches": [match_data], "player_stats": stats_data},
+                               {"recent_stats": recent_updates})
+        stat_processor.add_match(self)
         for tm in self.teams:
             for p in tm.players:
-                await p.db_update_stats()
+                leaderboard.update(p.stats)
+            # Keep the saved stats warm for the next matches
+            PlayerStat.cache(p.stats for p in tm.players)
 
 
 _process_list = [CaptainSelection, PlayerPicking, FactionPicking, BasePicking, GettingReady, MatchPlaying,
@@ -319,8 +341,7 @@ class MatchObjects:
     async def clean_async(self):
         await self.plugin_manager.async_clean()
         on_match_over(self.data.id)
-        for a_player in self.players_with_account:
-            await accounts.terminate_account(a_player)
+        await accounts.terminate_accounts(self.players_with_account)
         self.data.clean()
         self.players_with_account = list()
         self.result_msg = None
@@ -330,7 +351,7 @@ class MatchObjects:
         self.clean_channel.start(display=True)
         self.progress_index = 0
         self.status = MatchStatus.IS_FREE
-        lobby.on_match_free()
+        lobby.on_match_free(self.channel.id)
 
     @loop(count=2, delay=1)
     async def clean_channel(self, display):
@@ -67,7 +67,7 @@ class BenchHandler(InstantiatedCommand):
             await disp.BENCH_MENTION.send(ctx)
             return
 
-        p = Player.get(ctx.message.mentions[0].id)
+        p = await Player.fetch(ctx.message.mentions[0].id)
         if not p:
             await disp.RM_NOT_IN_DB.send(ctx)
             return
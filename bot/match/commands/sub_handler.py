@@ -68,7 +68,7 @@ class SubHandler(InstantiatedCommand):
             await disp.RM_MENTION_ONE.send(ctx)
             return
 
-        subbed = Player.get(ctx.message.mentions[0].id)
+        subbed = await Player.fetch(ctx.message.mentions[0].id)
         if not subbed:
             await disp.RM_NOT_IN_DB.send(ctx)
             return
@@ -86,7 +86,7 @@ class SubHandler(InstantiatedCommand):
         if roles.is_admin(ctx.author):
             player = None
             if len(ctx.message.mentions) == 2:
-                player = Player.get(ctx.message.mentions[1].id)
+                player = await Player.fetch(ctx.message.mentions[1].id)
                 if not player:
                     await disp.RM_NOT_IN_DB.send(ctx)
                     return
@@ -64,7 +64,7 @@ class SwapHandler(InstantiatedCommand):
 
         players = list()
         for mention in ctx.message.mentions:
-            p = Player.get(mention.id)
+            p = await Player.fetch(mention.id)
             if not p:
                 await disp.RM_NOT_IN_DB.send(ctx)
                 return
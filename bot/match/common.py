@@ -2,7 +2,7 @@ from display import AllStrings as disp, ContextWrapper
 import modules.config as cfg
 import discord
 
-from modules.lobby import get_sub, get_all_names_in_lobby
+from modules.lobby import get_sub, get_match_lobby
 from lib.tasks import Loop
 
 from classes import Player
@@ -64,21 +64,22 @@ async def get_substitute(match, subbed, player=None):
     """
     # Get a new player from the lobby, if None available, display
     was_lobbied = (not player) or (player and player.is_lobbied)
-    player = get_sub(player)
+    lobby = get_match_lobby(match.channel.id)
+    player = get_sub(player, lobby)
     if player is None:
         await disp.SUB_NO_PLAYER.send(match.channel, subbed.mention)
         return
 
-    Loop(coro=ping_sub_in_lobby, count=1).start(match, player, was_lobbied)
+    Loop(coro=ping_sub_in_lobby, count=1).start(match, lobby, player, was_lobbied)
 
     await player.on_match_selected(match.proxy)
     return player
 
 
-async def ping_sub_in_lobby(match, new_player, was_lobbied):
+async def ping_sub_in_lobby(match, lobby, new_player, was_lobbied):
     if was_lobbied:
-        await disp.SUB_LOBBY.send(ContextWrapper.channel(cfg.channels["lobby"]), new_player.mention, match.channel.id,
-                                  names_in_lobby=get_all_names_in_lobby())
+        await disp.SUB_LOBBY.send(lobby.channel, new_player.mention, match.channel.id,
+                                  names_in_lobby=lobby.get_all_names())
     if new_player.is_dm:
         ctx = await ContextWrapper.user(new_player.id)
         try:
@@ -124,13 +125,14 @@ async def after_pick_sub(match, subbed, force_player, ctx=None, clean_subbed=Tru
 
 def get_check_player_sync(ctx, match):
     msg = None
+    # Players in a match are always loaded
     player = Player.get(ctx.author.id)
     if not player or (player and not player.is_registered):
         # player not registered
         msg = disp.EXT_NOT_REGISTERED.send(ctx, cfg.channels["register"])
     elif not player.match:
         # if player not in match
-        msg = disp.PK_NO_LOBBIED.send(ctx, cfg.channels["lobby"])
+        msg = disp.PK_NO_LOBBIED.send(ctx, get_match_lobby(match.channel.id).channel_id)
     elif player.match is not match.proxy:
         # if player not in the right match channel
         msg = disp.PK_WRONG_CHANNEL.send(ctx, player.match.channel.id)
@@ -0,0 +1,88 @@
+"""
+| Optional event stream ingester.
+| Subscribes to the Death and FacilityControl events of the match on a Census websocket event stream,
+  and feeds them to the score tracker while the round is being played.
+| The REST API remains the reference: the tracker still polls it and only processes events once.
+"""
+
+import modules.config as cfg
+import modules.asynchttp as http
+from lib.tasks import loop
+from match import MatchStatus
+
+import aiohttp
+import json
+from logging import getLogger
+
+from .plugin import Plugin, PluginDisabled
+
+log = getLogger("pog_bot")
+
+# Server where the matches are played (Jaeger)
+WORLD_ID = "19"
+
+
+class EventStream(Plugin):
+
+    def __init__(self, match):
+        super().__init__(match)
+        if not cfg.stream['url']:
+            raise PluginDisabled("Empty event stream URL in config file!")
+
+    @property
+    def url(self):
+        return f'{cfg.stream["url"]}&service-id=s:{cfg.general["api_key"]}'
+
+    def on_match_started(self):
+        self.listen.start()
+
+    def on_round_over(self):
+        self.listen.cancel()
+
+    def on_clean(self):
+        self.listen.cancel()
+
+    def get_subscriptions(self):
+        characters = [str(p.ig_id) for tm in self.match.teams for p in tm.players if not p.is_benched]
+        return [{"service": "event", "action": "subscribe",
+                 "characters": characters, "eventNames": ["Death"]},
+                {"service": "event", "action": "subscribe",
+                 "worlds": [WORLD_ID], "eventNames": ["FacilityControl"]}]
+
+    @loop(seconds=5)
+    async def listen(self):
+        # If the connection is closed, will reconnect on next iteration
+        async with http.client.ws_connect(self.url, heartbeat=30) as ws:
+            for subscription in self.get_subscriptions():
+                await ws.send_str(json.dumps(subscription))
+            log.info(f"Match {self.match.id}: connected to event stream")
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(msg.data)
+                except json.JSONDecodeError:
+                    log.warning(f"Match {self.match.id}: invalid event stream message: {msg.data}")
+                    continue
+                try:
+                    self.on_message(data)
+                except Exception as e:
+                    # Don't stop listening for the rest of the round because of one bad event
+                    log.error(f"Match {self.match.id}: error when processing event stream message: {data}\n{e}",
+                              exc_info=True)
+        log.warning(f"Match {self.match.id}: event stream closed, will reconnect")
+
+    def on_message(self, data):
+        if data.get("type") != "serviceMessage":
+            # Heartbeat or subscription confirmation
+            return
+        event = data["payload"]
+        if event["event_name"] == "FacilityControl":
+            if int(event["facility_id"]) != self.match.base.id:
+                return
+            # Same field name as the world_event API collection
+            event["faction_new"] = event["new_faction_id"]
+        # Only dispatch while the round is played, other events are retrieved from the API
+        if self.match.status is not MatchStatus.IS_PLAYING:
+            return
+        self.match.process_stream_event(event)
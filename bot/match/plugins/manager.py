@@ -1,10 +1,14 @@
 from .logger import SimpleLogger
 from .ts3_interface import AudioBot
+from .event_stream import EventStream
 from .plugin import PluginDisabled
 from logging import getLogger
 import modules.config as cfg
 
-_plugins = [SimpleLogger, AudioBot]
+_plugins = [SimpleLogger, AudioBot, EventStream]
+
+# Plugins usable in test mode: the event stream can be pointed to the local stand-in server (stream_server.py)
+_test_plugins = [EventStream]
 
 log = getLogger("pog_bot")
 
@@ -20,15 +24,14 @@ class VirtualAttribute:
 
 class PluginManager:
     def __init__(self, match):
-        plugins_enabled = cfg.LAUNCH_STR != "_test"
+        plugins = _test_plugins if cfg.LAUNCH_STR == "_test" else _plugins
         self.match = match
         self.plugins = list()
-        if plugins_enabled:
-            for Plug in _plugins:
-                try:
-                    self.plugins.append(Plug(self.match))
-                except PluginDisabled as e:
-                    log.warning(f"Could not start plugin '{Plug.__name__}'\n{e}")
+        for Plug in plugins:
+            try:
+                self.plugins.append(Plug(self.match))
+            except PluginDisabled as e:
+                log.warning(f"Could not start plugin '{Plug.__name__}'\n{e}")
 
     def on_event(self, event, *args, **kwargs):
         for p in self.plugins:
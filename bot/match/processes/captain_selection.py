@@ -7,12 +7,13 @@ from match import MatchStatus
 from match.common import get_substitute, after_pick_sub, get_check_player
 from .process import Process
 
-from classes import ActivePlayer, Team
+from classes import ActivePlayer, Team, PlayerStat
 
 from lib.tasks import loop
 
 import modules.config as cfg
 import modules.roles as roles
+import modules.lobby as lobby
 from modules.tools import UnexpectedError
 import match.classes.interactions as interactions
 
@@ -70,13 +71,16 @@ class CaptainSelection(Process, status=MatchStatus.IS_CAPTAIN):
 
     @Process.init_loop
     async def init(self):
+        # Get the stats of all players at once
+        stats = await PlayerStat.get_many_from_database({p.id: p.name for p in self.p_list})
         for p in self.p_list:
             self.players[p.id] = p
-            await p.on_match_selected(self.match.proxy)
+            await p.on_match_selected(self.match.proxy, stats[p.id])
 
         # Open match channel
         await roles.modify_match_channel(self.match.channel, view=True)
-        await disp.LB_MATCH_STARTING.send(ContextWrapper.channel(cfg.channels["lobby"]), self.match.channel.id)
+        await disp.LB_MATCH_STARTING.send(lobby.get_match_lobby(self.match.channel.id).channel,
+                                          self.match.channel.id)
 
         players_ping = " ".join(p.mention for p in self.players.values())
         await disp.MATCH_INIT.send(self.match.channel, players_ping)
@@ -52,20 +52,17 @@ class GettingReady(Process, status=MatchStatus.IS_WAITING):
         if self.is_first_round:
             await disp.ACC_SENDING.send(self.match.channel)
 
-            for tm in self.match.teams:
-                for a_player in tm.players:
-                    if not a_player.has_own_account:
-                        success = await accounts.give_account(a_player)
-                        if success:
-                            self.match.players_with_account.append(a_player)
-                        else:
-                            await disp.ACC_NOT_ENOUGH.send(self.match.channel)
-                            await self.clear()
-                            return
+            # Give accounts to the whole match at once
+            a_players = [a_player for tm in self.match.teams for a_player in tm.players
+                         if not a_player.has_own_account]
+            if not await accounts.give_accounts(a_players):
+                await disp.ACC_NOT_ENOUGH.send(self.match.channel)
+                await self.clear()
+                return
+            self.match.players_with_account.extend(a_players)
 
             # Try to send the accounts:
-            for a_player in self.match.players_with_account:
-                await accounts.send_account(self.match.channel, a_player)
+            await accounts.send_accounts(self.match.channel, self.match.players_with_account)
 
             await disp.ACC_SENT.send(self.match.channel)
 
@@ -29,6 +29,7 @@ class MatchPlaying(Process, status=MatchStatus.IS_STARTING):
 
         self.ih = interactions.InteractionHandler(self.match, views.refresh_button, disable_after_use=False)
         self.info_message = None
+        self.score_tracker = None
 
         @self.ih.callback('refresh')
         async def refresh(player, interaction_id, interaction, interaction_values):
@@ -60,6 +61,8 @@ class MatchPlaying(Process, status=MatchStatus.IS_STARTING):
         super().change_status(MatchStatus.IS_PLAYING)
         self.match_loop.start()
         self.auto_info_loop.start()
+        self.score_tracker = census.ScoreTracker(self.match.data, self.match.last_start_stamp)
+        self.score_loop.start()
         self.match.status = MatchStatus.IS_PLAYING
 
     @Process.public
@@ -75,6 +78,24 @@ class MatchPlaying(Process, status=MatchStatus.IS_STARTING):
         else:
             await self.info()
 
+    @loop(seconds=30, delay=1)
+    async def score_loop(self):
+        # Process the round events as they come, only a small delta will be left when the round is over
+        try:
+            await self.score_tracker.poll()
+        except ApiNotReachable as e:
+            log.warning(f"ApiNotReachable caught when polling scores, will retry : {e.url}")
+
+    @Process.public
+    def process_stream_event(self, event):
+        # Events received from the event stream plugin, the REST API remains the reference
+        if not self.score_tracker:
+            return
+        if event["event_name"] == "Death":
+            self.score_tracker.process_event(event)
+        elif event["event_name"] == "FacilityControl":
+            self.score_tracker.process_capture_event(event)
+
     @Process.public
     def get_formatted_time_to_round_end(self):
         secs = self.get_seconds_to_round_end()
@@ -87,13 +108,14 @@ class MatchPlaying(Process, status=MatchStatus.IS_STARTING):
     async def on_match_over(self):
         player_pings = [" ".join(tm.all_playing_pings) for tm in self.match.teams]
         self.auto_info_loop.cancel()
+        self.score_loop.cancel()
         self.ih.clean()
         self.match.plugin_manager.on_round_over()
         round_no = self.match.round_no
         self.match.ready_next_process()
         await disp.MATCH_ROUND_OVER.send(self.match.channel, *player_pings, round_no)
         try:
-            await census.process_score(self.match.data, self.match.last_start_stamp, self.match.channel)
+            await self.score_tracker.finish(self.match.channel)
             try:
                 await i_maker.publish_match_image(self.match)
             except Exception as e:
@@ -114,6 +136,7 @@ class MatchPlaying(Process, status=MatchStatus.IS_STARTING):
         self.start_match_loop.cancel()
         self.auto_info_loop.cancel()
         self.match_loop.cancel()
+        self.score_loop.cancel()
         self.ih.clean()
         player_pings = [" ".join(tm.all_playing_pings) for tm in self.match.teams]
         self.match.clean_critical()
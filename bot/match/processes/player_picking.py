@@ -143,7 +143,7 @@ class PlayerPicking(Process, status=MatchStatus.IS_PICKING):
             return
 
         # Try to get the player object from the mention
-        picked = Player.get(ctx.message.mentions[0].id)
+        picked = await Player.fetch(ctx.message.mentions[0].id)
         if not picked:
             # Player isn't even registered in the system...
             await disp.PK_INVALID.send(ctx)
@@ -1,14 +1,16 @@
 """
 | This module handle the POG Jaeger accounts.
-| Initialize or reload the module with :meth:`init`.
-| Then call :meth:`give_account` and :meth:`send_account` to hand an account to an in-match player.
+| Initialize the module with :meth:`init`, reload the accounts with :meth:`load_sheet` and :meth:`apply_sheet`.
+| Then call :meth:`give_accounts` (or :meth:`give_account`) and :meth:`send_account` to hand an account to
+  in-match players.
 | Use :meth:`terminate_account` to remove the account from the player.
+| :meth:`send_accounts` and :meth:`terminate_accounts` handle several players concurrently.
 """
 
 # External imports
 from logging import getLogger
-from gspread import service_account
-from numpy import array
+import asyncio
+from heapq import heappush, heappop, heapify
 import discord.errors
 
 # Internal imports
@@ -16,6 +18,7 @@ import classes
 from display import AllStrings as disp, ContextWrapper, views
 import modules.database as db
 import modules.config as cfg
+import modules.sheets as sheets
 from modules.tools import UnexpectedError
 
 
@@ -25,34 +28,95 @@ log = getLogger("pog_bot")
 _busy_accounts = dict()
 _available_accounts = dict()
 
+# Heap of (number of unique usages, account id) of the available accounts, outdated entries are skipped
+_accounts_heap = list()
+
+# Reverse index: player id -> ids of the accounts the player already used
+_player_accounts = dict()
+
+# Ids of the accounts removed from the google sheet while in use, dropped when the match is over
+_removed_accounts = set()
+
+# Maximum number of account messages sent or edited at once.
+# Discord rate limits are handled per route by discord.py, this bounds the requests queued at the same time.
+MAX_PARALLEL_MESSAGES = 5
+_discord_semaphore = asyncio.Semaphore(MAX_PARALLEL_MESSAGES)
+
 # Offsets in the google sheet
 X_OFFSET = 1
 Y_OFFSET = 2
 
+# Cells of the accounts in the google sheet: id, username and password columns, from the row Y_OFFSET + 1
+ACCOUNTS_RANGE = "B3:D"
 
-# Will be called at bot init or on account reload
+# Synchronization of the accounts sheet
+_sheet = None
+
+
+# Will be called at bot init
 def init(secret_file: str):
     """
-    Initialize the accounts from the google sheet.
-    If called later, reload the account usernames and passwords.
+    Initialize the accounts from the google sheet, blocking.
+    To reload the accounts while the bot is running, see :meth:`load_sheet` and :meth:`apply_sheet`.
+
+    :param secret_file: Name of the gspread authentication json file.
+    """
+    apply_sheet(load_sheet(secret_file))
+
+
+def load_sheet(secret_file: str) -> tuple:
+    """
+    Get the accounts modified or removed in the google sheet since the last load, and the usages of the new accounts.
+    Blocking, but doesn't modify the accounts: can be run in an executor.
 
     :param secret_file: Name of the gspread authentication json file.
+    :return: Changes, to pass to :meth:`apply_sheet`.
+    :raise UnexpectedError: If the usage of a new account is missing.
     """
-    # Open the google sheet:
-    gc = service_account(filename=secret_file)
-    sh = gc.open_by_key(cfg.database["accounts"])
-    raw_sheet = sh.worksheet("1")
-    sheet_tab = array(raw_sheet.get_all_values())
-
-    # Get total number of accounts
-    num_accounts = sheet_tab.shape[0] - Y_OFFSET
-
-    # Add accounts one by one
-    for i in range(num_accounts):
-        # Get account data
-        a_id_str = sheet_tab[i + Y_OFFSET][X_OFFSET]
-        a_username = sheet_tab[i + Y_OFFSET][X_OFFSET + 1]
-        a_password = sheet_tab[i + Y_OFFSET][X_OFFSET + 2]
+    global _sheet
+    if _sheet is None:
+        # The sheet holds the passwords: not saved to disk
+        _sheet = sheets.SheetSync("accounts", sheets.get_backend(secret_file), cfg.database["accounts"], "1",
+                                  ACCOUNTS_RANGE, key_column=0, persistent=False)
+    changed, removed = _sheet.sync()
+
+    try:
+        # Get the usages of all the new accounts at once
+        new_ids = list()
+        for a_id_str in changed:
+            a_id = int(a_id_str)
+            if a_id not in _available_accounts and a_id not in _busy_accounts:
+                new_ids.append(a_id)
+        usages = db.get_elements("accounts_usage", new_ids, {"unique_usages": 1})
+        for a_id in new_ids:
+            if a_id not in usages or usages[a_id].get("unique_usages") is None:
+                raise UnexpectedError(f"Can't find usage for account {a_id}")
+    except Exception:
+        # Nothing will be applied, report all the rows on next load
+        _sheet.invalidate()
+        raise
+    return changed, removed, usages
+
+
+def apply_sheet(changes: tuple):
+    """
+    Add, update or remove the accounts loaded by :meth:`load_sheet`.
+    Removed accounts are not given anymore, the ones in use are dropped when their match is over.
+    Must be called from the event loop thread, as the accounts are in use there.
+
+    :param changes: Changes returned by :meth:`load_sheet`.
+    """
+    changed, removed, usages = changes
+    for a_id_str in removed:
+        a_id = int(a_id_str)
+        if a_id in _available_accounts:
+            # Its heap entry is skipped from now on
+            del _available_accounts[a_id]
+        elif a_id in _busy_accounts:
+            _removed_accounts.add(a_id)
+        log.info(f"Account [{a_id}] removed from the sheet")
+
+    for a_id_str, (_, a_username, a_password) in changed.items():
         a_id = int(a_id_str)
 
         # Update account
@@ -60,65 +124,93 @@ def init(secret_file: str):
             _available_accounts[a_id].update(a_username, a_password)
         elif a_id in _busy_accounts:
             _busy_accounts[a_id].update(a_username, a_password)
+            # Back in the sheet before the end of its match
+            _removed_accounts.discard(a_id)
         else:
             # If account doesn't exist already, initialize it
-            unique_usages = db.get_field("accounts_usage", a_id, "unique_usages")
-            if unique_usages is None:
-                raise UnexpectedError(f"Can't find usage for account {a_id}")
-            _available_accounts[a_id] = classes.Account(a_id_str, a_username, a_password, unique_usages)
+            unique_usages = usages[a_id]["unique_usages"]
+            for p_id in unique_usages:
+                _player_accounts.setdefault(p_id, set()).add(a_id)
+            _make_available(classes.Account(a_id_str, a_username, a_password, unique_usages))
+
+
+def _make_available(acc: classes.Account):
+    """
+    Put an account in the available accounts.
+
+    :param acc: Account now available.
+    """
+    _available_accounts[acc.id] = acc
+    heappush(_accounts_heap, (acc.nb_unique_usages, acc.id))
+    # Drop outdated entries if they pile up
+    if len(_accounts_heap) > 2 * len(_available_accounts) + 16:
+        _accounts_heap[:] = [(nb, a_id) for nb, a_id in _accounts_heap
+                             if a_id in _available_accounts and _available_accounts[a_id].nb_unique_usages == nb]
+        heapify(_accounts_heap)
+
+
+def _pop_least_used() -> classes.Account:
+    """
+    Get the available account with the least usages.
+
+    :return: Account found, None if no account available.
+    """
+    while _accounts_heap:
+        nb, a_id = heappop(_accounts_heap)
+        acc = _available_accounts.get(a_id)
+        # Skip entries of accounts given since or whose usages changed
+        if acc and acc.nb_unique_usages == nb:
+            return acc
+    return None
 
 
 async def give_account(a_player: classes.ActivePlayer) -> bool:
     """
-    Give an account to a_player. We want each player to use as little accounts as possible.
-    So we try to give an account the player already used.
+    Give an account to a_player, see :meth:`give_accounts`.
 
     :param a_player: Player to give account to.
     :return: True is account given, False if not enough accounts available.
     """
-    # Get player usages
-    unique_usages = await db.async_db_call(db.get_field, "accounts_usage", a_player.id, "unique_usages")
-    if not unique_usages:
-        unique_usages = list()
+    return await give_accounts([a_player])
+
 
-    # Set player usages in the player object
-    a_player.unique_usages = unique_usages
+async def give_accounts(a_players: list) -> bool:
+    """
+    Give an account to each player. We want each player to use as little accounts as possible.
+    So we try to give an account the player already used.
+    Either all players get an account, or none of them.
 
-    # If no available accounts, quit
-    if len(_available_accounts) == 0:
+    :param a_players: Players to give accounts to.
+    :return: True is accounts given, False if not enough accounts available.
+    """
+    # Get all players usages at once
+    usages = await db.async_db_call(db.get_elements, "accounts_usage", [p.id for p in a_players],
+                                    {"unique_usages": 1})
+
+    # Set players usages in the player objects
+    for a_player in a_players:
+        unique_usages = usages.get(a_player.id, dict()).get("unique_usages") or list()
+        a_player.unique_usages = unique_usages
+        if unique_usages:
+            _player_accounts.setdefault(a_player.id, set()).update(unique_usages)
+
+    # If not enough available accounts, quit
+    if len(_available_accounts) < len(a_players):
         return False
 
-    # STEP 1.A: Check for accounts the player already used by the past
-    potential = list()
-    for acc_id in unique_usages:
-        if acc_id in _available_accounts:
-            potential.append(_available_accounts[acc_id])
-
-    # STEP 1.B: Give the account with the biggest usages amongst the accounts found in 1.A
-    if potential:
-        max_obj = potential[0]
-        max_value = max_obj.nb_unique_usages
-        # Find max
-        for acc in potential:
-            n_usages = acc.nb_unique_usages
-            if n_usages > max_value:
-                max_obj = acc
-                max_value = n_usages
-        # Give account, return ok
-        _set_account(max_obj, a_player)
-        return True
-
-    # STEP 2: If we couldn't find an account the player already used, give him the account with the least usages
-    min_obj = list(_available_accounts.values())[0]
-    min_value = min_obj.nb_unique_usages
-    # Find min
-    for acc in _available_accounts.values():
-        n_usages = acc.nb_unique_usages
-        if n_usages < min_value:
-            min_obj = acc
-            min_value = n_usages
-    # Give account, return ok
-    _set_account(min_obj, a_player)
+    # STEP 1: Give the account with the biggest usages amongst the available accounts the player already used
+    remaining = list()
+    for a_player in a_players:
+        potential = [_available_accounts[a_id] for a_id in _player_accounts.get(a_player.id, ())
+                     if a_id in _available_accounts]
+        if potential:
+            _set_account(max(potential, key=lambda acc: acc.nb_unique_usages), a_player)
+        else:
+            remaining.append(a_player)
+
+    # STEP 2: Give the account with the least usages to the players who couldn't get one they already used
+    for a_player in remaining:
+        _set_account(_pop_least_used(), a_player)
     return True
 
 
@@ -149,23 +241,35 @@ async def send_account(channel: discord.TextChannel, a_player: classes.ActivePla
     :param a_player: Player to send the account to.
     """
     msg = None
-    # Try 3 times to send a DM:
-    ctx = a_player.account.get_new_context(await ContextWrapper.user(a_player.id))
-    for j in range(3):
-        try:
-            msg = await disp.ACC_UPDATE.send(ctx, account=a_player.account)
-            break
-        except discord.errors.Forbidden:
-            pass
-    if not msg:
-        # Else validate the account and send it to staff channel instead
-        await disp.ACC_CLOSED.send(channel, a_player.mention)
-        await a_player.account.validate()
-        msg = await disp.ACC_STAFF.send(ContextWrapper.channel(cfg.channels["staff"]),
-                                        f'<@&{cfg.roles["admin"]}>', a_player.mention, account=a_player.account)
-    # Set the account message, log the account:
-    a_player.account.message = msg
-    await disp.ACC_LOG.send(ContextWrapper.channel(cfg.channels["spam"]), a_player.name, a_player.id, a_player.account.id)
+    async with _discord_semaphore:
+        # Try 3 times to send a DM:
+        ctx = a_player.account.get_new_context(await ContextWrapper.user(a_player.id))
+        for j in range(3):
+            try:
+                msg = await disp.ACC_UPDATE.send(ctx, account=a_player.account)
+                break
+            except discord.errors.Forbidden:
+                pass
+        if not msg:
+            # Else validate the account and send it to staff channel instead
+            await disp.ACC_CLOSED.send(channel, a_player.mention)
+            await a_player.account.validate()
+            msg = await disp.ACC_STAFF.send(ContextWrapper.channel(cfg.channels["staff"]),
+                                            f'<@&{cfg.roles["admin"]}>', a_player.mention, account=a_player.account)
+        # Set the account message, log the account:
+        a_player.account.message = msg
+        await disp.ACC_LOG.send(ContextWrapper.channel(cfg.channels["spam"]), a_player.name, a_player.id,
+                                a_player.account.id)
+
+
+async def send_accounts(channel: discord.TextChannel, a_players: list):
+    """
+    Send their accounts to several players concurrently, see :meth:`send_account`.
+
+    :param channel: Current match channel.
+    :param a_players: Players to send the accounts to.
+    """
+    await _gather(send_account(channel, a_player) for a_player in a_players)
 
 
 async def terminate_account(a_player: classes.ActivePlayer):
@@ -174,43 +278,77 @@ async def terminate_account(a_player: classes.ActivePlayer):
 
     :param a_player: Player whose account should be terminated.
     """
-    # Get account and terminate it
-    acc = a_player.account
-    acc.terminate()
-
-    # Remove the reaction handler and update the account message
-    await disp.ACC_UPDATE.edit(acc.message, account=acc)
-
-    # If account was validated, ask the player to log off:
-    if acc.is_validated and acc.message.channel.id != cfg.channels["staff"]:
-        await disp.ACC_OVER.send(await ContextWrapper.user(acc.a_player.id))
-
-    # If account was validated, update the db with usage
-    if acc.is_validated:
-        # Prepare data
-        p_usage = {
-            "id": acc.id,
-            "time_start": acc.last_usage["time_start"],
-            "time_stop": acc.last_usage["time_stop"],
-            "match_id": a_player.match.id
-        }
-        # Update the account element
-        await db.async_db_call(db.push_element, "accounts_usage", acc.id, {"usages": acc.last_usage})
-        try:
-            # Update the player element
-            await db.async_db_call(db.push_element, "accounts_usage", a_player.id, {"usages": p_usage})
-        except db.DatabaseError:
-            # If the player element doesn't exist, create it
-            data = dict()
-            data["_id"] = a_player.id
-            data["unique_usages"] = a_player.unique_usages
-            data["usages"] = [p_usage]
-            await db.async_db_call(db.set_element, "accounts_usage", a_player.id, data)
-
-    # Reset the account state
-    acc.clean()
-    del _busy_accounts[acc.id]
-    _available_accounts[acc.id] = acc
+    await terminate_accounts([a_player])
+
+
+async def terminate_accounts(a_players: list):
+    """
+    Terminate several accounts: ask the users to log off and remove the reactions.
+    Messages are updated concurrently, usages are written to the database at once.
+
+    :param a_players: Players whose accounts should be terminated.
+    """
+    # Get accounts and terminate them
+    accounts = [a_player.account for a_player in a_players]
+    for acc in accounts:
+        acc.terminate()
+
+    try:
+        await _gather(_close_account_messages(acc) for acc in accounts)
+    finally:
+        # Update the db with usages of validated accounts
+        updates = dict()
+        for a_player, acc in zip(a_players, accounts):
+            if not acc.is_validated:
+                continue
+            # Prepare data
+            p_usage = {
+                "id": acc.id,
+                "time_start": acc.last_usage["time_start"],
+                "time_stop": acc.last_usage["time_stop"],
+                "match_id": a_player.match.id
+            }
+            # Update the account element
+            updates[acc.id] = {"$push": {"usages": acc.last_usage}}
+            # Update the player element, create it if it doesn't exist
+            updates[a_player.id] = {"$push": {"usages": p_usage},
+                                    "$setOnInsert": {"unique_usages": a_player.unique_usages}}
+            _player_accounts.setdefault(a_player.id, set()).add(acc.id)
+
+        # Reset the accounts state
+        for acc in accounts:
+            acc.clean()
+            del _busy_accounts[acc.id]
+            if acc.id in _removed_accounts:
+                _removed_accounts.discard(acc.id)
+            else:
+                _make_available(acc)
+
+        if updates:
+            await db.async_db_call(db.set_elements, dict(), {"accounts_usage": updates})
+
+
+async def _close_account_messages(acc: classes.Account):
+    async with _discord_semaphore:
+        # Remove the reaction handler and update the account message
+        await disp.ACC_UPDATE.edit(acc.message, account=acc)
+
+        # If account was validated, ask the player to log off:
+        if acc.is_validated and acc.message.channel.id != cfg.channels["staff"]:
+            await disp.ACC_OVER.send(await ContextWrapper.user(acc.a_player.id))
+
+
+async def _gather(coros):
+    """
+    Run coroutines concurrently, wait for all of them to end even if one fails.
+
+    :param coros: Coroutines to run.
+    :raise Exception: First exception raised by the coroutines, if any.
+    """
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
 
 
 def get_not_validated_accounts(team: classes.Team) -> list:
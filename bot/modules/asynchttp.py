@@ -10,6 +10,9 @@ from json import loads
 from json.decoder import JSONDecodeError
 from logging import getLogger
 from discord.backoff import ExponentialBackoff
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from time import monotonic
 import asyncio
 import modules.config as cfg
 
@@ -66,15 +69,154 @@ async def post_request(url, data=None):
         log.debug(f"POST call at {url} returned: {response}")
 
 
+class ApiCache:
+    """
+    LRU cache for API answers. Answers expire after a time-to-live depending on the API endpoint.
+    Endpoints without time-to-live are not cached.
+    Another cache can be plugged with :meth:`set_cache`, it should implement the same coroutines.
+
+    :param max_size: Maximum number of answers kept.
+    :param ttls: Dictionary of endpoint name -> time-to-live in seconds.
+    """
+    def __init__(self, max_size: int, ttls: dict):
+        self.max_size = max_size
+        self.ttls = ttls
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def get_ttl(self, url: str) -> float:
+        return self.ttls.get(_get_endpoint(url), 0)
+
+    async def get(self, url: str):
+        """
+        Get a cached answer.
+
+        :param url: URL requested.
+        :return: Cached json dictionary, None if not cached or expired.
+        """
+        if self.get_ttl(url) <= 0:
+            # Endpoint not cached
+            return
+        if url in self.__entries:
+            expiration, j_data = self.__entries[url]
+            if expiration > monotonic():
+                self.__entries.move_to_end(url)
+                self.hits += 1
+                return j_data
+            del self.__entries[url]
+        self.misses += 1
+
+    async def set(self, url: str, j_data: dict):
+        """
+        Cache an answer.
+
+        :param url: URL requested.
+        :param j_data: Json dictionary returned for this URL.
+        """
+        ttl = self.get_ttl(url)
+        if ttl <= 0:
+            return
+        self.__entries[url] = (monotonic() + ttl, j_data)
+        self.__entries.move_to_end(url)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    async def clear(self):
+        self.__entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self):
+        return len(self.__entries)
+
+
+#: Time-to-live (in seconds) of API answers, by endpoint
+CACHE_TTLS = {
+    "character": 300,
+    "characters_online_status": 5
+}
+
+_cache = ApiCache(max_size=512, ttls=CACHE_TTLS)
+
+# Requests currently in progress: url -> task
+_in_flight = dict()
+
+# Number of requests which were served by an identical request in progress
+_nb_coalesced = 0
+
+
+def set_cache(cache):
+    """
+    Replace the API cache.
+
+    :param cache: New cache object, should have the same interface as :class:`ApiCache`.
+    """
+    global _cache
+    _cache = cache
+
+
+def get_cache_stats() -> dict:
+    """
+    Get the API cache statistics.
+
+    :return: Dictionary with hits, misses, coalesced requests and cache size.
+    """
+    return {"hits": _cache.hits, "misses": _cache.misses, "coalesced": _nb_coalesced, "size": _cache.size}
+
+
+async def clear_cache():
+    """
+    Empty the API cache and reset its statistics.
+    """
+    global _nb_coalesced
+    await _cache.clear()
+    _nb_coalesced = 0
+
+
 async def api_request_and_retry(url: str, retries: int = 3) -> dict:
     """
     Try to query Planetside2 API.
+    Answers are served from the cache when possible, and concurrent identical requests are merged into one.
 
     :param retries: (Optional, default: 3) Number of retries.
     :param url: URL to get.
-    :return: Json dictionary returned by the API.
+    :return: Json dictionary returned by the API. Should not be modified as it can be shared.
     :raise ApiNotReachable: if the request failed.
     """
+    global _nb_coalesced
+    j_data = await _cache.get(url)
+    if j_data is not None:
+        return j_data
+    if url in _in_flight:
+        _nb_coalesced += 1
+    else:
+        task = asyncio.ensure_future(_request_and_cache(url, retries))
+        _in_flight[url] = task
+        task.add_done_callback(lambda _: _in_flight.pop(url, None))
+    # Shield: one caller being cancelled should not cancel the request for the others
+    return await asyncio.shield(_in_flight[url])
+
+
+# PRIVATE FUNCTIONS:
+def _get_endpoint(url: str) -> str:
+    """
+    Get the API endpoint (collection) of an url.
+
+    :param url: URL to process.
+    :return: Last element of the url path.
+    """
+    return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+async def _request_and_cache(url: str, retries: int) -> dict:
+    j_data = await _request_and_retry(url, retries)
+    await _cache.set(url, j_data)
+    return j_data
+
+
+async def _request_and_retry(url: str, retries: int) -> dict:
     backoff = ExponentialBackoff()
     for i in range(retries):
         try:
@@ -97,7 +239,6 @@ async def api_request_and_retry(url: str, retries: int = 3) -> dict:
     raise ApiNotReachable(url)
 
 
-# PRIVATE FUNCTIONS:
 async def _request(url: str) -> dict:
     """
     Simple HTTP request, parse the result as a json dictionary.
@@ -8,116 +8,247 @@ import modules.config as cfg
 from classes import Weapon
 from display import AllStrings as display, ContextWrapper
 from modules.tools import AutoDict
+import modules.tools as tools
 
 from logging import getLogger
+import asyncio
 
 log = getLogger("pog_bot")
 
+# Maximum number of events requested per API page
+PAGE_SIZE = 500
 
-async def process_score(match: 'match.classes.MatchData', start_time: int, match_channel: 'TextChannel' = None):
+# Maximum number of pages requested concurrently
+PAGE_PARALLELISM = 3
+
+
+async def iter_events(url: str, list_key: str):
+    """
+    Iterate over all the events returned by an API query, page by page.
+    The first page is requested alone, then if more pages are needed they are requested concurrently,
+    by windows of :data:`PAGE_PARALLELISM` pages.
+    Events are yielded in the order returned by the API, as soon as their page is available.
+
+    :param url: Query url, without limit and start parameters.
+    :param list_key: Key of the event list in the API answer.
+    :raise ApiNotReachable: If an API call fail.
+    """
+    start = 0
+    window = 1
+    while True:
+        tasks = [asyncio.ensure_future(http_request(f"{url}&c:limit={PAGE_SIZE}&c:start={start + i * PAGE_SIZE}",
+                                                    retries=5))
+                 for i in range(window)]
+        try:
+            for task in tasks:
+                j_data = await task
+                events = j_data.get(list_key, list())
+                for event in events:
+                    yield event
+                if len(events) < PAGE_SIZE:
+                    # Last page
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
+        start += window * PAGE_SIZE
+        window = PAGE_PARALLELISM
+
+
+class ScoreTracker:
     """
-    Calculate the result score for the MatchData object provided.
+    Incremental score calculation for one round of the MatchData object provided.
+    Call :meth:`poll` during the round to process the events as they come,
+    then :meth:`finish` when the round is over to process the remaining events.
+    Events received from an event stream can also be fed with :meth:`process_event` and :meth:`process_capture_event`.
+    Events are identified by their key so that they are never processed twice.
 
     :param match: MatchData object to fill with scores.
     :param start_time: Round start timestamp: will process score starting form this time.
-    :param match_channel: Match channel for illegal weapons display (optional).
-    :raise ApiNotReachable: If an API call fail.
     """
-    # Temp data structures
-    ig_dict = dict()
-    current_ill_weapons = dict()
 
-    # Start and end timestamps
-    start = start_time
-    end = start + (match.round_length * 60)
+    #: Events younger than this delay (in seconds) are left for the next poll, as the API can receive them late.
+    SETTLE_DELAY = 15
+
+    def __init__(self, match: 'match.classes.MatchData', start_time: int):
+        self.match = match
+        # Start and end timestamps
+        self.start = start_time
+        self.end = start_time + (match.round_length * 60)
+        # Events processed up to this timestamp
+        self.cursor = start_time
+        self.nb_events = 0
+        self.ill_weapons = dict()
+        self.__seen = set()
+        self.__captures = dict()
+        self.__ig_dict = dict()
+
+        # Fill player dictionary (in-game id -> player object)
+        for tm in match.teams:
+            for player in tm.players:
+                if not player.is_disabled:
+                    self.__ig_dict[int(player.ig_id)] = player
+                else:
+                    print(f"{player.name} is disabled!")
+
+    @property
+    def url(self) -> str:
+        return f'http://census.daybreakgames.com/s:{cfg.general["api_key"]}/get/ps2:v2/characters_event/' \
+               f'?character_id={",".join(str(ig_id) for ig_id in self.__ig_dict.keys())}&type=KILL'
+
+    async def poll(self, before: int = None):
+        """
+        Process the events between the cursor and the before timestamp.
+
+        :param before: (Optional) Process events up to this timestamp. Default to settled events only.
+        :raise ApiNotReachable: If an API call fail.
+        """
+        if before is None:
+            before = tools.timestamp_now() - ScoreTracker.SETTLE_DELAY
+        before = min(before, self.end)
+        if before <= self.cursor:
+            return
+        # One second overlap with the previous window, duplicates are filtered out
+        after = max(self.start, self.cursor - 1)
+
+        # Loop through all events retrieved, parsing starts with the first page:
+        async for event in iter_events(f"{self.url}&after={after}&before={before}", "characters_event_list"):
+            self.process_event(event)
+        # Only move the cursor once the whole window was retrieved
+        self.cursor = before
+
+    def process_event(self, event: dict):
+        """
+        Parse one kill event into the loadout objects, if it was not processed already.
+
+        :param event: Kill event, with the fields of the characters_event API collection.
+        """
+        timestamp = int(event["timestamp"])
+        if not self.start <= timestamp <= self.end:
+            # Outside of the round
+            return
+        key = (timestamp, int(event["character_id"]), int(event["attacker_character_id"]))
+        if key in self.__seen:
+            return
+        self.__seen.add(key)
+        self.nb_events += 1
+        _process_kill_event(self.__ig_dict, event, self.ill_weapons)
+
+    def process_capture_event(self, event: dict):
+        """
+        Store one base capture event, it will be merged with the API events when the round is over.
+
+        :param event: Capture event, with the fields of the world_event API collection.
+        """
+        timestamp = int(event["timestamp"])
+        if not self.start <= timestamp <= self.end:
+            # Outside of the round
+            return
+        if int(event["facility_id"]) != self.match.base.id:
+            # Not match base, skip
+            return
+        key = (timestamp, int(event["faction_new"]))
+        self.__captures[key] = event
 
-    # Fill player dictionary (in-game id -> player object)
-    for tm in match.teams:
-        for player in tm.players:
-            if not player.is_disabled:
-                ig_dict[int(player.ig_id)] = player
-            else:
-                print(f"{player.name} is disabled!")
+    async def finish(self, match_channel: 'TextChannel' = None):
+        """
+        Process the events remaining at the end of the round, display the illegal weapons used and add the captures.
 
-    # Request url:
-    url = f'http://census.daybreakgames.com/s:{cfg.general["api_key"]}/get/ps2:v2/characters_event/?character_id=' \
-          f'{",".join(str(p.ig_id) for p in ig_dict.values())}&type=KILL&after={start}&before={end}&c:limit=500'
-    j_data = await http_request(url, retries=5)
+        :param match_channel: Match channel for illegal weapons display (optional).
+        :raise ApiNotReachable: If an API call fail.
+        """
+        await self.poll(self.end)
 
-    if j_data["returned"] == 0:
-        raise ApiNotReachable(f"Empty answer on score calculation (url={url})")
+        if self.nb_events == 0:
+            raise ApiNotReachable(f"Empty answer on score calculation (url={self.url})")
 
-    event_list = j_data["characters_event_list"]
+        # Display all banned-weapons uses for this player:
+        for player in self.ill_weapons.keys():
+            for weap_id in self.ill_weapons[player]:
+                weapon = Weapon.get(weap_id)
+                if match_channel:
+                    await display.SC_ILLEGAL_WE.send(match_channel, player.mention, weapon.name,
+                                                     self.match.id, self.ill_weapons[player][weap_id])
+                    await display.SC_ILLEGAL_WE.send(ContextWrapper.channel(cfg.channels["staff"]), player.mention,
+                                                     weapon.name, self.match.id, self.ill_weapons[player][weap_id])
 
-    ill_weapons = dict()
+        # Also get base captures
+        await get_captures(self.match, self.start, self.end, list(self.__captures.values()))
 
-    # Loop through all events retrieved:
-    for event in event_list:
 
-        # Get opponent player
-        oppo = ig_dict.get(int(event["character_id"]))
-        if not oppo:
-            # interaction with outside player, skip it
-            continue
-        opo_loadout = oppo.get_loadout(int(event["character_loadout_id"]))
+async def process_score(match: 'match.classes.MatchData', start_time: int, match_channel: 'TextChannel' = None):
+    """
+    Calculate the result score for the MatchData object provided, all at once.
 
-        player = ig_dict.get(int(event["attacker_character_id"]))
-        if not player:
-            # interaction with outside player, skip it
-            continue
-        player_loadout = player.get_loadout(int(event["attacker_loadout_id"]))
-
-        # Get weapon
-        weap_id = int(event["attacker_weapon_id"])
-        is_hs = int(event["is_headshot"]) == 1
-        weapon = Weapon.get(weap_id)
-        if not weapon:
-            log.error(f'Weapon not found in database: id={weap_id}')
-            weapon = Weapon.get(0)
-
-        # Parse event into loadout objects
-        if oppo is player:
-            # Player killed themselves
-            player_loadout.add_one_suicide()
-        elif oppo.team is player.team:
-            # Team-kill
-            player_loadout.add_one_tk()
-            opo_loadout.add_one_death(0)
+    :param match: MatchData object to fill with scores.
+    :param start_time: Round start timestamp: will process score starting form this time.
+    :param match_channel: Match channel for illegal weapons display (optional).
+    :raise ApiNotReachable: If an API call fail.
+    """
+    tracker = ScoreTracker(match, start_time)
+    await tracker.finish(match_channel)
+
+
+def _process_kill_event(ig_dict: dict, event: dict, ill_weapons: dict):
+    """
+    Parse one kill event into the loadout objects.
+
+    :param ig_dict: Dictionary in-game id -> player score object.
+    :param event: Kill event.
+    :param ill_weapons: Dictionary player -> illegal weapons used, will be filled if a banned weapon was used.
+    """
+    # Get opponent player
+    oppo = ig_dict.get(int(event["character_id"]))
+    if not oppo:
+        # interaction with outside player, skip it
+        return
+    opo_loadout = oppo.get_loadout(int(event["character_loadout_id"]))
+
+    player = ig_dict.get(int(event["attacker_character_id"]))
+    if not player:
+        # interaction with outside player, skip it
+        return
+    player_loadout = player.get_loadout(int(event["attacker_loadout_id"]))
+
+    # Get weapon
+    weap_id = int(event["attacker_weapon_id"])
+    is_hs = int(event["is_headshot"]) == 1
+    weapon = Weapon.get(weap_id)
+    if not weapon:
+        log.error(f'Weapon not found in database: id={weap_id}')
+        weapon = Weapon.get(0)
+
+    # Parse event into loadout objects
+    if oppo is player:
+        # Player killed themselves
+        player_loadout.add_one_suicide()
+    elif oppo.team is player.team:
+        # Team-kill
+        player_loadout.add_one_tk()
+        opo_loadout.add_one_death(0)
+    else:
+        # Regular kill
+        if not weapon.is_banned:
+            # If weapon is allowed
+            pts = weapon.points
+            player_loadout.add_one_kill(pts, is_hs)
+            opo_loadout.add_one_death(pts)
         else:
-            # Regular kill
-            if not weapon.is_banned:
-                # If weapon is allowed
-                pts = weapon.points
-                player_loadout.add_one_kill(pts, is_hs)
-                opo_loadout.add_one_death(pts)
-            else:
-                # If weapon is banned, add it to illegal weapons list
-                player_loadout.add_illegal_weapon(weapon.id)
-                if player not in ill_weapons:
-                    ill_weapons[player] = AutoDict()
-                ill_weapons[player].auto_add(weapon.id, 1)
-
-    # Display all banned-weapons uses for this player:
-    for player in ill_weapons.keys():
-        for weap_id in ill_weapons[player]:
-            weapon = Weapon.get(weap_id)
-            if match_channel:
-                await display.SC_ILLEGAL_WE.send(match_channel, player.mention, weapon.name,
-                                                 match.id, ill_weapons[player][weap_id])
-                await display.SC_ILLEGAL_WE.send(ContextWrapper.channel(cfg.channels["staff"]), player.mention,
-                                                 weapon.name, match.id, ill_weapons[player][weap_id])
-
-    # Also get base captures
-    await get_captures(match, start, end)
-
-
-async def get_captures(match: 'match.classes.MatchData', start: int, end: int):
+            # If weapon is banned, add it to illegal weapons list
+            player_loadout.add_illegal_weapon(weapon.id)
+            if player not in ill_weapons:
+                ill_weapons[player] = AutoDict()
+            ill_weapons[player].auto_add(weapon.id, 1)
+
+
+async def get_captures(match: 'match.classes.MatchData', start: int, end: int, streamed_events: list = None):
     """
     Find base captures for the MatchData object provided, between start and stop timestamps.
 
     :param match: MatchData object to fill with scores.
     :param start: Round start timestamp.
     :param end: Round end timestamp.
+    :param streamed_events: (Optional) Capture events already received from an event stream, merged with the API ones.
     :raise ApiNotReachable: If an API call fail.
     """
     faction_dict = dict()
@@ -127,23 +258,30 @@ async def get_captures(match: 'match.classes.MatchData', start: int, end: int):
 
     # URL to get events
     url = f'http://census.daybreakgames.com/s:{cfg.general["api_key"]}/get/ps2:v2/world_event/' + \
-          f'?world_id=19&after={start}&before={end}&c:limit=500'
-    j_data = await http_request(url, retries=5)
-    if j_data["returned"] == 0:
+          f'?world_id=19&after={start}&before={end}'
+    # Events are processed from older to newer: the full list is needed
+    nb_events = 0
+    events = dict()
+    async for event in iter_events(url, "world_event_list"):
+        nb_events += 1
+        if int(event.get("facility_id", 0)) != match.base.id:
+            # Not match base, skip
+            continue
+        events[(int(event["timestamp"]), int(event["faction_new"]))] = event
+    # Streamed events are only used if the API missed them
+    for event in streamed_events or list():
+        nb_events += 1
+        events.setdefault((int(event["timestamp"]), int(event["faction_new"])), event)
+    if nb_events == 0:
         # No event
         log.warning(f'No event found for base! (url={url})')
         return
 
-    # Initialize event list
-    event_list = j_data["world_event_list"]
     base_owner = None
 
     # Loop through all events from older to newer
-    for event in event_list[::-1]:
-        base_id = int(event["facility_id"])
-        if base_id != match.base.id:
-            # Not match base, skip
-            continue
+    for key in sorted(reversed(events), key=lambda k: k[0]):
+        event = events[key]
         faction = int(event["faction_new"])
         if faction not in faction_dict:
             # Faction unrelated to the match, skip
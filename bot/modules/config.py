@@ -125,6 +125,24 @@ ts = {
     "matches": list()
 }
 
+#: Contains event stream parameters.
+stream = {
+    "url": ""
+}
+
+#: Contains score image parameters (default values can be overridden in the config file).
+images = {
+    "format": "png",
+    "compression": 6,
+    "scale": 1.0
+}
+
+#: Supported score image formats.
+IMAGE_FORMATS = ("png", "webp")
+
+#: Supported score image resolutions, as fractions of the full 4000 pixels width.
+IMAGE_SCALES = (1.0, 0.5, 0.25)
+
 #: Contains discord channel IDs.
 channels = {
     "lobby": 0,
@@ -141,6 +159,10 @@ channels = {
 #: Contains all channels the bot should read/interact in.
 channels_list = list()
 
+#: Contains the lobby queues: name -> {"channel", "size", "ping", "matches"}.
+#: The "default" queue uses the lobby channel and the match channels of the [Channels] section.
+lobbies = dict()
+
 #: Contains discord roles IDs.
 roles = {
     "admin": 0,
@@ -173,7 +195,8 @@ _collections = {
     "player_stats": "",
     "restart_data": "",
     "accounts_usage": "",
-    "match_logs": ""
+    "match_logs": "",
+    "recent_stats": ""
 }
 
 #: Contains database parameters.
@@ -182,6 +205,7 @@ database = {
     "cluster": "",
     "accounts": "",
     "jaeger_cal": "",
+    "local_sheets": "",
     "collections": _collections
 }
 
@@ -261,6 +285,42 @@ def get_config(launch_str: str):
             except ValueError:
                 _error_incorrect(key, 'Teamspeak', file)
 
+    # Streaming section
+    try:
+        _check_section(config, "Streaming", file)
+    except ConfigError:
+        pass
+    else:
+        for key in stream:
+            try:
+                stream[key] = config['Streaming'][key]
+            except KeyError:
+                _error_missing(key, 'Streaming', file)
+
+    # Images section, all fields are optional
+    try:
+        _check_section(config, "Images", file)
+    except ConfigError:
+        pass
+    else:
+        for key in images:
+            if not config['Images'].get(key):
+                continue
+            try:
+                if isinstance(images[key], int):
+                    images[key] = int(config['Images'][key])
+                elif isinstance(images[key], float):
+                    images[key] = float(config['Images'][key])
+                else:
+                    images[key] = config['Images'][key].lower()
+            except ValueError:
+                _error_incorrect(key, 'Images', file)
+        if images["format"] not in IMAGE_FORMATS:
+            _error_incorrect("format", 'Images', file)
+        if not 0 <= images["compression"] <= 9:
+            _error_incorrect("compression", 'Images', file)
+        if images["scale"] not in IMAGE_SCALES:
+            _error_incorrect("scale", 'Images', file)
 
     # Channels section
     _check_section(config, "Channels", file)
@@ -282,6 +342,39 @@ def get_config(launch_str: str):
         except ValueError:
             _error_incorrect(key, 'Channels', file)
 
+    # Lobbies section
+    lobbies.clear()
+    lobbies["default"] = {"channel": channels["lobby"],
+                          "size": general["lobby_size"],
+                          "ping": general["lobby_size"] - general["lobby_size"] // 3,
+                          "matches": channels["matches"].copy()}
+    try:
+        _check_section(config, "Lobbies", file)
+    except ConfigError:
+        pass
+    else:
+        for key in config['Lobbies']:
+            if key in lobbies:
+                _error_incorrect(key, 'Lobbies', file)
+            try:
+                # Format: lobby channel / size / match channels separated by commas [/ auto ping threshold]
+                fields = config['Lobbies'][key].split('/')
+                size = int(fields[1])
+                lobbies[key] = {"channel": int(fields[0]),
+                                "size": size,
+                                "ping": int(fields[3]) if len(fields) > 3 else size - size // 3,
+                                "matches": [int(m) for m in fields[2].split(',')]}
+            except (ValueError, IndexError):
+                _error_incorrect(key, 'Lobbies', file)
+            if lobbies[key]["channel"] in channels_list:
+                _error_incorrect(key, 'Lobbies', file)
+            channels_list.append(lobbies[key]["channel"])
+            for m in lobbies[key]["matches"]:
+                if m in channels_list:
+                    _error_incorrect(key, 'Lobbies', file)
+                channels["matches"].append(m)
+                channels_list.append(m)
+
     # Roles section
     _check_section(config, "Roles", file)
     for key in roles:
@@ -314,7 +407,10 @@ def get_config(launch_str: str):
     _check_section(config, "Database", file)
 
     for key in database:
-        if key != "collections":
+        if key == "local_sheets":
+            # Optional: read the sheets from local csv files instead of google sheets
+            database[key] = config['Database'].get(key, "")
+        elif key != "collections":
             try:
                 database[key] = config['Database'][key]
             except KeyError:
@@ -3,8 +3,10 @@
 """
 
 # External modules
-from pymongo import MongoClient
-from asyncio import get_event_loop
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor, Future
 from logging import getLogger
 from typing import Callable
 
@@ -13,6 +15,17 @@ log = getLogger("pog_bot")
 # dict for the collections
 _collections = dict()
 
+# MongoClient, and whether the deployment supports multi-document transactions
+_client = None
+_transactions_supported = False
+
+# Number of threads dedicated to database I/O
+DB_WORKERS = 4
+
+# Dedicated executor: database calls don't compete with image rendering or gspread calls
+# for the shared default executor
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="pog_db")
+
 
 class DatabaseError(Exception):
     """
@@ -31,22 +44,36 @@ def init(config: dict):
 
     :param config: Dictionary containing database config. Check :data:`modules.config.database`.
     """
+    global _client
+    global _transactions_supported
     cluster = MongoClient(config["url"])
     db = cluster[config["cluster"]]
     for collection in config["collections"]:
         _collections[collection] = db[config["collections"][collection]]
+    _client = cluster
+    # Transactions are only available on replica sets and sharded clusters
+    try:
+        hello = cluster.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    except PyMongoError as e:
+        log.warning(f"Could not determine database topology, transactions disabled: {e}")
+        _transactions_supported = False
 
 
-def get_all_elements(init_class_method: Callable, collection: str):
+def get_all_elements(init_class_method: Callable, collection: str, query: dict = None, projection: dict = None,
+                     batch_size: int = 0):
     """
     Get all elements of a given collection.
 
     :param init_class_method: The data will be passed to this method.
     :param collection: Collection name.
+    :param query: (Optional) Only get the elements matching this query.
+    :param projection: (Optional) Only get these fields of the elements.
+    :param batch_size: (Optional) Number of elements to fetch per cursor batch. 0 lets the server decide.
     :raise DatabaseError: If an error occurs while passing data.
     """
     # Get all elements
-    items = _collections[collection].find()
+    items = _collections[collection].find(query, projection, batch_size=batch_size)
     # Pass them to the method
     try:
         for result in items:
@@ -58,13 +85,25 @@ def get_all_elements(init_class_method: Callable, collection: str):
 async def async_db_call(call: Callable, *args):
     """
     Call a db function asynchronously.
+    The call is run in the thread pool dedicated to the database.
 
     :param call: Function to call.
     :param args: Args to pass to the called function.
     :return: Return the result of the call.
     """
-    loop = get_event_loop()
-    return await loop.run_in_executor(None, call, *args)
+    loop = get_running_loop()
+    return await loop.run_in_executor(_executor, call, *args)
+
+
+def submit_db_call(call: Callable, *args) -> Future:
+    """
+    Start a db function in the thread pool dedicated to the database, without waiting for it.
+
+    :param call: Function to call.
+    :param args: Args to pass to the called function.
+    :return: Future of the call, can be waited on from any thread.
+    """
+    return _executor.submit(call, *args)
 
 
 def force_update(collection: str, elements):
@@ -88,9 +127,8 @@ def set_field(collection: str, e_id: int, doc: dict):
     :param doc: Data to set.
     :raise DatabaseError: If the element is not in the collection.
     """
-    if _collections[collection].count_documents({"_id": e_id}) != 0:
-        _collections[collection].update_one({"_id": e_id}, {"$set": doc})
-    else:
+    result = _collections[collection].update_one({"_id": e_id}, {"$set": doc})
+    if result.matched_count == 0:
         raise DatabaseError(f"set_field: Element {e_id} doesn't exist in collection {collection}")
 
 
@@ -103,9 +141,8 @@ def unset_field(collection: str, e_id: int, doc: dict):
     :param doc: Data to unset.
     :raise DatabaseError: If the element is not in the collection.
     """
-    if _collections[collection].count_documents({"_id": e_id}) != 0:
-        _collections[collection].update_one({"_id": e_id}, {"$unset": doc})
-    else:
+    result = _collections[collection].update_one({"_id": e_id}, {"$unset": doc})
+    if result.matched_count == 0:
         raise DatabaseError(f"set_field: Element {e_id} doesn't exist in collection {collection}")
 
 
@@ -118,9 +155,8 @@ def push_element(collection: str, e_id: int, doc: dict):
     :param doc: Data to push. The key should be the field to push to.
     :raise DatabaseError: If the element is not in the collection.
     """
-    if _collections[collection].count_documents({"_id": e_id}) != 0:
-        _collections[collection].update_one({"_id": e_id}, {"$push": doc})
-    else:
+    result = _collections[collection].update_one({"_id": e_id}, {"$push": doc})
+    if result.matched_count == 0:
         raise DatabaseError(f"set_field: Element {e_id} doesn't exist in collection {collection}")
 
 
@@ -132,12 +168,23 @@ def get_element(collection: str, item_id: int) -> (dict, None):
     :param item_id: Element id.
     :return: Element found, or None if not found.
     """
-    if _collections[collection].count_documents({"_id": item_id}) == 0:
-        return
     item = _collections[collection].find_one({"_id": item_id})
     return item
 
 
+def get_elements(collection: str, item_ids: list, projection: dict = None) -> dict:
+    """
+    Get several elements with a single query.
+
+    :param collection: Collection name.
+    :param item_ids: Elements ids.
+    :param projection: (Optional) Only get these fields of the elements.
+    :return: Dictionary of element id -> element, elements not found are missing.
+    """
+    items = _collections[collection].find({"_id": {"$in": list(item_ids)}}, projection)
+    return {item["_id"]: item for item in items}
+
+
 def get_field(collection: str, e_id: int, specific: str):
     """
     Get one field of a single element.
@@ -147,10 +194,10 @@ def get_field(collection: str, e_id: int, specific: str):
     :param specific: Field name.
     :return: Element found, or None if not found.
     """
-    if _collections[collection].count_documents({"_id": e_id}) == 0:
+    item = _collections[collection].find_one({"_id": e_id}, {"_id": 0, specific: 1})
+    if item is None:
         return
-    item = _collections[collection].find_one({"_id": e_id}, {"_id": 0, specific: 1})[specific]
-    return item
+    return item[specific]
 
 
 def set_element(collection: str, e_id: id, data: dict):
@@ -161,10 +208,65 @@ def set_element(collection: str, e_id: id, data: dict):
     :param e_id: Element id.
     :param data: Element data.
     """
-    if _collections[collection].count_documents({"_id": e_id}) != 0:
-        _collections[collection].replace_one({"_id": e_id}, data)
+    _collections[collection].replace_one({"_id": e_id}, data, upsert=True)
+
+
+def set_elements(elements: dict, updates: dict = None):
+    """
+    Set several whole elements at once, possibly across several collections.
+    Replace the elements which already exist.
+    Each collection is written with a single bulk write, all inside one transaction if the deployment supports it.
+
+    :param elements: Dictionary of collection name -> list of elements data.
+    :param updates: (Optional) Dictionary of collection name -> {element id: update document} to write as well.
+        Elements which don't exist are created.
+    """
+    def _write(session=None):
+        requests = dict()
+        for collection, data_list in elements.items():
+            requests[collection] = [ReplaceOne({"_id": data["_id"]}, data, upsert=True) for data in data_list]
+        for collection, update_dict in (updates or dict()).items():
+            requests.setdefault(collection, list()).extend(UpdateOne({"_id": e_id}, update, upsert=True)
+                                                           for e_id, update in update_dict.items())
+        for collection, request_list in requests.items():
+            if request_list:
+                _collections[collection].bulk_write(request_list, ordered=False, session=session)
+
+    if _transactions_supported:
+        with _client.start_session() as session:
+            session.with_transaction(_write)
     else:
-        _collections[collection].insert_one(data)
+        _write()
+
+
+def update_element(collection: str, e_id: int, update, upsert: bool = False):
+    """
+    Apply an update to a single element, in one round trip.
+
+    :param collection: Collection name.
+    :param e_id: Element id.
+    :param update: Update document (for example {"$set": {...}}) or aggregation pipeline.
+    :param upsert: Create the element if it doesn't exist.
+    :raise DatabaseError: If the element is not in the collection and upsert is False.
+    """
+    result = _collections[collection].update_one({"_id": e_id}, update, upsert=upsert)
+    if result.matched_count == 0 and result.upserted_id is None:
+        raise DatabaseError(f"Element {e_id} doesn't exist in collection {collection}")
+
+
+def update_elements(collection: str, updates: dict) -> int:
+    """
+    Update several elements of a collection with a single bulk write.
+
+    :param collection: Collection name.
+    :param updates: Dictionary of element id -> update document (for example {"$set": {...}}).
+    :return: Number of elements which were not found in the collection.
+    """
+    if not updates:
+        return 0
+    requests = [UpdateOne({"_id": e_id}, update) for e_id, update in updates.items()]
+    result = _collections[collection].bulk_write(requests, ordered=False)
+    return len(requests) - result.matched_count
 
 
 def remove_element(collection: str, e_id: int):
@@ -175,7 +277,6 @@ def remove_element(collection: str, e_id: int):
     :param e_id: Element id.
     :raise DatabaseError: If the element is not in the collection.
     """
-    if _collections[collection].count_documents({"_id": e_id}) != 0:
-        _collections[collection].delete_one({"_id": e_id})
-    else:
+    result = _collections[collection].delete_one({"_id": e_id})
+    if result.deleted_count == 0:
         raise DatabaseError(f"Element {e_id} doesn't exist in collection {collection}")
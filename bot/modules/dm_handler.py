@@ -1,5 +1,4 @@
 from classes import Player, PlayerStat
-from match.classes import Match
 import modules.config as cfg
 from display import AllStrings as disp, ContextWrapper
 from logging import getLogger
@@ -20,7 +19,7 @@ async def on_dm(message):
     elif message.content.lower().startswith(("modmail ", "dm ", "staff ")):
         i = message.content.index(' ')
         message.content = message.content[i+1:]
-        player = Player.get(message.author.id)
+        player = await Player.fetch(message.author.id)
         await disp.BOT_DM.send(ContextWrapper.channel(cfg.channels["staff"]), player=player, msg=message)
         await disp.BOT_DM_RECEIVED.send(message.author)
     elif message.content.lower().startswith(("help", "h")):
@@ -29,11 +28,11 @@ async def on_dm(message):
 
 
 async def on_stats(user):
-    player = Player.get(user.id)
+    player = await Player.fetch(user.id)
     if not player:
         await disp.NO_RULE.send(user, "stats", cfg.channels["rules"])
         return
     log.info(f"Stats request from player id: [{player.id}], name: [{player.name}]")
     stat_player = await PlayerStat.get_from_database(player.id, player.name)
-    recent_stats = await stat_processor.get_new_stats(Match, stat_player)
+    recent_stats = await stat_processor.get_recent_stats(stat_player)
     await disp.DISPLAY_STATS.send(user, stats=stat_player, recent_stats=recent_stats)
@@ -0,0 +1,431 @@
+"""
+| Drawing of the score images.
+| This module only depends on PIL: it is imported by the worker process rendering the images.
+| Everything independent of the match results (fonts, icons, background, name measurements) is cached.
+| Images can be drawn at a fraction of the full resolution, all coordinates below being given at full resolution.
+| The last image of each match is kept: when the same match is drawn again (half-match image, then end of match
+  image), only the regions which changed are redrawn.
+"""
+
+# External imports
+from PIL import Image, ImageDraw, ImageFont
+from datetime import datetime as dt
+from functools import lru_cache
+from collections import OrderedDict
+from io import BytesIO
+import time
+
+# Font sizes we will use
+BIG_FONT = 100
+FONT = 80
+SMALL_FONT = 60
+
+# Colors we will use
+white = (255, 255, 255)
+yellow = (254, 227, 76)
+grey1 = (219, 219, 219)
+grey2 = (178, 178, 178)
+yellow_light = (254, 244, 186)
+
+# Constant spacings we will use
+Y_SPACING = 120
+Y_BIG_SPACE = 150
+X_OFFSET = 100
+X_MAX = 4000
+B_THICKNESS = 25
+
+offsets = [300, 300, 300, 400, 300]
+
+LOADOUTS = ["infiltrator", "light_assault", "medic", "engineer", "heavy_assault", "max"]
+
+# Number of match images kept for partial redraws
+MAX_CANVASES = 4
+
+# match id -> (render data, scale, image)
+_canvases = OrderedDict()
+
+
+def _s(value: int, scale: float) -> int:
+    """
+    Convert a full resolution coordinate to the given scale.
+    """
+    return round(value * scale)
+
+
+# Cached elements:
+
+@lru_cache(maxsize=None)
+def _get_font(size: int, scale: float) -> ImageFont:
+    return ImageFont.truetype("../fonts/OpenSans2.ttf", _s(size, scale))
+
+
+@lru_cache(maxsize=None)
+def _get_logo(scale: float) -> Image:
+    logo = Image.open("../logos/bot.png")
+    return logo.resize((_s(600, scale), _s(600, scale)))
+
+
+@lru_cache(maxsize=None)
+def _get_loadout_icon(loadout: str, scale: float) -> Image:
+    loadout_img = Image.open(f"../media/{loadout}.png")
+    return loadout_img.resize((_s(80, scale), _s(80, scale)))
+
+
+def _get_y_off(team_sizes: tuple, team_id: int) -> int:
+    """
+    Get the y coordinate of a team block.
+
+    :param team_sizes: Number of players of each team.
+    :param team_id: Team index.
+    :return: y-coordinate offset of the team.
+    """
+    y_space = 0
+    # Calculate spacing depending on the number of players of each team
+    for k in range(team_id):
+        y_space += Y_SPACING * team_sizes[k] + 480
+    return 325 + Y_SPACING * 4 + y_space
+
+
+@lru_cache(maxsize=8)
+def _get_background(team_sizes: tuple, scale: float) -> Image:
+    """
+    Draw everything which doesn't depend on the match results: background, logo, borders, team lines and titles.
+    Only depends on the number of players of each team.
+
+    :param team_sizes: Number of players of each team.
+    :param scale: Resolution scale.
+    :return: Background image, to be copied before drawing on it.
+    """
+    x_max = _s(X_MAX, scale)
+    y_max = _s(_get_y_off(team_sizes, len(team_sizes)), scale)
+    thickness = _s(B_THICKNESS, scale)
+    img = Image.new('RGB', (x_max, y_max), color=(17, 0, 68))
+
+    # Add POG logo
+    logo = _get_logo(scale)
+    img.paste(logo, (_s(180, scale), _s(100, scale)), logo)
+
+    draw = ImageDraw.Draw(img)
+
+    # Draw enclosing square
+    draw.line([thickness, 0, thickness, y_max], fill=(0, 0, 0), width=thickness * 2)
+    draw.line([0, thickness, x_max, thickness], fill=(0, 0, 0), width=thickness * 2)
+    draw.line([0, y_max - thickness, x_max, y_max - thickness], fill=(0, 0, 0), width=thickness * 2)
+    draw.line([x_max - thickness, 0, x_max - thickness, y_max], fill=(0, 0, 0), width=thickness * 2)
+
+    # Team lines and titles
+    for team_id in range(len(team_sizes)):
+        y_offset = _get_y_off(team_sizes, team_id)
+        y_line = _s(y_offset - 20, scale)
+        draw.line([thickness * 2, y_line, x_max - thickness * 2, y_line], fill=white, width=_s(10, scale))
+        y_line = _s(y_offset + Y_BIG_SPACE * 2 - 20, scale)
+        draw.line([_s(100, scale), y_line, _s(X_MAX - 100, scale), y_line], fill=yellow, width=_s(10, scale))
+        _draw_score_line(draw, X_OFFSET + 2200, y_offset, ["Score", "Net", "Kills", "Deaths", "HSR"],
+                         _get_font(FONT, scale), yellow, scale)
+    return img
+
+
+# Utility functions:
+
+def _draw_score_line(draw: ImageDraw.ImageDraw, x_start: int, y: int, values: list, d_font: ImageFont,
+                     fill_color: tuple, scale: float):
+    """
+    Draw several text elements on the same line.
+
+    :param draw: ImageDraw object to draw on.
+    :param x_start: x coordinate in pixel, to start drawing from.
+    :param y: y coordinate in pixel for the elements to draw.
+    :param values: list of strings: elements to draw.
+    :param d_font: Font used for drawing the elements.
+    :param fill_color: Tuple: RGB color of the elements.
+    :param scale: Resolution scale.
+    """
+    off = 0
+    for i in range(len(values)):
+        draw.text((_s(x_start + off, scale), _s(y, scale)), values[i], font=d_font, fill=fill_color)
+        off += offsets[i]
+
+
+@lru_cache(maxsize=1024)
+def _cut_off_string(text: str, d_font: ImageFont, threshold: int) -> str:
+    """
+    Cut a text string depending on a maximum length:
+    If the text length is more than the threshold, the text will be cut.
+    Results are cached, as the same names are drawn on every image.
+
+    Example: "MyVeryLongName" will become "MyVeryL...", while "ShorterName" will not be changed.
+
+    Returns the result text.
+
+    :param text: Text to process.
+    :param d_font: Font for drawing the text.
+    :param threshold: The text returned length will not be more than this threshold.
+    :return: The cut text if it doesn't fit the threshold, the full text if it does.
+    """
+
+    # We use binary search to find the proper length
+    def _binary_search(base: int, i: int):
+        # Get current size
+        size = d_font.getsize(text[:base + i] + "...")[0]
+        # Get next size
+        size1 = d_font.getsize(text[:base + i + 1] + "...")[0]
+        # If target is between both sizes, return
+        if size <= threshold <= size1:
+            return base + i
+        # If we reached the minimum resolution, return (one letter)
+        if i == 1:
+            return base + i + 1
+        # Else if text is too big, try smaller
+        if size >= threshold:
+            return _binary_search(base, i // 2)
+        # Else if text is too small, try bigger
+        if size <= threshold:
+            return _binary_search(base + i, i // 2)
+
+    # If the text already fits the threshold, return it
+    if d_font.getsize(text)[0] <= threshold:
+        return text
+
+    # Else find where to cut the text off
+    res = _binary_search(0, len(text))
+    # Return the cut text
+    return text[:res] + "..."
+
+
+def _get_header(data: dict) -> tuple:
+    """
+    Get the part of the render data shown in the header of the image.
+    """
+    return (data["id"], data["base"], tuple(data["round_stamps"]), data["round_length"],
+            tuple((tm["name"], tm["cap"]) for tm in data["teams"]))
+
+
+def _get_team_header(team: dict) -> tuple:
+    """
+    Get the part of the team render data shown on the team line.
+    """
+    return team["name"], team["faction"], team["score"], team["net"], team["kills"], team["deaths"], team["hsr"]
+
+
+def _erase(img: Image, background: Image, box: tuple):
+    """
+    Restore a region of an image from its background.
+
+    :param img: Image to erase the region from.
+    :param background: Background the image was drawn on.
+    :param box: Region (left, top, right, bottom), already scaled.
+    """
+    img.paste(background.crop(box), box[:2])
+
+
+def _header_display(draw: ImageDraw, data: dict, scale: float):
+    """
+    Draw the general information of the match.
+
+    :param draw: Draw object.
+    :param data: Match render data.
+    :param scale: Resolution scale.
+    """
+    big_font = _get_font(BIG_FONT, scale)
+    small_font = _get_font(SMALL_FONT, scale)
+
+    # Draw general information
+    x_title = (_s(X_MAX, scale) - big_font.getsize(f"Planetside Open Games - Match {data['id']}")[0]) // 2
+    x = x_title + _s(100, scale)
+    draw.text((x_title, _s(100, scale)), f"Planetside Open Games - Match {data['id']}", font=big_font, fill=white)
+    draw.text((x, _s(200 + 100, scale)), f"Base: {data['base']}", font=small_font, fill=white)
+
+    # Draw round stamps times
+    for i in range(len(data["round_stamps"])):
+        rs = data["round_stamps"][i]
+        text = dt.utcfromtimestamp(rs).strftime("%Y-%m-%d %H:%M")
+        draw.text((x, _s(200 + 100 * (2 + i), scale)), f"Round {i + 1}: {text}", font=small_font, fill=white)
+
+    # If match is still ongoing, draw Round 2 as "In progress..."
+    if len(data["round_stamps"]) < 2:
+        draw.text((x, _s(200 + 100 * 3, scale)), f"Round 2: ", font=small_font, fill=white)
+        draw.text((x + small_font.getsize("Round 2: ")[0], _s(200 + 100 * 3, scale)), f"In progress...",
+                  font=small_font, fill=yellow)
+
+    # Draw round length
+    draw.text((x, _s(200 + 100 * 4, scale)), f"Round length: {data['round_length']} minutes", font=small_font,
+              fill=white)
+
+    # Draw captures points information
+    draw.text((x + _s(1100, scale), _s(200 + 100, scale)), f"Captures:", font=small_font, fill=white)
+    for team_id, tm in enumerate(data["teams"]):
+        draw.text((x + _s(1100, scale), _s(200 + 100 * (team_id + 2), scale)), f"{tm['name']}: {tm['cap']} points",
+                  font=small_font, white=white)
+
+
+def _team_header_display(draw: ImageDraw, team: dict, y_offset: int, scale: float):
+    """
+    Draw the team name and score.
+
+    :param draw: Draw object.
+    :param team: Team render data.
+    :param y_offset: y coordinate of the team block.
+    :param scale: Resolution scale.
+    """
+    big_font = _get_font(BIG_FONT, scale)
+
+    # Draw team scores:
+    scores = [str(team["score"]), str(team["net"]), str(team["kills"]), str(team["deaths"]),
+              f"{int(team['hsr'] * 100)}%"]
+    _draw_score_line(draw, X_OFFSET + 2200, Y_SPACING + y_offset, scores, big_font, white, scale)
+
+    # Draw team name:
+    draw.text((_s(X_OFFSET, scale), _s(Y_SPACING + y_offset, scale)), f'{team["name"]} ({team["faction"]})',
+              font=big_font, fill=white)
+
+
+def _player_display(img: Image, draw: ImageDraw, player: dict, y: int, scale: float):
+    """
+    Draw one player line.
+
+    :param img: Image to draw on.
+    :param draw: Draw object.
+    :param player: Player render data.
+    :param y: y coordinate of the line.
+    :param scale: Resolution scale.
+    """
+    font = _get_font(FONT, scale)
+
+    # Color, to change if there is need for color alternation between each line
+    color = white
+
+    # Draw scores:
+    scores = [str(player["score"]), str(player["net"]), str(player["kills"]), str(player["deaths"]),
+              f"{int(player['hsr'] * 100)}%"]
+    _draw_score_line(draw, X_OFFSET + 2200, y, scores, font, color, scale)
+
+    # Get resized name and in-game name:
+    name = _cut_off_string(player["name"], font, _s(900, scale))
+    ig_name = _cut_off_string(player["ig_name"], font, _s(900, scale))
+
+    # Draw in-game name and name
+    draw.text((_s(X_OFFSET + 250, scale), _s(y, scale)), name, font=font, fill=color)
+    draw.text((_s(X_OFFSET + 1100 + 130, scale), _s(y, scale)), ig_name, font=font, fill=color)
+
+    # Two main classes (loadouts) the player used
+    loadouts = player["loadouts"]
+
+    # Draw loadouts icons
+    for j in range(len(loadouts)):
+        # Get loadout icon
+        loadout_img = _get_loadout_icon(loadouts[j], scale)
+        if len(loadouts) == 1:
+            # If only one loadout used, we put the icon in the middle
+            off = 90 // 2
+        else:
+            off = 90 * j
+        # Draw loadout icon
+        img.paste(loadout_img, (_s(35 + X_OFFSET + off, scale), _s(y + 25, scale)), loadout_img)
+
+
+def warm_up(scale: float = 1.0):
+    """
+    Load all the cached elements, to be called when the worker process starts.
+
+    :param scale: Resolution scale which will be used.
+    """
+    _get_logo(scale)
+    for loadout in LOADOUTS:
+        _get_loadout_icon(loadout, scale)
+    for size in (BIG_FONT, FONT, SMALL_FONT):
+        _get_font(size, scale)
+
+
+def render(data: dict, scale: float = 1.0) -> Image:
+    """
+    Draw the match image.
+    If the previous image of the match was drawn at the same scale with the same teams sizes,
+    it is reused and only the regions which changed are redrawn.
+
+    :param data: Match render data, see :meth:`modules.image_maker.get_render_data`.
+    :param scale: Resolution scale, 1.0 being 4000 pixels wide.
+    :return: The match image.
+    """
+    team_sizes = tuple(len(tm["players"]) for tm in data["teams"])
+    background = _get_background(team_sizes, scale)
+
+    previous = _canvases.pop(data["id"], None)
+    if previous and previous[1] == scale and background.size == previous[2].size \
+            and tuple(len(tm["players"]) for tm in previous[0]["teams"]) == team_sizes:
+        old_data, _, img = previous
+    else:
+        # Copy static elements
+        old_data = None
+        img = background.copy()
+
+    # Get draw object
+    draw = ImageDraw.Draw(img)
+
+    # Horizontal limits of the redrawn regions: inside the borders
+    x_min = _s(B_THICKNESS * 2, scale)
+    x_max = _s(X_MAX - B_THICKNESS * 2, scale)
+
+    # Draw general information, on the right of the logo
+    if not old_data or _get_header(old_data) != _get_header(data):
+        if old_data:
+            _erase(img, background, (_s(800, scale), x_min, x_max, _s(_get_y_off(team_sizes, 0) - 30, scale)))
+        _header_display(draw, data, scale)
+
+    # Draw teams and players score
+    for team_id, tm in enumerate(data["teams"]):
+        y_offset = _get_y_off(team_sizes, team_id)
+        old_team = old_data["teams"][team_id] if old_data else None
+
+        if not old_team or _get_team_header(old_team) != _get_team_header(tm):
+            if old_team:
+                _erase(img, background, (x_min, _s(y_offset + Y_SPACING, scale),
+                                         x_max, _s(y_offset + Y_BIG_SPACE * 2 - 30, scale)))
+            _team_header_display(draw, tm, y_offset, scale)
+
+        for i, player in enumerate(tm["players"]):
+            if old_team and old_team["players"][i] == player:
+                continue
+            y = Y_BIG_SPACE * 2 + Y_SPACING * i + y_offset
+            if old_team:
+                _erase(img, background, (x_min, _s(y, scale), x_max, _s(y + Y_SPACING, scale)))
+            _player_display(img, draw, player, y, scale)
+
+    # Keep the image for the next drawing of this match
+    _canvases[data["id"]] = (data, scale, img)
+    while len(_canvases) > MAX_CANVASES:
+        _canvases.popitem(last=False)
+
+    return img.copy()
+
+
+def encode(img: Image, image_format: str, compression: int) -> bytes:
+    """
+    Encode an image in memory.
+
+    :param img: Image to encode.
+    :param image_format: "png" or "webp" (lossless).
+    :param compression: Compression effort, from 0 (fastest) to 9 (smallest).
+    :return: Encoded image.
+    """
+    buffer = BytesIO()
+    if image_format == "webp":
+        # For lossless WebP, quality is the compression effort (0 to 100)
+        img.save(buffer, format="WEBP", lossless=True, method=6, quality=compression * 10)
+    else:
+        img.save(buffer, format="PNG", compress_level=compression)
+    return buffer.getvalue()
+
+
+def make_image(data: dict, image_format: str, compression: int, scale: float = 1.0) -> tuple:
+    """
+    Create the match image and encode it.
+
+    :param data: Match render data, see :meth:`modules.image_maker.get_render_data`.
+    :param image_format: "png" or "webp" (lossless).
+    :param compression: Compression effort, from 0 (fastest) to 9 (smallest).
+    :param scale: Resolution scale, 1.0 being 4000 pixels wide.
+    :return: Tuple: encoded image, render and encoding time in seconds.
+    """
+    start = time.perf_counter()
+    encoded = encode(render(data, scale), image_format, compression)
+    return encoded, time.perf_counter() - start
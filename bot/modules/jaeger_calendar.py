@@ -1,48 +1,154 @@
-from gspread import service_account
+"""
+| Jaeger calendar, lists the bases booked on Jaeger.
+| The calendar is refreshed every :data:`REFRESH_PERIOD` minutes in the background, bookings of the day are kept in an
+  :class:`IntervalIndex`: :meth:`get_booked_bases` doesn't need any network access.
+| If the refresh fails, :meth:`get_stale_since` tells since when the bookings may be outdated.
+"""
+
 from datetime import datetime as dt, timezone as tz, timedelta as td
-from numpy import array as np_array
-from re import compile as reg_compile, sub as reg_sub
+from asyncio import get_event_loop
+from bisect import bisect_right
+from collections import Counter
+from re import compile as reg_compile
 
-from modules.tools import date_parser
+from lib.tasks import loop
+from classes import Base
+from modules.tools import date_parser, timestamp_now
 
 import modules.config as cfg
+import modules.sheets as sheets
 
 from logging import getLogger
 
 log = getLogger("pog_bot")
 
-_secret_file = ""
+# Cells of the "Current" worksheet used: dates and bookings columns
+CALENDAR_RANGE = "A:L"
+
+# Minutes between two refreshes of the calendar
+REFRESH_PERIOD = 5
+
+_BASE_SEPARATORS = reg_compile("[/,&()]")
+_UNWANTED_CHARS = reg_compile("[^a-zA-Z0-9 ]")
+_MULTIPLE_SPACES = reg_compile(" {2,}")
+
+_calendar = None
+
+
+class IntervalIndex:
+    """
+    Index of the bases booked over time.
+    The intervals are cut at all their bounds into consecutive segments, each segment holding the bases booked
+    during all of it: a lookup is a binary search on the bounds.
+
+    :param intervals: List of (start timestamp, end timestamp, base ids), the end is excluded.
+    """
+
+    def __init__(self, intervals=()):
+        starts = dict()
+        ends = dict()
+        for start, end, bases in intervals:
+            if start < end:
+                starts.setdefault(start, list()).extend(bases)
+                ends.setdefault(end, list()).extend(bases)
+        self.__bounds = sorted(starts.keys() | ends.keys())
+        # Bases booked from each bound to the next one
+        self.__segments = list()
+        active = Counter()
+        for bound in self.__bounds:
+            active.subtract(ends.get(bound, ()))
+            active.update(starts.get(bound, ()))
+            self.__segments.append([b_id for b_id, nb in active.items() if nb > 0])
+
+    def query(self, timestamp: int) -> list:
+        """
+        Get the bases booked at a given time.
+
+        :param timestamp: Time to check.
+        :return: List of base ids.
+        """
+        index = bisect_right(self.__bounds, timestamp) - 1
+        if index < 0:
+            return list()
+        return self.__segments[index]
+
+
+_index = IntervalIndex()
+# UTC date of the bookings in the index
+_index_date = None
+# Timestamp of the last successful refresh
+_last_refresh = 0
+_is_stale = True
 
 
 def init(secret_file):
-    global _secret_file
-    _secret_file = secret_file
+    global _calendar
+    _calendar = sheets.SheetSync("jaeger_calendar", sheets.get_backend(secret_file), cfg.database["jaeger_cal"],
+                                 "Current", CALENDAR_RANGE)
+    _refresh_loop.start()
+
+
+def get_booked_bases() -> list:
+    """
+    Get the bases currently booked in the calendar.
+
+    :return: List of base ids.
+    """
+    return _index.query(timestamp_now())
+
+
+def get_stale_since():
+    """
+    Check if the calendar is outdated.
+
+    :return: None if the last refresh succeeded, else timestamp of the last successful refresh (0 if never refreshed).
+    """
+    if _is_stale:
+        return _last_refresh
 
 
-def get_booked_bases(base_class, booked_bases_list):  # runs on class init, saves a list of booked bases at the time of init to self.booked
+@loop(minutes=REFRESH_PERIOD)
+async def _refresh_loop():
+    global _is_stale
+    try:
+        await get_event_loop().run_in_executor(None, _refresh)
+    except Exception as e:
+        # Keep the previous bookings, the loop must go on
+        _is_stale = True
+        log.warning(f"Unable to refresh Jaeger calendar: {e}")
+
+
+def _refresh():
+    global _index, _index_date, _last_refresh, _is_stale
+    changed, removed = _calendar.sync()
+    today = dt.now(tz.utc).date()
+    if changed or removed or today != _index_date:
+        _index = IntervalIndex(_get_bookings(_calendar.rows, today))
+        _index_date = today
+    _last_refresh = timestamp_now()
+    _is_stale = False
+
+
+def _get_bookings(cal_export, today):
     index_start = index_end = None
-    gc = service_account(filename=_secret_file)
-    sh = gc.open_by_key(cfg.database["jaeger_cal"])
-    ws = sh.worksheet("Current")
-    cal_export = np_array(ws.get_all_values())
-    date_col = cal_export[:,0]
+    date_col = [row[0] for row in cal_export]
     for index, value in enumerate(date_col):
-        if not index_start and value == dt.now(tz.utc).strftime('%b-%d'):
+        if not index_start and value == today.strftime('%b-%d'):
             # gets us the header for the current date section in the google sheet
             index_start = index + 1
             continue
-        if value == (dt.now(tz.utc) + td(days=1)).strftime('%b-%d'):
+        if value == (today + td(days=1)).strftime('%b-%d'):
             # gets us the header for tomorrow's date in the sheet
             index_end = index  # now we know the range on the google sheet to look for base availability
             break
     if index_start is None or index_end is None:
         log.warning(f"Unable to find date range in Jaeger calendar for today's date. Returned: '{index_start}' "
                     f"to '{index_end}'")
-        return
-
+        return list()
 
     today_bookings = cal_export[index_start:index_end]
 
+    bookings = list()
     for booking in today_bookings:
         try:
             start_time = date_parser(booking[10])  # 45 mins before start of reservation
@@ -50,30 +156,28 @@ def get_booked_bases(base_class, booked_bases_list):  # runs on class init, save
                 end_time = date_parser(booking[11])
             else:
                 end_time = date_parser(booking[9])
-            if start_time <= dt.now(tz.utc) <= end_time:
-                splitting_chars = ['/', ',', '&', '(', ')']
-                booked_bases = booking[3]
-                for sc in splitting_chars:
-                    booked_bases = booked_bases.replace(sc, ';')
-                booked_bases = [_identify_base_from_name(base, base_class) for base in booked_bases.split(";")]
-                for booked in booked_bases:
-                    if booked is not None and booked not in booked_bases_list:
-                        booked_bases_list.append(booked)
-        except (ValueError, TypeError) as e:
+            if start_time is None or end_time is None:
+                raise ValueError("Invalid date")
+            booked_bases = [_identify_base_from_name(base) for base in _BASE_SEPARATORS.split(booking[3])]
+            booked_ids = list({base.id for base in booked_bases if base is not None})
+            # End of the booking included
+            bookings.append((int(start_time.timestamp()), int(end_time.timestamp()) + 1, booked_ids))
+        except (ValueError, TypeError, OverflowError, AttributeError, IndexError) as e:
+            # An invalid line must not prevent the rest of the calendar from being indexed
             log.warning(f"Skipping invalid line in Jaeger Calendar:\n{booking}\nError: {e}")
+    return bookings
 
 
-def _identify_base_from_name(name, base_class):
+def _identify_base_from_name(name):
     # Check if string is empty
     if len(name) == 0:
         return
 
     # Use regex to clean the string from unwanted characters
-    pattern = reg_compile("[^a-zA-Z0-9 ]")
-    name = reg_sub(" {2,}", " ", pattern.sub('', name)).strip()
+    name = _MULTIPLE_SPACES.sub(" ", _UNWANTED_CHARS.sub('', name)).strip()
 
     # Add all matching bases to list
-    results = base_class.get_bases_from_name(name)
+    results = Base.get_bases_from_name(name)
 
     # If only one matching base
     if len(results) == 1:
@@ -0,0 +1,128 @@
+"""
+| Precomputed player rankings.
+| Rankings are built from the player stats database when the bot starts, then kept up to date
+  with :meth:`update` each time a match is pushed to the database.
+| Use :meth:`get_top` to read the top of a ranking without any database access.
+"""
+
+from bisect import bisect_left, insort
+from logging import getLogger
+
+import modules.database as db
+from classes import PlayerStat
+
+log = getLogger("pog_bot")
+
+# Number of players shown in a leaderboard
+TOP_SIZE = 10
+
+# Minimum number of matches played to appear in ratio rankings
+MIN_MATCHES = 10
+
+#: Available rankings: name -> (title, value getter, minimum number of matches, value format).
+#: Value getters read the counters of a player, see :meth:`_get_counters`.
+METRICS = {
+    "kpm": ("Kills per minute", lambda c: c["kills"] / c["time_played"] if c["time_played"] else 0,
+            MIN_MATCHES, "{:.2f}"),
+    "matches": ("Matches played", lambda c: c["matches"], 1, "{}"),
+    "captain": ("Captain ratio", lambda c: c["captain"] / c["matches"], MIN_MATCHES, "{:.1%}"),
+    "winrate": ("Win rate", lambda c: c["won"] / c["matches"], MIN_MATCHES, "{:.1%}"),
+    "kills": ("Total kills", lambda c: c["kills"], 1, "{}"),
+    "score": ("Total score", lambda c: c["score"], 1, "{}"),
+}
+
+# Only the counters used by the rankings are fetched at startup, the matches list is counted by the database
+_db_projection = {"nb_matches": {"$size": "$matches"}, "match_stats.nb_won": 1, "time_played": 1,
+                  "times_captain": 1, "totals.kills": 1, "totals.score": 1}
+
+# metric -> sorted list of (-value, player id)
+_rankings = {metric: list() for metric in METRICS}
+
+# metric -> {player id: (-value, player id)}
+_entries = {metric: dict() for metric in METRICS}
+
+
+def init():
+    """
+    Build all the rankings from the player stats database.
+    """
+    # Documents without materialized totals need their loadouts
+    not_migrated = list()
+
+    def from_data(data):
+        if "totals" not in data:
+            not_migrated.append(data["_id"])
+            return
+        _update(data["_id"], {"matches": data["nb_matches"],
+                              "time_played": data["time_played"],
+                              "captain": data["times_captain"],
+                              "won": data["match_stats"]["nb_won"],
+                              "kills": data["totals"]["kills"],
+                              "score": data["totals"]["score"]})
+
+    db.get_all_elements(from_data, "player_stats", projection=_db_projection, batch_size=1000)
+    if not_migrated:
+        log.warning(f"Leaderboard: {len(not_migrated)} player stats without totals, "
+                    f"run scripts.backfill_player_stats_totals")
+        for p_id, data in db.get_elements("player_stats", not_migrated).items():
+            update(PlayerStat(p_id, "N/A", data=data))
+    log.info(f"Leaderboard: {len(_entries['matches'])} players ranked")
+
+
+def update(stats: PlayerStat):
+    """
+    Update the position of a player in all the rankings.
+
+    :param stats: Up-to-date stats of the player.
+    """
+    _update(stats.id, _get_counters(stats))
+
+
+def _get_counters(stats: PlayerStat) -> dict:
+    return {"matches": stats.nb_matches_played,
+            "time_played": stats.time_played,
+            "captain": stats.times_captain,
+            "won": stats.matches_won,
+            "kills": stats.kills,
+            "score": stats.score}
+
+
+def _update(p_id: int, counters: dict):
+    for metric, (_, getter, min_matches, _) in METRICS.items():
+        ranking = _rankings[metric]
+        entries = _entries[metric]
+        old = entries.pop(p_id, None)
+        if old is not None:
+            del ranking[bisect_left(ranking, old)]
+        if counters["matches"] < min_matches:
+            continue
+        entry = (-getter(counters), p_id)
+        entries[p_id] = entry
+        insort(ranking, entry)
+
+
+def get_top(metric: str, size: int = TOP_SIZE) -> list:
+    """
+    Get the top of a ranking.
+
+    :param metric: Name of the ranking, key of :data:`METRICS`.
+    :param size: Number of players to get.
+    :return: List of (player id, value) tuples, best first.
+    :raise KeyError: If the metric doesn't exist.
+    """
+    return [(p_id, -value) for value, p_id in _rankings[metric][:size]]
+
+
+def get_rank(metric: str, p_id: int) -> int:
+    """
+    Get the rank of a player.
+
+    :param metric: Name of the ranking, key of :data:`METRICS`.
+    :param p_id: Player id.
+    :return: Rank (starting at 1), None if the player is not ranked.
+    :raise KeyError: If the metric doesn't exist.
+    """
+    entry = _entries[metric].get(p_id)
+    if entry is None:
+        return None
+    return bisect_left(_rankings[metric], entry) + 1
@@ -1,203 +1,384 @@
+"""
+| Lobby queues.
+| Each queue of :data:`modules.config.lobbies` has its own lobby channel, size, auto ping threshold and match channels:
+  when a queue is full, a match is started in one of its free match channels, independently of the other queues.
+| Module functions without a lobby argument apply to the default queue, or to the queue of the player given.
+"""
+
 import modules.config as cfg
 from display import AllStrings as disp, ContextWrapper, views, InteractionContext
 
 from lib.tasks import Loop, loop
 from logging import getLogger
+from collections import OrderedDict
+from heapq import heappush, heappop, heapify
+from itertools import count
 
 import modules.tools as tools
 import modules.interactions as interactions
 
 log = getLogger("pog_bot")
 
-_lobby_list = list()
-_lobby_stuck = False
 _lobby_accounts_enabled = True
 _MatchClass = None
 _client = None
-_warned_players = dict()
 
+# Lobby channel id -> Lobby
+_lobbies = dict()
+# Match channel id -> Lobby
+_match_lobbies = dict()
+# Player id -> Lobby the player is in
+_player_lobbies = dict()
+_default = None
+
+# Event types, warnings first when simultaneous
+_WARNING = 0
+_EXPIRATION = 1
+
+_version_counter = count()
+
+
+class Lobby:
+    """
+    A lobby queue.
+
+    :param name: Name of the queue.
+    :param channel_id: Lobby channel id.
+    :param size: Number of players needed to start a match.
+    :param ping_threshold: Number of players from which the notify role is pinged.
+    :param matches: Ids of the match channels of the queue.
+    """
+
+    def __init__(self, name, channel_id, size, ping_threshold, matches):
+        self.name = name
+        self.channel_id = channel_id
+        self.size = size
+        self.ping_threshold = ping_threshold
+        self.matches = matches
+        # Players in lobby, by order of arrival: player id -> player
+        self.__players = OrderedDict()
+        self.__stuck = False
+        self.__warned_players = dict()
+        # Min-heap of lobby events: (timestamp, event type, version, player id)
+        self.__events = list()
+        # Player id -> version of the player's events, events with an older version are ignored
+        self.__event_versions = dict()
+        self.__auto_ping = Loop(coro=self.__ping, minutes=3, delay=1, count=2)
+        self.__auto_ping_done = False
+
+    @property
+    def channel(self):
+        return ContextWrapper.channel(self.channel_id)
+
+    @property
+    def is_stuck(self):
+        return self.__stuck
+
+    def get_len(self):
+        return len(self.__players)
+
+    def __contains__(self, player):
+        return player.id in self.__players
+
+    def get_all_names(self):
+        return [f"{p.mention} ({p.name}) (auto leave in {p.lobby_remaining})" for p in self.__players.values()]
+
+    def get_all_ids(self):
+        return list(self.__players)
+
+    def get_all(self):
+        return list(self.__players.values())
+
+    def add(self, player, expiration=0):
+        self.__players[player.id] = player
+        _player_lobbies[player.id] = self
+        player.on_lobby_add(expiration)
+        self.__schedule_events(player)
+        all_names = self.get_all_names()
+        if len(self.__players) == self.size:
+            self.__start_match()
+        elif len(self.__players) >= self.ping_threshold:
+            if not self.__auto_ping.is_running() and not self.__auto_ping_done:
+                self.__auto_ping.start()
+                self.__auto_ping_done = True
+        return all_names
+
+    def remove(self, player):
+        self.__remove_from_warned(player)
+        self.__unlist(player)
+        player.on_lobby_leave()
+
+    def get_sub(self, player):
+        # If player is None, take first player in queue
+        if not player:
+            # Check if someone in lobby, if not return None
+            if len(self.__players) == 0:
+                return None
+            player = next(iter(self.__players.values()))
+        # If player chosen is in a lobby (possibly another queue), remove
+        if player.is_lobbied:
+            lobby = _player_lobbies.get(player.id, self)
+            lobby.__remove_from_warned(player)
+            lobby.__unlist(player)
+        return player
 
-def reset_timeout(player):
-    _remove_from_warned(player)
-    player.reset_lobby_expiration()
+    def clear(self):
+        if len(self.__players) == 0:
+            return False
+        for p in self.__players.values():
+            p.on_lobby_leave()
+            del _player_lobbies[p.id]
+        self.__players.clear()
+        self.__clear_warned()
+        self.__clear_events()
+        self.__on_remove()
+        return True
+
+    def reset_timeout(self, player):
+        self.__remove_from_warned(player)
+        player.reset_lobby_expiration()
+        self.__schedule_events(player)
+
+    def set_timeout(self, player, timeout):
+        self.__remove_from_warned(player)
+        player.lobby_expiration = timeout
+        self.__schedule_events(player)
+
+    def on_match_free(self):
+        self.__auto_ping_done = False
+        if len(self.__players) == self.size:
+            self.__start_match()
+
+    async def process_events(self):
+        # Only process the events which are due
+        while self.__events and self.__events[0][0] <= tools.timestamp_now():
+            _, event_type, version, p_id = heappop(self.__events)
+            if self.__event_versions.get(p_id) != version:
+                continue
+            p = self.__players[p_id]
+            if event_type == _EXPIRATION:
+                self.remove(p)
+                await disp.LB_TOO_LONG.send(self.channel, p.mention, names_in_lobby=self.get_all_names())
+            elif p not in self.__warned_players:
+                ih = interactions.InteractionHandler(p, views.reset_button)
+                self.__warned_players[p] = ih
+                self.__add_ih_callback(ih, p)
+                ctx = ih.get_new_context(self.channel)
+                await disp.LB_WARNING.send(ctx, p.mention)
+
+    def __unlist(self, player):
+        del self.__players[player.id]
+        del _player_lobbies[player.id]
+        self.__event_versions.pop(player.id, None)
+        self.__on_remove()
+
+    def __on_remove(self):
+        self.__stuck = False
+        if len(self.__players) < self.ping_threshold:
+            self.__auto_ping.cancel()
+            self.__auto_ping_done = False
+
+    def __schedule_events(self, player):
+        # Previous events of the player become outdated
+        version = next(_version_counter)
+        self.__event_versions[player.id] = version
+        heappush(self.__events, (player.lobby_expiration, _EXPIRATION, version, player.id))
+        warning_stamp = player.lobby_warning_stamp
+        if warning_stamp:
+            heappush(self.__events, (warning_stamp, _WARNING, version, player.id))
+        # Drop outdated events if they pile up
+        if len(self.__events) > 4 * len(self.__players) + 16:
+            self.__events = [event for event in self.__events if self.__event_versions.get(event[3]) == event[2]]
+            heapify(self.__events)
+
+    def __clear_events(self):
+        self.__events.clear()
+        self.__event_versions.clear()
+
+    def __remove_from_warned(self, p):
+        if p in self.__warned_players:
+            self.__warned_players[p].clean()
+            del self.__warned_players[p]
+
+    def __clear_warned(self):
+        for k in list(self.__warned_players.values()):
+            k.clean()
+        self.__warned_players.clear()
+
+    def __add_ih_callback(self, ih, player):
+        @ih.callback('reset')
+        async def on_user_react(p, interaction_id, interaction, interaction_values):
+            user = interaction.user
+            if user.id == player.id:
+                ctx = self.channel
+                ctx.author = user
+                self.reset_timeout(player)
+                await disp.LB_REFRESHED.send(ctx, names_in_lobby=self.get_all_names())
+            else:
+                i_ctx = InteractionContext(interaction)
+                await disp.LB_REFRESH_NO.send(i_ctx)
+                raise interactions.InteractionNotAllowed
+
+    async def __ping(self):
+        if _MatchClass.find_empty(self.matches) is None:
+            return
+        await disp.LB_NOTIFY.send(self.channel, f'<@&{cfg.roles["notify"]}>', len(self.__players), self.size)
+
+    def __start_match(self):
+        match = _MatchClass.find_empty(self.matches)
+        self.__auto_ping.cancel()
+        self.__auto_ping_done = False
+        if match is None:
+            self.__stuck = True
+            Loop(coro=self.__send_stuck_msg, count=1).start()
+        else:
+            self.__stuck = False
+            match.spin_up(self.get_all())
+            for p_id in self.__players:
+                del _player_lobbies[p_id]
+            self.__players.clear()
+            self.__clear_warned()
+            self.__clear_events()
+
+    async def __send_stuck_msg(self):
+        await disp.LB_STUCK.send(self.channel)
 
 
 def init(m_cls, client):
     global _MatchClass
     global _client
+    global _default
     _MatchClass = m_cls
     _client = client
+    _lobbies.clear()
+    _match_lobbies.clear()
+    for name, data in cfg.lobbies.items():
+        lobby = Lobby(name, data["channel"], data["size"], data["ping"], data["matches"])
+        _lobbies[lobby.channel_id] = lobby
+        for ch_id in lobby.matches:
+            _match_lobbies[ch_id] = lobby
+    _default = _lobbies[cfg.channels["lobby"]]
     _lobby_loop.start()
 
 
-def _remove_from_warned(p):
-    if p in _warned_players:
-        _warned_players[p].clean()
-        del _warned_players[p]
+def get_lobby(channel_id):
+    """
+    Get the lobby queue of a lobby channel.
 
+    :param channel_id: Channel id.
+    :return: Lobby, None if the channel is not a lobby channel.
+    """
+    return _lobbies.get(channel_id)
 
-def _clear_warned():
-    for k in list(_warned_players.values()):
-        k.clean()
-    _warned_players.clear()
 
+def get_match_lobby(channel_id):
+    """
+    Get the lobby queue starting matches in a match channel.
 
-def _add_ih_callback(ih, player):
-    @ih.callback('reset')
-    async def on_user_react(p, interaction_id, interaction, interaction_values):
-        user = interaction.user
-        if user.id == player.id:
-            ctx = ContextWrapper.channel(cfg.channels["lobby"])
-            ctx.author = user
-            reset_timeout(player)
-            await disp.LB_REFRESHED.send(ctx, names_in_lobby=get_all_names_in_lobby())
-        else:
-            i_ctx = InteractionContext(interaction)
-            await disp.LB_REFRESH_NO.send(i_ctx)
-            raise interactions.InteractionNotAllowed
-
+    :param channel_id: Match channel id.
+    :return: Lobby, default lobby if the channel doesn't belong to any queue.
+    """
+    return _match_lobbies.get(channel_id, _default)
 
-def accounts_enabled():
-    return _lobby_accounts_enabled
 
-def set_lobby_accounts_enabled(bl):
-    global _lobby_accounts_enabled
-    _lobby_accounts_enabled = bl
+def get_player_lobby(player):
+    """
+    Get the lobby queue a player is in.
 
-def is_lobby_stuck():
-    return _lobby_stuck
+    :param player: Player.
+    :return: Lobby, None if the player is not in lobby.
+    """
+    return _player_lobbies.get(player.id)
 
 
-def _set_lobby_stuck(bl):
-    global _lobby_stuck
-    _lobby_stuck = bl
+def get_all_lobbies():
+    return list(_lobbies.values())
 
 
-@loop(minutes=1)
-async def _lobby_loop():
-    for p in _lobby_list:
-        if p.is_lobby_expired:
-            remove_from_lobby(p)
-            await disp.LB_TOO_LONG.send(ContextWrapper.channel(cfg.channels["lobby"]),
-                                        p.mention,
-                                        names_in_lobby=get_all_names_in_lobby())
-        elif p.should_be_warned and p not in _warned_players:
-            ih = interactions.InteractionHandler(p, views.reset_button)
-            _warned_players[p] = ih
-            _add_ih_callback(ih, p)
-            ctx = ih.get_new_context(ContextWrapper.channel(cfg.channels["lobby"]))
-            await disp.LB_WARNING.send(ctx, p.mention)
+def get_lobby_channels():
+    return list(_lobbies)
 
 
-def _auto_ping_threshold():
-    thresh = cfg.general["lobby_size"] - cfg.general["lobby_size"] // 3
-    return thresh
+def get_all_ids_by_lobby():
+    """
+    Get the players of all the lobby queues, to be saved in the database.
 
+    :return: Dictionary of lobby channel id (as a string) -> ids of the players in the queue.
+    """
+    return {str(lobby.channel_id): lobby.get_all_ids() for lobby in _lobbies.values()}
 
-def _auto_ping_cancel():
-    _auto_ping.cancel()
-    _auto_ping.already = False
 
+def reset_timeout(player):
+    _player_lobbies[player.id].reset_timeout(player)
 
-def get_sub(player):
-    # Check if someone in lobby, if not return player (might be None)
-    if len(_lobby_list) == 0:
-        return player
-    # If player is None, take first player in queue
-    if not player:
-        player = _lobby_list[0]
-    # If player chosen is in lobby, remove
-    if player.is_lobbied:
-        _lobby_list.remove(player)
-        _on_lobby_remove()
-        _remove_from_warned(player)
-    return player
 
+def set_timeout(player, timeout):
+    """
+    Change the lobby expiration of a player.
 
-def add_to_lobby(player, expiration=0):
-    _lobby_list.append(player)
-    player.on_lobby_add(expiration)
-    all_names = get_all_names_in_lobby()
-    if len(_lobby_list) == cfg.general["lobby_size"]:
-        _start_match_from_full_lobby()
-    elif len(_lobby_list) >= _auto_ping_threshold():
-        if not _auto_ping.is_running() and not _auto_ping.already:
-            _auto_ping.start()
-            _auto_ping.already = True
-    return all_names
+    :param player: Player in lobby.
+    :param timeout: Seconds before the player is removed from lobby.
+    """
+    _player_lobbies[player.id].set_timeout(player, timeout)
 
 
-@loop(minutes=3, delay=1, count=2)
-async def _auto_ping():
-    if _MatchClass.find_empty() is None:
-        return
-    await disp.LB_NOTIFY.send(ContextWrapper.channel(cfg.channels["lobby"]), f'<@&{cfg.roles["notify"]}>',
-                              get_lobby_len(), cfg.general["lobby_size"])
+def accounts_enabled():
+    return _lobby_accounts_enabled
 
+def set_lobby_accounts_enabled(bl):
+    global _lobby_accounts_enabled
+    _lobby_accounts_enabled = bl
 
-_auto_ping.already = False
+def is_lobby_stuck():
+    return _default.is_stuck
 
 
-def get_lobby_len():
-    return len(_lobby_list)
+@loop(seconds=1)
+async def _lobby_loop():
+    for lobby in _lobbies.values():
+        await lobby.process_events()
 
 
-def get_all_names_in_lobby():
-    names = [f"{p.mention} ({p.name}) (auto leave in {p.lobby_remaining})" for p in _lobby_list]
-    return names
+def get_sub(player, lobby=None):
+    if lobby is None:
+        lobby = _default
+    return lobby.get_sub(player)
 
 
-def get_all_ids_in_lobby():
-    ids = [p.id for p in _lobby_list]
-    return ids
+def add_to_lobby(player, expiration=0):
+    return _default.add(player, expiration)
 
-def get_all_in_lobby():
-    return _lobby_list.copy()
 
+def get_lobby_len():
+    return _default.get_len()
 
-def remove_from_lobby(player):
-    _remove_from_warned(player)
 
-    _lobby_list.remove(player)
-    _on_lobby_remove()
-    player.on_lobby_leave()
+def get_all_names_in_lobby():
+    return _default.get_all_names()
 
 
-def on_match_free():
-    _auto_ping.already = False
-    if len(_lobby_list) == cfg.general["lobby_size"]:
-        _start_match_from_full_lobby()
+def get_all_ids_in_lobby():
+    return _default.get_all_ids()
 
+def get_all_in_lobby():
+    return [p for lobby in _lobbies.values() for p in lobby.get_all()]
 
-def _on_lobby_remove():
-    _set_lobby_stuck(False)
-    if len(_lobby_list) < _auto_ping_threshold():
-        _auto_ping_cancel()
 
+def remove_from_lobby(player):
+    """
+    Remove a player from the lobby queue they are in.
 
-def _start_match_from_full_lobby():
-    match = _MatchClass.find_empty()
-    _auto_ping_cancel()
-    if match is None:
-        _set_lobby_stuck(True)
-        Loop(coro=_send_stuck_msg, count=1).start()
-    else:
-        _set_lobby_stuck(False)
-        match.spin_up(_lobby_list.copy())
-        _lobby_list.clear()
-        _clear_warned()
+    :param player: Player in lobby.
+    :return: Lobby the player was removed from.
+    """
+    lobby = _player_lobbies[player.id]
+    lobby.remove(player)
+    return lobby
 
 
-async def _send_stuck_msg():
-    await disp.LB_STUCK.send(ContextWrapper.channel(cfg.channels["lobby"]))
+def on_match_free(channel_id):
+    get_match_lobby(channel_id).on_match_free()
 
 
 def clear_lobby():
-    if len(_lobby_list) == 0:
-        return False
-    for p in _lobby_list:
-        p.on_lobby_leave()
-    _lobby_list.clear()
-    _clear_warned()
-    _on_lobby_remove()
-    return True
+    return _default.clear()
@@ -0,0 +1,261 @@
+"""
+| Google sheets access.
+| Sheets are read through a backend: :class:`GspreadBackend` for google sheets, or :class:`LocalBackend` for local csv
+  copies (set ``local_sheets`` in the [Database] section of the config file to test offline).
+| :class:`SheetSync` keeps a snapshot of a sheet range and only reports the rows changed since the previous sync.
+  Snapshots of sheets holding credentials must not be persistent: they are then only kept in memory.
+"""
+
+# External imports
+from logging import getLogger
+from abc import ABC, abstractmethod
+from threading import Lock
+from hashlib import sha256
+from re import compile as reg_compile
+import json
+import csv
+import os
+from gspread import service_account
+from gspread.exceptions import APIError
+from gspread.urls import DRIVE_FILES_API_V3_URL
+
+# Internal imports
+import modules.config as cfg
+
+log = getLogger("pog_bot")
+
+# Directory where the sheet snapshots are saved
+SNAPSHOT_PATH = "../../POG-data/sheets"
+
+_A1_RANGE = reg_compile(r"^([A-Z]+)(\d*):([A-Z]+)(\d*)$")
+
+_backends = dict()
+
+
+def get_backend(secret_file: str):
+    """
+    Get the sheet backend to use.
+
+    :param secret_file: Name of the gspread authentication json file.
+    :return: Local backend if a local sheets directory is configured, gspread backend otherwise.
+    """
+    directory = cfg.database["local_sheets"]
+    key = directory or secret_file
+    if key not in _backends:
+        _backends[key] = LocalBackend(directory) if directory else GspreadBackend(secret_file)
+    return _backends[key]
+
+
+class SheetBackend(ABC):
+    """
+    Read access to spreadsheets.
+    """
+
+    @abstractmethod
+    def get_modified_time(self, key: str) -> str:
+        """
+        Get the last modification time of a spreadsheet.
+
+        :param key: Spreadsheet key.
+        :return: Modification time, None if unknown.
+        """
+
+    @abstractmethod
+    def get_values(self, key: str, worksheet: str, cells: str) -> list:
+        """
+        Get the values of a range of cells.
+
+        :param key: Spreadsheet key.
+        :param worksheet: Worksheet name.
+        :param cells: A1 notation of the range, such as "B3:D" (all rows from the 3rd one).
+        :return: List of rows, trailing empty cells may be omitted.
+        """
+
+
+class GspreadBackend(SheetBackend):
+    """
+    Google sheets backend, through gspread.
+
+    :param secret_file: Name of the gspread authentication json file.
+    """
+
+    def __init__(self, secret_file: str):
+        self.__client = service_account(filename=secret_file)
+        self.__spreadsheets = dict()
+
+    def get_modified_time(self, key):
+        try:
+            response = self.__client.request("get", f"{DRIVE_FILES_API_V3_URL}/{key}",
+                                             params={"fields": "modifiedTime", "supportsAllDrives": True})
+            return response.json()["modifiedTime"]
+        except (APIError, KeyError) as e:
+            log.warning(f"Can't get modification time of sheet {key}: {e}")
+            return None
+
+    def get_values(self, key, worksheet, cells):
+        if key not in self.__spreadsheets:
+            self.__spreadsheets[key] = self.__client.open_by_key(key)
+        response = self.__spreadsheets[key].values_get(f"'{worksheet}'!{cells}")
+        return response.get("values", list())
+
+
+class LocalBackend(SheetBackend):
+    """
+    Local backend, reads spreadsheets from csv files: each spreadsheet is a directory named after its key,
+    containing one "<worksheet>.csv" file per worksheet.
+
+    :param directory: Directory containing the spreadsheets.
+    """
+
+    def __init__(self, directory: str):
+        self.__directory = directory
+
+    def get_modified_time(self, key):
+        path = f"{self.__directory}/{key}"
+        try:
+            return str(max(os.path.getmtime(f"{path}/{file}") for file in os.listdir(path)))
+        except (OSError, ValueError):
+            return None
+
+    def get_values(self, key, worksheet, cells):
+        x_start, y_start, x_end, y_end = _parse_range(cells)
+        with open(f"{self.__directory}/{key}/{worksheet}.csv", newline="", encoding="utf-8") as file:
+            rows = list(csv.reader(file))
+        return [row[x_start:x_end] for row in rows[y_start:y_end]]
+
+
+class SheetSync:
+    """
+    Synchronize a range of a spreadsheet.
+    The range is only downloaded when the spreadsheet was modified, the last download is kept in a snapshot file
+    so that a restart doesn't need to download it again (unless the snapshot is not persistent).
+
+    :param name: Name of the snapshot.
+    :param backend: Sheet backend.
+    :param key: Spreadsheet key.
+    :param worksheet: Worksheet name.
+    :param cells: A1 notation of the range.
+    :param key_column: Index of the column identifying the rows in the range, rows are identified by their position
+                       if None. Rows whose identifier is empty are ignored.
+    :param persistent: If False, the snapshot is only kept in memory: for ranges holding credentials.
+    """
+
+    def __init__(self, name: str, backend: SheetBackend, key: str, worksheet: str, cells: str, key_column=None,
+                 persistent=True):
+        self.__name = name
+        self.__persistent = persistent
+        self.__backend = backend
+        self.__source = {"key": key, "worksheet": worksheet, "cells": cells}
+        x_start, _, x_end, _ = _parse_range(cells)
+        self.__width = x_end - x_start
+        self.__key_column = key_column
+        self.__lock = Lock()
+        # Last known content of the range
+        self.__snapshot = self.__load_snapshot()
+        # Rows reported by the last sync, by identifier
+        self.__rows = dict()
+
+    @property
+    def rows(self) -> list:
+        return list(self.__rows.values())
+
+    def sync(self) -> tuple:
+        """
+        Get the content of the range and compare it to the previous sync.
+        The first sync reports all the rows.
+
+        :return: Tuple of: dictionary of the new or modified rows by identifier, list of identifiers of the removed rows.
+        """
+        with self.__lock:
+            modified = self.__backend.get_modified_time(self.__source["key"])
+            if modified is None or modified != self.__snapshot["modified"]:
+                rows = self.__fetch()
+                content_hash = _hash(rows)
+                if content_hash != self.__snapshot["hash"]:
+                    log.info(f"Sheet '{self.__name}' changed")
+                self.__snapshot = dict(self.__source, modified=modified, hash=content_hash, rows=rows)
+                self.__save_snapshot()
+
+            new_rows = self.__index(self.__snapshot["rows"])
+            changed = {r_id: row for r_id, row in new_rows.items() if self.__rows.get(r_id) != row}
+            removed = [r_id for r_id in self.__rows if r_id not in new_rows]
+            self.__rows = new_rows
+            return changed, removed
+
+    def invalidate(self):
+        """
+        Forget the previous sync, the next sync will report all the rows again.
+        Call it if the rows reported couldn't be applied.
+        """
+        with self.__lock:
+            self.__rows = dict()
+
+    def __fetch(self):
+        rows = self.__backend.get_values(self.__source["key"], self.__source["worksheet"], self.__source["cells"])
+        rows = [[str(cell) for cell in row[:self.__width]] + [""] * (self.__width - len(row)) for row in rows]
+        # Drop trailing empty rows
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return rows
+
+    def __index(self, rows):
+        if self.__key_column is None:
+            return dict(enumerate(rows))
+        return {row[self.__key_column]: row for row in rows if row[self.__key_column]}
+
+    def __load_snapshot(self):
+        empty = dict(self.__source, modified=None, hash=None, rows=list())
+        if not self.__persistent:
+            # Delete any snapshot saved while it was persistent
+            try:
+                os.remove(f"{SNAPSHOT_PATH}/{self.__name}.json")
+            except OSError:
+                pass
+            return empty
+        try:
+            with open(f"{SNAPSHOT_PATH}/{self.__name}.json", encoding="utf-8") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return empty
+        # Ignore the snapshot if the sheet changed in the config, or if the file was altered
+        if any(snapshot.get(k) != v for k, v in self.__source.items()) or snapshot.get("hash") != _hash(
+                snapshot.get("rows")):
+            return empty
+        return snapshot
+
+    def __save_snapshot(self):
+        if not self.__persistent:
+            return
+        try:
+            os.makedirs(SNAPSHOT_PATH, exist_ok=True)
+            with open(f"{SNAPSHOT_PATH}/{self.__name}.json", "w", encoding="utf-8") as file:
+                json.dump(self.__snapshot, file)
+        except OSError as e:
+            log.warning(f"Can't save snapshot of sheet '{self.__name}': {e}")
+
+
+def _hash(rows) -> str:
+    return sha256(json.dumps(rows).encode()).hexdigest()
+
+
+def _parse_range(cells: str) -> tuple:
+    """
+    Convert an A1 range to indexes.
+
+    :param cells: A1 notation of the range, such as "B3:D" or "A:L".
+    :return: Tuple (first column, first row, end column, end row), end indexes are exclusive, end row is None if
+             the range is open.
+    """
+    match = _A1_RANGE.match(cells)
+    if not match:
+        raise ValueError(f"Invalid range: {cells}")
+    x_start, y_start, x_end, y_end = match.groups()
+    return (_column_index(x_start), int(y_start or 1) - 1,
+            _column_index(x_end) + 1, int(y_end) if y_end else None)
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index - 1
@@ -4,6 +4,7 @@ import sys
 
 import modules.lobby as lobby
 import modules.database as db
+import modules.write_buffer as write_buffer
 from logging import getLogger
 import asyncio
 
@@ -12,8 +13,8 @@ log = getLogger("pog_bot")
 
 def save_state(loop):
     log.info("SIGINT caught, saving state...")
-    lb = lobby.get_all_ids_in_lobby()
-    db.set_field("restart_data", 0, {"last_lobby": lb})
+    write_buffer.flush_sync()
+    db.set_field("restart_data", 0, {"last_lobby": lobby.get_all_ids_by_lobby()})
     log.info("Stopping...")
     loop.stop()
     sys.exit(0)
@@ -3,38 +3,98 @@ from datetime import datetime as dt, timezone as tz, date as dt_date, time as dt
 import modules.tools as tools
 from classes import PlayerStat
 from logging import getLogger
+from bisect import bisect_left, bisect_right
+from array import array
 
 log = getLogger("pog_bot")
 
-_match_stamps = dict()
+# Parallel columns, sorted by match id: first round timestamp of each match
+_match_ids = array('q')
+_match_stamps = array('q')
+
+# Number of matches fetched per database batch
+_db_batch_size = 5000
+
+# Player id -> (match timestamps, match ids) columns sorted by timestamp, built on first use
+_player_index = dict()
 
 oldest = 0
 
+_match_cls = None
+
+# Recent stats duration (2 weeks), in seconds
+RECENT_DURATION = 1209600
+
+# Maximum number of match entries kept in the recent stats of a player
+RECENT_MAX_ENTRIES = 200
+
+
+def init(match_cls):
+    global _match_cls
+    _match_cls = match_cls
 
-def init():
-    # Create timestamp dict
+    # Create timestamp columns, only the match id and first round stamp are fetched
     def db_match(match):
         global oldest
-        _match_stamps[match["_id"]] = match["round_stamps"][0]
-        oldest = match["round_stamps"][0] if oldest == 0 else min(match["round_stamps"][0], oldest)
-    db.get_all_elements(db_match, "matches")
+        _match_ids.append(match["_id"])
+        _match_stamps.append(int(match["round_stamps"][0]))
+        oldest = _match_stamps[-1] if oldest == 0 else min(_match_stamps[-1], oldest)
+    db.get_all_elements(db_match, "matches", projection={"_id": 1, "round_stamps": {"$slice": 1}},
+                        batch_size=_db_batch_size)
+    if any(_match_ids[i] > _match_ids[i + 1] for i in range(len(_match_ids) - 1)):
+        pairs = sorted(zip(_match_ids, _match_stamps))
+        _match_ids[:] = array('q', (m_id for m_id, _ in pairs))
+        _match_stamps[:] = array('q', (stamp for _, stamp in pairs))
 
 
 def add_match(match_data):
-    _match_stamps[match_data.id] = match_data.round_stamps[0]
+    stamp = int(match_data.round_stamps[0])
+    i = bisect_left(_match_ids, match_data.id)
+    if i < len(_match_ids) and _match_ids[i] == match_data.id:
+        _match_stamps[i] = stamp
+    else:
+        _match_ids.insert(i, match_data.id)
+        _match_stamps.insert(i, stamp)
+    for tm in match_data.teams:
+        for p in tm.players:
+            if p.id not in _player_index:
+                # Built on first use, from the stats which will include this match
+                continue
+            stamps, ids = _player_index[p.id]
+            i = bisect_right(stamps, stamp)
+            stamps.insert(i, stamp)
+            ids.insert(i, match_data.id)
+
+
+def _get_stamp(m_id):
+    i = bisect_left(_match_ids, m_id)
+    if i < len(_match_ids) and _match_ids[i] == m_id:
+        return _match_stamps[i]
+    return None
+
+
+def _build_index(matches):
+    stamps = ((_get_stamp(m_id), m_id) for m_id in matches)
+    pairs = sorted((stamp, m_id) for stamp, m_id in stamps if stamp is not None)
+    return array('q', (stamp for stamp, _ in pairs)), array('q', (m_id for _, m_id in pairs))
+
+
+def _get_index(player):
+    if player.id not in _player_index:
+        _player_index[player.id] = _build_index(player.matches)
+    return _player_index[player.id]
+
+
+def count_matches_between(player, start, end):
+    # Start and end timestamps are inclusive
+    stamps, _ = _get_index(player)
+    return bisect_right(stamps, end) - bisect_left(stamps, start)
 
 
 def get_matches_in_time(player, time):
-    matches_to_query = list()
-    for m_id in player.matches[::-1]:
-        try:
-            if _match_stamps[m_id] >= time:
-                matches_to_query.append(m_id)
-            else:
-                break
-        except KeyError:
-            pass
-    return matches_to_query
+    # Most recent first
+    stamps, ids = _get_index(player)
+    return ids[bisect_left(stamps, time):][::-1].tolist()
 
 
 def get_week(date, initial=False):
@@ -48,27 +108,64 @@ def get_week(date, initial=False):
     return start, end
 
 
-async def get_new_stats(match_cls, player, time=tools.timestamp_now()-1209600):
-    m_list = get_matches_in_time(player, time)
+def get_recent_update(entry):
+    # Push the entry of the match in the recent stats, keeping only the last entries
+    return {"$push": {"entries": {"$each": [entry], "$slice": -RECENT_MAX_ENTRIES}}}
+
+
+async def get_recent_stats(player):
+    # Single document read, entries are stored at the end of each match
+    data = await db.async_db_call(db.get_element, "recent_stats", player.id)
+    if not data or not data.get("complete"):
+        # Document missing or only holding the matches played since the recent stats exist: build it once
+        return await rebuild_recent_stats(_match_cls, player)
+    recent_p_stats = PlayerStat(player.id, player.name)
+    if data:
+        time = tools.timestamp_now() - RECENT_DURATION
+        for entry in data["entries"]:
+            if entry["stamp"] >= time:
+                recent_p_stats.add_entry(entry)
+    return recent_p_stats
+
+
+async def rebuild_recent_stats(match_cls, player):
+    # Rebuild the recent stats of a player from the whole match documents: slow, for admin use
+    # and for players whose recent stats were never built
+    start = tools.timestamp_now() - RECENT_DURATION
+    m_list = get_matches_in_time(player, start)
     new_p_stats = PlayerStat(player.id, player.name)
-    for m_id in m_list:
+    entries = list()
+    for m_id in m_list[::-1]:
         match = await match_cls.get_from_database(m_id)
         if not match:
-            log.error(f"get_new_stats: Couldn't find match {m_id} in database!")
+            log.error(f"rebuild_recent_stats: Couldn't find match {m_id} in database!")
             continue
         found = False
         for tm in match.data.teams:
             for p_score in tm.players:
                 if int(p_score.id) == player.id:
                     p_score.stats = new_p_stats
-                    p_score.update_stats()
+                    entries.append(p_score.update_stats())
                     found = True
                     break
             if found:
                 break
+    await db.async_db_call(db.update_element, "recent_stats", player.id, _get_rebuild_update(entries, start), True)
     return new_p_stats
 
 
+def _get_rebuild_update(entries, start):
+    # Replace the entries with the rebuilt ones in a single update, but keep the entries pushed meanwhile
+    # by matches which just ended
+    ids = [entry["match_id"] for entry in entries]
+    pushed = {"$filter": {"input": {"$ifNull": ["$entries", list()]}, "as": "e",
+                          "cond": {"$and": [{"$not": [{"$in": ["$$e.match_id", ids]}]},
+                                            {"$gte": ["$$e.stamp", start]}]}}}
+    return [{"$set": {"entries": {"$slice": [{"$concatArrays": [{"$literal": entries}, pushed]},
+                                             -RECENT_MAX_ENTRIES]},
+                      "complete": True}}]
+
+
 class PsbWeekUsage:
     def __init__(self, player, week_num, start, end):
         self.week_num = week_num
@@ -79,18 +176,7 @@ class PsbWeekUsage:
         self.num = self.get_num_matches(player)
 
     def get_num_matches(self, player):
-        num = 0
-        for m_id in player.matches[::-1]:
-            try:
-                if _match_stamps[m_id] > self.end_stamp:
-                    pass
-                elif self.start_stamp <= _match_stamps[m_id] <= self.end_stamp:
-                    num += 1
-                else:
-                    break
-            except KeyError:
-                pass
-        return num
+        return count_matches_between(player, self.start_stamp, self.end_stamp)
 
     @property
     def start_str(self):
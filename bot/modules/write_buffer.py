@@ -0,0 +1,148 @@
+"""
+| Write-behind buffer for small field updates.
+| Updates are merged per element and flushed to the database as one bulk write shortly after.
+| Use :meth:`set_fields` and :meth:`unset_fields` to buffer updates.
+| Call :meth:`flush` (or :meth:`flush_sync` outside of the event loop) to write everything immediately.
+"""
+
+from logging import getLogger
+from asyncio import wrap_future
+
+from pymongo.errors import PyMongoError
+
+from lib.tasks import loop
+import modules.database as db
+
+log = getLogger("pog_bot")
+
+# Delay (in seconds) between the first buffered update and the flush
+FLUSH_DELAY = 0.5
+
+# (collection, element id) -> {"$set": dict, "$unset": dict}
+_pending = dict()
+
+# Batches handed to the database threads and not written yet: future -> batch
+_in_flight = dict()
+
+
+def set_fields(collection: str, e_id: int, doc: dict):
+    """
+    Buffer a set operation on the fields of an element.
+
+    :param collection: Collection name.
+    :param e_id: Element id.
+    :param doc: Data to set.
+    """
+    update = _get_update(collection, e_id)
+    for key, value in doc.items():
+        update["$unset"].pop(key, None)
+        update["$set"][key] = value
+    _schedule_flush()
+
+
+def unset_fields(collection: str, e_id: int, doc: dict):
+    """
+    Buffer an unset operation on the fields of an element.
+
+    :param collection: Collection name.
+    :param e_id: Element id.
+    :param doc: Data to unset.
+    """
+    update = _get_update(collection, e_id)
+    for key in doc.keys():
+        update["$set"].pop(key, None)
+        update["$unset"][key] = ""
+    _schedule_flush()
+
+
+async def flush():
+    """
+    Write all the pending updates to the database.
+    """
+    while _pending:
+        batch = _take_pending()
+        future = db.submit_db_call(_write_batch, batch)
+        _in_flight[future] = batch
+        try:
+            await wrap_future(future)
+        except PyMongoError as e:
+            # If flush_sync already waited for this batch, it restored it
+            if _in_flight.pop(future, None) is not None:
+                log.error(f"Write buffer: error when flushing {len(batch)} element(s), will retry: {e}")
+                _restore_pending(batch)
+            raise
+        _in_flight.pop(future, None)
+
+
+def flush_sync():
+    """
+    Write all the pending updates to the database, blocking.
+    To be used when the event loop is stopping: batches already being written are waited for.
+    """
+    for future, batch in list(_in_flight.items()):
+        del _in_flight[future]
+        try:
+            future.result()
+        except PyMongoError as e:
+            log.error(f"Write buffer: error when flushing {len(batch)} element(s), retrying: {e}")
+            _restore_pending(batch)
+    if _pending:
+        _write_batch(_take_pending())
+
+
+# PRIVATE FUNCTIONS:
+
+def _get_update(collection, e_id):
+    key = (collection, e_id)
+    if key not in _pending:
+        _pending[key] = {"$set": dict(), "$unset": dict()}
+    return _pending[key]
+
+
+def _schedule_flush():
+    if not _flush_loop.is_running():
+        _flush_loop.start()
+
+
+def _take_pending():
+    batch = _pending.copy()
+    _pending.clear()
+    return batch
+
+
+def _restore_pending(batch):
+    # Updates buffered since the batch was taken are more recent: they take precedence
+    for (collection, e_id), update in batch.items():
+        current = _get_update(collection, e_id)
+        for key, value in update["$set"].items():
+            if key not in current["$set"] and key not in current["$unset"]:
+                current["$set"][key] = value
+        for key in update["$unset"].keys():
+            if key not in current["$set"] and key not in current["$unset"]:
+                current["$unset"][key] = ""
+
+
+def _write_batch(batch):
+    by_collection = dict()
+    for (collection, e_id), update in batch.items():
+        doc = {op: fields for op, fields in update.items() if fields}
+        if doc:
+            by_collection.setdefault(collection, dict())[e_id] = doc
+    for collection, updates in by_collection.items():
+        if not db.update_elements(collection, updates):
+            continue
+        # Some elements are missing, find out which updates were dropped
+        found = db.get_elements(collection, list(updates), {"_id": 1})
+        for e_id, update in updates.items():
+            if e_id not in found:
+                log.error(f"Write buffer: element {e_id} not found in collection {collection}, "
+                          f"update dropped: {update}")
+
+
+@loop(seconds=FLUSH_DELAY, delay=1, count=2)
+async def _flush_loop():
+    await flush()
+
+
+# Retry with back-off until the pending updates are written
+_flush_loop.add_exception_type(PyMongoError)
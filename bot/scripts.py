@@ -136,6 +136,20 @@ def fill_player_stats():
         la.append(x.get_data())
     db.force_update("player_stats", la)
 
+
+def backfill_player_stats_totals():
+    # Add the totals field to player stats documents created before it existed
+    updates = dict()
+
+    def from_data(dta):
+        totals = PlayerStat(dta["_id"], "N/A", data=dta).get_data()["totals"]
+        updates[dta["_id"]] = {"$set": {"totals": totals}}
+
+    db.get_all_elements(from_data, "player_stats", query={"totals": {"$exists": False}}, batch_size=1000)
+    print(f"Backfilling {len(updates)} player stats documents")
+    if updates:
+        db.update_elements("player_stats", updates)
+
 if __name__ == "__main__":
     push_accounts_to_usage()
     #push_accounts_to_users()
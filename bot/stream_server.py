@@ -0,0 +1,106 @@
+"""
+| Local stand-in for the Census event stream, to test the event stream plugin offline.
+| Set the url of the [Streaming] config section to ws://localhost:8765/streaming?environment=ps2
+| The event stream plugin is the only plugin enabled in test mode (bot launched with the _test config),
+  the stand-in server can then be used while playing test matches.
+| Usage: python stream_server.py [events.json]
+| If a json file is given, its events (list of stream payloads) are replayed with their original spacing,
+  timestamps being shifted to the current time.
+| Otherwise random kills between the subscribed characters are generated.
+"""
+
+# External imports
+from aiohttp import web, WSMsgType
+import asyncio
+import json
+import random
+import sys
+import time
+
+PORT = 8765
+
+# Seconds between two generated kills
+KILL_INTERVAL = 2
+
+# Loadout ids used for generated kills
+LOADOUTS = ["1", "3", "4", "5", "6", "7"]
+
+
+def _message(payload):
+    return json.dumps({"payload": payload, "service": "event", "type": "serviceMessage"})
+
+
+def _random_kill(characters):
+    attacker, victim = random.sample(characters, 2)
+    return {"event_name": "Death",
+            "timestamp": str(int(time.time())),
+            "world_id": "19",
+            "zone_id": "2",
+            "attacker_character_id": attacker,
+            "attacker_fire_mode_id": "0",
+            "attacker_loadout_id": random.choice(LOADOUTS),
+            "attacker_vehicle_id": "0",
+            "attacker_weapon_id": "0",
+            "character_id": victim,
+            "character_loadout_id": random.choice(LOADOUTS),
+            "is_headshot": random.choice(["0", "1"])}
+
+
+async def _replay(ws, events):
+    if not events:
+        return
+    first = int(events[0]["timestamp"])
+    start = time.time()
+    for event in events:
+        offset = int(event["timestamp"]) - first
+        await asyncio.sleep(max(0.0, start + offset - time.time()))
+        event = dict(event, timestamp=str(int(start) + offset))
+        await ws.send_str(_message(event))
+
+
+async def _generate(ws, characters):
+    while len(characters) >= 2:
+        await ws.send_str(_message(_random_kill(characters)))
+        await asyncio.sleep(KILL_INTERVAL)
+
+
+async def handler(request):
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    await ws.send_str(json.dumps({"connected": "true", "service": "push", "type": "connectionStateChanged"}))
+    characters = list()
+    task = None
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            data = json.loads(msg.data)
+            if data.get("action") != "subscribe":
+                continue
+            characters.extend(data.get("characters", list()))
+            await ws.send_str(json.dumps({"subscription": {"characterCount": len(characters),
+                                                           "eventNames": data.get("eventNames", list())}}))
+            print(f"Subscribed: {data}")
+            if not task:
+                if request.app["events"] is not None:
+                    task = asyncio.ensure_future(_replay(ws, request.app["events"]))
+                else:
+                    task = asyncio.ensure_future(_generate(ws, characters))
+    finally:
+        if task:
+            task.cancel()
+    return ws
+
+
+def main():
+    app = web.Application()
+    app["events"] = None
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as file:
+            app["events"] = json.load(file)
+    app.router.add_get("/streaming", handler)
+    web.run_app(app, port=PORT)
+
+
+if __name__ == "__main__":
+    main()
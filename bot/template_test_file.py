@@ -59,7 +59,7 @@ async def launch(ctx, id_list, tier):
     print("TIER 1")
     players = list()
     for p_id in id_list:
-        player = Player.get(p_id)
+        player = await Player.fetch(p_id)
         if not player:
             print(f"user {p_id}")
             user = await bot.fetch_user(p_id)